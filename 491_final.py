@@ -10,14 +10,17 @@ Course: Computer Science 491 - Quantum Computing
 Fall 2020 - Final Project
 """
 
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 import os
-from qiskit import IBMQ
-from qiskit.aqua import QuantumInstance
-from qiskit.aqua.algorithms import Shor
-from qiskit.providers.ibmq import IBMQBackend
+import sys
+from backends import get_backend
+from circuit_cache import CircuitCache, default_cache
+from job_manager import IBMQProvider, LocalProvider, run_jobs
 
-def setup_quantum_backend(api_token: Optional[str] = None) -> IBMQBackend:
+if TYPE_CHECKING:
+    from qiskit.providers.ibmq import IBMQBackend
+
+def setup_quantum_backend(api_token: Optional[str] = None) -> 'IBMQBackend':
     """
     Set up connection to IBM Quantum backend.
     
@@ -35,11 +38,13 @@ def setup_quantum_backend(api_token: Optional[str] = None) -> IBMQBackend:
         if api_token is None:
             raise ValueError("IBMQ API token not provided and IBMQ_API_TOKEN environment variable not set")
             
+    IBMQ = get_backend('ibmq')
     IBMQ.enable_account(api_token)
     provider = IBMQ.get_provider(hub='ibm-q')
     return provider.get_backend('ibmq_qasm_simulator')
 
-def factor_number(number: int, backend: IBMQBackend, shots: int = 1) -> List[int]:
+def factor_number(number: int, backend: 'IBMQBackend', shots: int = 1,
+                  cache: Optional[CircuitCache] = None, a: int = 2) -> List[int]:
     """
     Factor a number using Shor's algorithm.
     
@@ -47,6 +52,8 @@ def factor_number(number: int, backend: IBMQBackend, shots: int = 1) -> List[int
         number: The number to factor
         backend: Quantum backend to use
         shots: Number of shots to run
+        cache: CircuitCache holding transpiled circuits to reuse
+        a: Base of the modular exponentiation
         
     Returns:
         List[int]: List of factors found
@@ -57,30 +64,53 @@ def factor_number(number: int, backend: IBMQBackend, shots: int = 1) -> List[int
     if number < 2:
         raise ValueError("Number to factor must be greater than 1")
         
-    shor = Shor(number)
+    Shor = get_backend('aqua_shor')
+    QuantumInstance = get_backend('quantum_instance')
+    shor = Shor(number, a)
     quantum_instance = QuantumInstance(
         backend,
         shots=shots,
         skip_qobj_validation=False
     )
     
+    if cache is not None:
+        # Shor.run builds its circuit through construct_circuit and runs it
+        # through quantum_instance.execute; serve the transpiled circuit from
+        # the cache and tell execute it is already transpiled.
+        params = {'kind': 'aqua', 'N': number, 'a': a, 'approach': 'aqua',
+                  'backend': backend.name()}
+        build = shor.construct_circuit
+        circuit = cache.get_or_build_circuit(
+            params, lambda: quantum_instance.transpile(build(measurement=True))[0])
+        shor.construct_circuit = lambda measurement=False: circuit
+        execute = quantum_instance.execute
+        quantum_instance.execute = lambda circuits, had_transpiled=False: execute(circuits, had_transpiled=True)
+    
     result = shor.run(quantum_instance)
     return result['factors']
 
 def main() -> None:
     """Main function to demonstrate Shor's algorithm."""
     try:
-        # Set up quantum backend
-        backend = setup_quantum_backend()
-        
         # Numbers to factor
         numbers = [571, 757]
         
-        # Factor each number
-        for num in numbers:
-            print(f"\nFactoring {num}...")
-            factors = factor_number(num, backend)
-            print(f"Factors of {num}: {factors}")
+        # Submit all numbers at once through one backend session; pass
+        # --local to run them on the in-repo state-vector simulator instead
+        # (the object simulator's entanglement tables are quadratic in the
+        # 2^19 input states these numbers need).
+        if '--local' in sys.argv:
+            provider = LocalProvider(engine='vector')
+        else:
+            provider = IBMQProvider(factor=lambda num, backend, shots: factor_number(
+                num, backend, shots, cache=default_cache()))
+        
+        print(f"\nFactoring {', '.join(str(num) for num in numbers)}...")
+        for job in run_jobs(numbers, provider):
+            if job.error:
+                print(f"Error factoring {job.N}: {job.error}")
+            else:
+                print(f"Factors of {job.N}: {job.factors}")
             
     except Exception as e:
         print(f"Error: {str(e)}")
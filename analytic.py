@@ -0,0 +1,122 @@
+"""
+Closed-form sampler for the period-finding measurement distribution.
+
+After the oracle, measuring the output y = a^x0 mod N leaves the input
+register in a uniform superposition of the m values x0, x0 + r, ... below Q.
+After the QFT the probability of measuring x is
+
+    P(x | y) = F_m(x r / Q) / (Q m),  F_m(phi) = sin^2(pi m phi) / sin^2(pi phi),
+
+a Fejer kernel peaking (at m^2) near every multiple of Q/r. It depends on y
+only through m, so the whole measurement can be sampled exactly from Q, r and
+a uniformly drawn x0, without allocating a register.
+
+Sampling is rejection sampling: pick a peak j uniformly, an integer offset d
+from the peak's floor from a heavy-tailed proposal that bounds the kernel,
+and accept with the ratio of kernel to bound. The expected number of rounds
+is about 3.8 and each round costs O(log Q) bit operations.
+"""
+
+import math
+import random
+from typing import Tuple
+
+# Normalizer of the offset proposal: weight 1 for |d| <= 1 and 1 / (4 (|d| - 1)^2) beyond.
+_PROPOSAL_TOTAL = 3.0 + math.pi ** 2 / 12.0
+
+
+def fejer(m: int, numerator: int, Q: int) -> float:
+    """
+    Evaluate F_m(numerator / Q) for integer arguments of any size.
+
+    Args:
+        m: Number of terms
+        numerator: Numerator of phi, with |numerator / Q| <= 1/2
+        Q: Denominator of phi
+
+    Returns:
+        float: sin^2(pi m phi) / sin^2(pi phi), or m^2 when phi is 0
+    """
+    if numerator == 0:
+        return float(m * m)
+    # sin^2 has period 1, so m * phi can be reduced exactly modulo 1 first.
+    top = math.sin(math.pi * ((m * numerator) % Q) / Q)
+    bottom = math.sin(math.pi * (numerator / Q))
+    return (top * top) / (bottom * bottom)
+
+
+def measurement_probability(x: int, Q: int, r: int, m: int) -> float:
+    """
+    Return P(x | y) for an output whose preimage has m elements.
+
+    Args:
+        x: Measured input value
+        Q: Size of the input register
+        r: Period
+        m: Number of x0 + k r below Q
+
+    Returns:
+        float: Probability of measuring x
+    """
+    numerator = (x * r) % Q
+    if 2 * numerator >= Q:
+        numerator -= Q
+    return fejer(m, numerator, Q) / (Q * m)
+
+
+def _sample_offset(rng: random.Random) -> int:
+    """Sample d with probability proportional to 1 for |d| <= 1 and 1 / (4 (|d| - 1)^2) otherwise."""
+    if rng.random() * _PROPOSAL_TOTAL < 3.0:
+        return rng.randrange(-1, 2)
+    while True:
+        # floor(1/U) has P(k) = 1 / (k (k + 1)); thinning gives P(k) proportional to 1 / k^2.
+        k = int(1.0 / (1.0 - rng.random()))
+        if rng.random() * 2 * k < k + 1:
+            return (k + 1) if rng.random() < 0.5 else -(k + 1)
+
+
+def sample_input(Q: int, r: int, m: int, rng: random.Random = random) -> int:
+    """
+    Sample the input register measurement x given the period and preimage size.
+
+    Args:
+        Q: Size of the input register
+        r: Period
+        m: Number of x0 + k r below Q
+        rng: Random number generator
+
+    Returns:
+        int: x in range(Q)
+    """
+    bound = float((m + 1) * (m + 1))
+    while True:
+        j = rng.randrange(r)
+        d = _sample_offset(rng)
+        x = (j * Q) // r + d
+        # Every x belongs to the window of exactly one peak j: |x - jQ/r| <= Q/(2r).
+        numerator = x * r - j * Q
+        if not -Q <= 2 * numerator < Q:
+            continue
+        weight = 1.0 if abs(d) <= 1 else 1.0 / (4.0 * (abs(d) - 1) ** 2)
+        if rng.random() * bound * weight < fejer(m, numerator, Q):
+            return x % Q
+
+
+def sample_measurement(a: int, N: int, Q: int, r: int, rng: random.Random = random) -> Tuple[int, int]:
+    """
+    Sample (x, y) as measured by the state-vector engines after oracle and QFT.
+
+    Args:
+        a: Base
+        N: Modulus
+        Q: Size of the input register
+        r: Order of a modulo N
+        rng: Random number generator
+
+    Returns:
+        Tuple[int, int]: Measured input x and output y
+    """
+    # The output is a^x0 for x0 uniform over the input register.
+    x0 = rng.randrange(Q) % r
+    m = (Q - 1 - x0) // r + 1
+    return sample_input(Q, r, m, rng), pow(a, x0, N)
@@ -0,0 +1,103 @@
+"""
+Registry of optional backends for Shor's algorithm.
+
+Backends are registered by name against a ``module`` or ``module:attribute``
+target and are only imported the first time a run asks for them. This keeps
+Qiskit, IBMQ and matplotlib out of classical-only runs, whose startup cost is
+otherwise dominated by those imports.
+"""
+
+import importlib
+import importlib.util
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class BackendUnavailableError(ImportError):
+    """Raised when a registered backend cannot be imported."""
+
+
+_REGISTRY: Dict[str, Tuple[str, Optional[str], str]] = {}
+_LOADED: Dict[str, Any] = {}
+
+
+def register_backend(name: str, target: str, description: str = '') -> None:
+    """
+    Register a lazily imported backend.
+
+    Args:
+        name: Name used to select the backend
+        target: ``module`` or ``module:attribute`` to import on first use
+        description: Short human readable description
+    """
+    module, _, attribute = target.partition(':')
+    _REGISTRY[name] = (module, attribute or None, description)
+    _LOADED.pop(name, None)
+
+
+def get_backend(name: str) -> Any:
+    """
+    Import (once) and return a registered backend.
+
+    Args:
+        name: Registered backend name
+
+    Returns:
+        Any: The imported module or attribute
+
+    Raises:
+        KeyError: If no backend is registered under ``name``
+        BackendUnavailableError: If the backend's dependency is not installed
+    """
+    if name in _LOADED:
+        return _LOADED[name]
+    if name not in _REGISTRY:
+        raise KeyError(f"Unknown backend '{name}', expected one of {available_backends()}")
+
+    module_name, attribute, _ = _REGISTRY[name]
+    try:
+        backend = importlib.import_module(module_name)
+    except ImportError as e:
+        raise BackendUnavailableError(f"Backend '{name}' requires '{module_name}': {str(e)}") from e
+    if attribute is not None:
+        backend = getattr(backend, attribute)
+
+    _LOADED[name] = backend
+    return backend
+
+
+def is_available(name: str) -> bool:
+    """
+    Check whether a backend's top-level package is installed, without importing it.
+
+    Args:
+        name: Registered backend name
+
+    Returns:
+        bool: True if the backend can be imported
+    """
+    if name in _LOADED:
+        return True
+    if name not in _REGISTRY:
+        return False
+    top_level = _REGISTRY[name][0].split('.')[0]
+    return importlib.util.find_spec(top_level) is not None
+
+
+def available_backends() -> List[str]:
+    """Return the names of all registered backends."""
+    return sorted(_REGISTRY)
+
+
+# Classical and simulated backends from this repository.
+register_backend('classical', 'shors:Shors', 'Classical trial-division factoring')
+register_backend('simulator', 'shor_2_0:execute_shors', 'State simulation of period finding')
+
+# Qiskit, IBMQ and plotting backends.
+register_backend('qiskit', 'qiskit', 'Qiskit core')
+register_backend('qft', 'qiskit.circuit.library:QFT', 'Qiskit QFT circuit library')
+register_backend('qpy', 'qiskit.qpy', 'Qiskit QPY circuit serialization')
+register_backend('qpy_legacy', 'qiskit.circuit.qpy_serialization', 'QPY serialization in older Qiskit releases')
+register_backend('aqua_shor', 'qiskit.aqua.algorithms:Shor', "Qiskit Aqua's Shor algorithm")
+register_backend('quantum_instance', 'qiskit.aqua:QuantumInstance', 'Qiskit Aqua quantum instance')
+register_backend('ibmq', 'qiskit:IBMQ', 'IBM Quantum provider')
+register_backend('pyplot', 'matplotlib.pyplot', 'matplotlib plotting')
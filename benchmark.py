@@ -3,156 +3,363 @@
 Benchmark script for Shor's Algorithm implementations.
 
 This script compares the performance of different implementations
-of Shor's algorithm for integer factorization.
+of Shor's algorithm for integer factorization. Every (engine, N) pair is
+warmed up, then timed over repeated seeded runs with ``perf_counter_ns``;
+a separate traced run records peak memory. Every run is given a deadline at
+the end of its number's time budget, so one pathological run is cut short
+instead of overrunning it. Results are written as JSON and
+can be compared against a stored baseline to flag regressions.
 """
 
+import argparse
+import contextlib
+import functools
+import io
+import json
+import math
+import platform
+import random
+import statistics
+import sys
 import time
-import numpy as np
-import matplotlib.pyplot as plt
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from backends import get_backend
+from cancellation import Deadline, DeadlineExceeded
 from shors import Shors
 from shor_2_0 import execute_shors
 
+SCHEMA_VERSION = 1
+DEFAULT_NUMBERS = [15, 21, 35, 55, 77, 91, 119, 143, 187, 221]
+
+
+def _run_shors_class(N: int, deadline: Optional[Deadline] = None) -> bool:
+    factors = Shors(N, 3, deadline).find_prime_factors()
+    return len(factors) > 1
+
+
+def _run_shor_2_0(N: int, deadline: Optional[Deadline] = None, attempts: int = 5) -> bool:
+    return execute_shors(N, attempts=attempts, deadline=deadline) is not None
+
+
+def _run_shor_2_0_vector(N: int, deadline: Optional[Deadline] = None, attempts: int = 5) -> bool:
+    return execute_shors(N, attempts=attempts, engine='vector', deadline=deadline) is not None
+
+
+def _run_shor_2_0_native(N: int, deadline: Optional[Deadline] = None, attempts: int = 5) -> bool:
+    return execute_shors(N, attempts=attempts, engine='native', deadline=deadline) is not None
+
+
+def _run_shor_2_0_classical(N: int, deadline: Optional[Deadline] = None, attempts: int = 5) -> bool:
+    return execute_shors(N, attempts=attempts, engine='classical', deadline=deadline) is not None
+
+
+def _run_shor_2_0_analytic(N: int, deadline: Optional[Deadline] = None, attempts: int = 5) -> bool:
+    return execute_shors(N, attempts=attempts, engine='analytic', deadline=deadline) is not None
+
+
+# Engine name -> callable taking N and a deadline and returning whether the run succeeded.
+BENCHMARK_ENGINES: Dict[str, Callable[[int, Optional[Deadline]], bool]] = {
+    'shors_class': _run_shors_class,
+    'shor_2_0': _run_shor_2_0,
+    'shor_2_0_vector': _run_shor_2_0_vector,
+    'shor_2_0_native': _run_shor_2_0_native,
+    'shor_2_0_classical': _run_shor_2_0_classical,
+    'shor_2_0_analytic': _run_shor_2_0_analytic,
+}
+
+
+def _quiet_call(func: Callable[[int, Optional[Deadline]], bool], N: int, quiet: bool,
+                deadline: Optional[Deadline] = None) -> bool:
+    """Call an engine, discarding its progress output when quiet."""
+    if not quiet:
+        return func(N, deadline)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(N, deadline)
+
+
+def summarize(times_ns: Sequence[int]) -> Dict[str, float]:
+    """
+    Summarize repeated timings.
+
+    Args:
+        times_ns: Timings in nanoseconds
+
+    Returns:
+        Dict[str, float]: median, first/third quartile and interquartile range
+    """
+    if not times_ns:
+        return {'median_ns': 0.0, 'q1_ns': 0.0, 'q3_ns': 0.0, 'iqr_ns': 0.0}
+    if len(times_ns) == 1:
+        q1 = q3 = float(times_ns[0])
+    else:
+        q1, _, q3 = statistics.quantiles(times_ns, n=4, method='inclusive')
+    return {
+        'median_ns': float(statistics.median(times_ns)),
+        'q1_ns': float(q1),
+        'q3_ns': float(q3),
+        'iqr_ns': float(q3 - q1),
+    }
+
+
+def fit_scaling_exponent(points: Sequence[Tuple[int, float]]) -> Optional[float]:
+    """
+    Fit time ~ c * N^k by least squares in log-log space.
+
+    Args:
+        points: (N, median time) pairs
+
+    Returns:
+        Optional[float]: The exponent k, or None with fewer than two usable points
+    """
+    usable = [(math.log(N), math.log(t)) for N, t in points if N > 1 and t > 0]
+    if len({x for x, _ in usable}) < 2:
+        return None
+    mean_x = statistics.fmean(x for x, _ in usable)
+    mean_y = statistics.fmean(y for _, y in usable)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in usable)
+    variance = sum((x - mean_x) ** 2 for x, _ in usable)
+    return covariance / variance
+
+
+def benchmark_engine(engine: str, numbers: Sequence[int], repeats: int = 5, warmup: int = 1,
+                     seed: int = 0, max_time: float = 60, quiet: bool = True,
+                     func: Optional[Callable[[int, Optional[Deadline]], bool]] = None) -> Dict:
+    """
+    Benchmark one engine over a series of numbers.
+
+    Args:
+        engine: Name of an engine in BENCHMARK_ENGINES
+        numbers: Numbers to factor
+        repeats: Timed runs per number
+        warmup: Untimed runs per number before timing
+        seed: Base seed; run i of number N is seeded with (seed, N, i)
+        max_time: Time budget in seconds per number; a run still going when
+            it is spent is cancelled and the remaining repeats are skipped,
+            but the series continues
+        quiet: Suppress the engine's progress output
+        func: Callable to time under the engine's name, defaults to
+            BENCHMARK_ENGINES[engine]
+
+    Returns:
+        Dict: Per-number results and the fitted scaling exponent
+    """
+    if func is None:
+        func = BENCHMARK_ENGINES[engine]
+    runs = []
+
+    for N in numbers:
+        print(f"Benchmarking {engine} with N={N}...")
+        record = {'N': N, 'times_ns': [], 'successes': 0, 'errors': [], 'truncated': False}
+        budget_ns = max_time * 1e9
+        spent_ns = 0
+
+        for i in range(warmup):
+            random.seed(f"warmup-{seed}-{N}-{i}")
+            try:
+                _quiet_call(func, N, quiet, Deadline(max_time))
+            except Exception as e:
+                record['errors'].append(str(e))
+
+        for i in range(repeats):
+            if spent_ns > budget_ns:
+                record['truncated'] = True
+                break
+            random.seed(f"{seed}-{N}-{i}")
+            start = time.perf_counter_ns()
+            try:
+                success = _quiet_call(func, N, quiet, Deadline((budget_ns - spent_ns) / 1e9))
+            except DeadlineExceeded as e:
+                # The budget is spent; a cut-short run has no meaningful time.
+                record['errors'].append(str(e))
+                record['truncated'] = True
+                break
+            except Exception as e:
+                success = False
+                record['errors'].append(str(e))
+            elapsed = time.perf_counter_ns() - start
+            spent_ns += elapsed
+            record['times_ns'].append(elapsed)
+            record['successes'] += int(bool(success))
+
+        # Memory is measured on its own run, as tracing distorts timings.
+        random.seed(f"{seed}-{N}-memory")
+        tracemalloc.start()
+        try:
+            _quiet_call(func, N, quiet, Deadline(max_time))
+        except Exception:
+            pass
+        finally:
+            record['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        record.update(summarize(record['times_ns']))
+        record['success_rate'] = record['successes'] / max(1, len(record['times_ns']))
+        runs.append(record)
+        print(f"  Median: {record['median_ns'] / 1e9:.4f}s, IQR: {record['iqr_ns'] / 1e9:.4f}s, "
+              f"Peak: {record['peak_bytes']} bytes, Success: {record['success_rate']:.0%}")
+
+    return {
+        'runs': runs,
+        'scaling_exponent': fit_scaling_exponent([(r['N'], r['median_ns']) for r in runs]),
+    }
+
+
+def run_benchmarks(engines: Sequence[str], numbers: Sequence[int], repeats: int = 5, warmup: int = 1,
+                   seed: int = 0, max_time: float = 60, quiet: bool = True) -> Dict:
+    """
+    Benchmark several engines and collect the results into a JSON-serializable report.
+
+    Returns:
+        Dict: Report with environment metadata and per-engine results
+    """
+    return {
+        'version': SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'repeats': repeats,
+        'warmup': warmup,
+        'engines': {engine: benchmark_engine(engine, numbers, repeats, warmup, seed, max_time, quiet)
+                    for engine in engines},
+    }
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float = 0.10) -> List[Dict]:
+    """
+    Flag (engine, N) pairs whose median time regressed against a baseline.
+
+    A pair regresses when its median exceeds the baseline median by more than
+    ``tolerance`` and by more than the baseline's interquartile range, so that
+    ordinary run-to-run noise is not reported.
+
+    Args:
+        report: Report from run_benchmarks
+        baseline: Previously stored report
+        tolerance: Allowed relative slowdown
+
+    Returns:
+        List[Dict]: One entry per regression
+    """
+    regressions = []
+    for engine, results in report['engines'].items():
+        base_runs = {r['N']: r for r in baseline.get('engines', {}).get(engine, {}).get('runs', [])}
+        for run in results['runs']:
+            base = base_runs.get(run['N'])
+            if base is None or not base['median_ns'] or not run['times_ns']:
+                continue
+            ratio = run['median_ns'] / base['median_ns']
+            if ratio > 1 + tolerance and run['median_ns'] - base['median_ns'] > base['iqr_ns']:
+                regressions.append({'engine': engine, 'N': run['N'], 'ratio': ratio,
+                                    'median_ns': run['median_ns'], 'baseline_median_ns': base['median_ns']})
+    return regressions
+
+
 def benchmark_shors_class(numbers, max_time=60):
     """
     Benchmark the Shors class implementation.
-    
+
     Args:
         numbers: List of numbers to factor
         max_time: Maximum time in seconds to spend on each number
-        
+
     Returns:
-        List of tuples (number, time_taken, success)
+        List of tuples (number, median_time, success)
     """
-    results = []
-    
-    for N in numbers:
-        print(f"Benchmarking Shors class with N={N}...")
-        start_time = time.time()
-        
-        try:
-            shor = Shors(N, 3)
-            factors = shor.find_prime_factors(N)
-            
-            end_time = time.time()
-            elapsed = end_time - start_time
-            
-            success = len(factors) > 1
-            results.append((N, elapsed, success))
-            
-            print(f"  Time: {elapsed:.4f}s, Success: {success}")
-            
-            if elapsed > max_time:
-                print(f"  Exceeded maximum time of {max_time}s, stopping benchmark")
-                break
-                
-        except Exception as e:
-            print(f"  Error: {str(e)}")
-            results.append((N, time.time() - start_time, False))
-            
-    return results
+    results = benchmark_engine('shors_class', numbers, max_time=max_time)
+    return [(r['N'], r['median_ns'] / 1e9, r['success_rate'] > 0) for r in results['runs']]
+
 
 def benchmark_shor_2_0(numbers, attempts=5, max_time=60):
     """
     Benchmark the shor_2_0 implementation.
-    
+
     Args:
         numbers: List of numbers to factor
         attempts: Number of attempts for each number
         max_time: Maximum time in seconds to spend on each number
-        
+
     Returns:
-        List of tuples (number, time_taken, success)
+        List of tuples (number, median_time, success)
     """
-    results = []
-    
-    for N in numbers:
-        print(f"Benchmarking shor_2_0 with N={N}...")
-        start_time = time.time()
-        
-        try:
-            result = execute_shors(N, attempts=attempts)
-            
-            end_time = time.time()
-            elapsed = end_time - start_time
-            
-            success = result is not None
-            results.append((N, elapsed, success))
-            
-            print(f"  Time: {elapsed:.4f}s, Success: {success}")
-            
-            if elapsed > max_time:
-                print(f"  Exceeded maximum time of {max_time}s, stopping benchmark")
-                break
-                
-        except Exception as e:
-            print(f"  Error: {str(e)}")
-            results.append((N, time.time() - start_time, False))
-            
-    return results
+    results = benchmark_engine('shor_2_0', numbers, max_time=max_time,
+                               func=functools.partial(_run_shor_2_0, attempts=attempts))
+    return [(r['N'], r['median_ns'] / 1e9, r['success_rate'] > 0) for r in results['runs']]
+
 
-def plot_results(shors_results, shor_2_0_results):
+def plot_results(report, save_path='shor_benchmark.png'):
     """
-    Plot the benchmark results.
-    
+    Plot the median time of every engine in a benchmark report.
+
     Args:
-        shors_results: Results from the Shors class benchmark
-        shor_2_0_results: Results from the shor_2_0 benchmark
+        report: Report from run_benchmarks
+        save_path: Path to save the plot
     """
+    plt = get_backend('pyplot')
     plt.figure(figsize=(10, 6))
-    
-    # Extract data
-    shors_numbers = [r[0] for r in shors_results]
-    shors_times = [r[1] for r in shors_results]
-    shor_2_0_numbers = [r[0] for r in shor_2_0_results]
-    shor_2_0_times = [r[1] for r in shor_2_0_results]
-    
-    # Plot
-    plt.plot(shors_numbers, shors_times, 'o-', label='Shors Class')
-    plt.plot(shor_2_0_numbers, shor_2_0_times, 's-', label='shor_2_0')
-    
+
+    for engine, results in report['engines'].items():
+        numbers = [r['N'] for r in results['runs']]
+        medians = [r['median_ns'] / 1e9 for r in results['runs']]
+        errors = [[(r['median_ns'] - r['q1_ns']) / 1e9 for r in results['runs']],
+                  [(r['q3_ns'] - r['median_ns']) / 1e9 for r in results['runs']]]
+        plt.errorbar(numbers, medians, yerr=errors, fmt='o-', capsize=3, label=engine)
+
     plt.xlabel('Number to Factor')
-    plt.ylabel('Time (seconds)')
+    plt.ylabel('Median time (seconds)')
+    plt.yscale('log')
     plt.title('Shor\'s Algorithm Benchmark')
     plt.legend()
     plt.grid(True)
-    
+
     # Save the plot
-    plt.savefig('shor_benchmark.png')
+    plt.savefig(save_path)
     plt.close()
 
-def main():
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
     """Main function to run the benchmarks."""
-    # Numbers to test
-    numbers = [15, 21, 35, 55, 77, 91, 119, 143, 187, 221]
-    
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--engines', nargs='+', default=list(BENCHMARK_ENGINES), choices=list(BENCHMARK_ENGINES))
+    parser.add_argument('--numbers', nargs='+', type=int, default=DEFAULT_NUMBERS)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-time', type=float, default=60, help='time budget in seconds per number')
+    parser.add_argument('--output', default='shor_benchmark.json', help='path of the JSON report')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='allowed relative slowdown')
+    parser.add_argument('--plot', action='store_true', help='also save shor_benchmark.png')
+    args = parser.parse_args(argv)
+
     print("Starting benchmarks...")
-    
-    # Run benchmarks
-    shors_results = benchmark_shors_class(numbers)
-    shor_2_0_results = benchmark_shor_2_0(numbers)
-    
-    # Plot results
-    plot_results(shors_results, shor_2_0_results)
-    
-    print("\nBenchmark results:")
-    print("Number | Shors Class (s) | shor_2_0 (s)")
-    print("-------|----------------|-------------")
-    
-    for i, N in enumerate(numbers):
-        if i < len(shors_results) and i < len(shor_2_0_results):
-            shors_time = shors_results[i][1]
-            shor_2_0_time = shor_2_0_results[i][1]
-            print(f"{N:6d} | {shors_time:14.4f} | {shor_2_0_time:11.4f}")
-        elif i < len(shors_results):
-            shors_time = shors_results[i][1]
-            print(f"{N:6d} | {shors_time:14.4f} | N/A")
-        elif i < len(shor_2_0_results):
-            shor_2_0_time = shor_2_0_results[i][1]
-            print(f"{N:6d} | N/A            | {shor_2_0_time:11.4f}")
-        else:
-            print(f"{N:6d} | N/A            | N/A")
-            
-    print("\nBenchmark plot saved as 'shor_benchmark.png'")
+    report = run_benchmarks(args.engines, args.numbers, args.repeats, args.warmup, args.seed, args.max_time)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark report saved as '{args.output}'")
+
+    print("\nEngine      | Scaling exponent")
+    print("------------|-----------------")
+    for engine, results in report['engines'].items():
+        k = results['scaling_exponent']
+        print(f"{engine:11s} | {'N/A' if k is None else f'{k:.2f}'}")
+
+    if args.plot:
+        plot_results(report)
+        print("\nBenchmark plot saved as 'shor_benchmark.png'")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['engine']} N={r['N']}: {r['ratio']:.2f}x baseline median")
+        if regressions:
+            return 1
+        print("\nNo regressions against baseline")
+
+    return 0
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Deadlines and cooperative cancellation for factoring runs.
+
+A ``Deadline`` is passed down the factoring entry points (``execute_shors``,
+``Shors``, ``main.find_period``) and checked inside their long loops. Once it
+has passed, or ``cancel`` has been called from another thread, the next check
+raises ``DeadlineExceeded``, carrying whatever partial result the loop had
+built so far, so a pathological N cannot hold a worker indefinitely.
+
+Checks in tight loops only read the clock every ``CHECK_INTERVAL``
+iterations, and a deadline of None is never checked, so runs without a
+deadline pay nothing.
+
+Example:
+    execute_shors(N, attempts=20, deadline=Deadline(30.0))
+"""
+
+import threading
+import time
+from typing import Any, Optional
+
+# Iterations between clock reads in tight loops.
+CHECK_INTERVAL = 1024
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a run's deadline passes or the run is cancelled."""
+
+    def __init__(self, message: str, partial: Any = None):
+        """
+        Args:
+            message: What was interrupted
+            partial: Result built before the interruption, if any
+        """
+        super().__init__(message)
+        self.partial = partial
+
+
+class Deadline:
+    """
+    A point in time after which a run should stop, and a cancellation flag.
+
+    Safe to share between threads: any thread may call cancel, and the run
+    stops at its next check.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        """
+        Args:
+            timeout: Seconds from now until the deadline, or None to only
+                stop on cancel
+        """
+        self.expires = None if timeout is None else time.monotonic() + timeout
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Stop the run at its next check."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancel has been called."""
+        return self._cancelled.is_set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline (never negative), or None without one."""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self) -> bool:
+        """True once the deadline has passed or the run has been cancelled."""
+        return self.cancelled or (self.expires is not None and time.monotonic() >= self.expires)
+
+    def check(self, what: str = 'run', partial: Any = None) -> None:
+        """
+        Raise DeadlineExceeded if the deadline has passed or the run was cancelled.
+
+        Args:
+            what: Description of the interrupted work, for the error message
+            partial: Partial result to attach to the error
+        """
+        if self.cancelled:
+            raise DeadlineExceeded(f"{what} cancelled", partial)
+        if self.expires is not None and time.monotonic() >= self.expires:
+            raise DeadlineExceeded(f"{what} exceeded its deadline", partial)
+
+
+def check(deadline: Optional[Deadline], i: int = 0, what: str = 'run', partial: Any = None) -> None:
+    """
+    Check a deadline from iteration i of a tight loop.
+
+    The deadline is only consulted every CHECK_INTERVAL iterations, and never
+    when it is None.
+
+    Args:
+        deadline: Deadline of the run, or None
+        i: Loop iteration
+        what: Description of the interrupted work
+        partial: Partial result to attach to the error
+    """
+    if deadline is not None and i % CHECK_INTERVAL == 0:
+        deadline.check(what, partial)
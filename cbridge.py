@@ -0,0 +1,205 @@
+"""
+ctypes bridge to the C++ simulator (complex.C, qureg.C, util.C).
+
+``shor_bridge.C`` wraps QuReg and the util.C routines in a C interface. Once
+built (``python cbridge.py`` or ``cbridge.build()``) the library is loaded
+from SHOR_NATIVE_LIB, or ``libshor.so`` next to this file. A ``QuReg``'s
+amplitudes are owned by C++ and exposed as a complex128 NumPy array over the
+same memory, so Python and C++ operate on one buffer.
+
+When the library is not built every routine falls back to an equivalent
+NumPy/Python implementation, so callers work either way; ``is_native()``
+tells which one is in use.
+"""
+
+import ctypes
+import math
+import os
+import random
+import subprocess
+import sys
+from typing import Optional
+import numpy as np
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+LIBRARY_NAME = 'libshor.so'
+
+_LIBRARY: Optional[ctypes.CDLL] = None
+_LOADED = False
+_FALLBACK_RNG = random.Random()
+
+
+def library_path() -> str:
+    """Return the path the library is loaded from."""
+    return os.getenv('SHOR_NATIVE_LIB', os.path.join(SOURCE_DIR, LIBRARY_NAME))
+
+
+def build(output: Optional[str] = None, compiler: Optional[str] = None) -> str:
+    """
+    Compile shor_bridge.C into a shared library.
+
+    Args:
+        output: Library path, defaults to library_path()
+        compiler: C++ compiler, defaults to CXX or 'c++'
+
+    Returns:
+        str: Path of the built library
+
+    Raises:
+        subprocess.CalledProcessError: If compilation fails
+    """
+    global _LIBRARY, _LOADED
+    output = output or library_path()
+    command = [compiler or os.getenv('CXX', 'c++'), '-O2', '-shared', '-fPIC', '-w',
+               '-I', os.path.join(SOURCE_DIR, 'compat'), os.path.join(SOURCE_DIR, 'shor_bridge.C'), '-o', output]
+    subprocess.run(command, check=True)
+    _LIBRARY, _LOADED = None, False
+    return output
+
+
+def load_library() -> Optional[ctypes.CDLL]:
+    """Load the library once, returning None if it is not built."""
+    global _LIBRARY, _LOADED
+    if _LOADED:
+        return _LIBRARY
+    _LOADED = True
+    try:
+        lib = ctypes.CDLL(library_path())
+    except OSError:
+        return None
+
+    lib.qureg_new.restype = ctypes.c_void_p
+    lib.qureg_new.argtypes = [ctypes.c_int]
+    lib.qureg_data.restype = ctypes.POINTER(ctypes.c_double)
+    for name in ('qureg_free', 'qureg_data', 'qureg_size', 'qureg_norm', 'qureg_dec_measure'):
+        getattr(lib, name).argtypes = [ctypes.c_void_p]
+    lib.qureg_set_average.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.qureg_dft.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    lib.shor_seed.argtypes = [ctypes.c_uint]
+    lib.shor_modexp.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    lib.shor_denominator.argtypes = [ctypes.c_double, ctypes.c_int]
+    _LIBRARY = lib
+    return lib
+
+
+def is_native() -> bool:
+    """Return True if the compiled library is available."""
+    return load_library() is not None
+
+
+def seed(value: int) -> None:
+    """Seed the random numbers used by QuReg.dec_measure."""
+    lib = load_library()
+    if lib is not None:
+        lib.shor_seed(value & 0xFFFFFFFF)
+    _FALLBACK_RNG.seed(value)
+
+
+def modexp(x: int, a: int, n: int) -> int:
+    """Return x^a mod n (util.C's modexp, 32-bit: n must be below 46341)."""
+    lib = load_library()
+    if lib is not None:
+        return lib.shor_modexp(x, a, n)
+    return pow(x, a, n)
+
+
+def denominator(c: float, qmax: int) -> int:
+    """Return the denominator below qmax of the best rational approximation to c (util.C)."""
+    lib = load_library()
+    if lib is not None:
+        return lib.shor_denominator(c, qmax)
+    y, q0, q1 = c, 0, 1
+    while True:
+        z = y - math.floor(y)
+        if z < 0.5 / qmax ** 2 or z == 0:
+            return q1
+        y = 1 / z
+        q2 = math.floor(y) * q1 + q0
+        if q2 >= qmax:
+            return q1
+        q0, q1 = q1, q2
+
+
+class QuReg:
+    """
+    Quantum register of the C++ simulator, or its NumPy stand-in.
+
+    ``amplitudes`` is a complex128 array of length 2^size backed by the
+    register's own memory; writes to it are seen by the C++ routines.
+    Use as a context manager, or call close(), to free the register.
+    """
+
+    def __init__(self, size: int):
+        """
+        Args:
+            size: Number of qubits
+        """
+        self.size = size
+        self._lib = load_library()
+        if self._lib is not None:
+            self._handle = self._lib.qureg_new(size)
+            data = self._lib.qureg_data(self._handle)
+            self.amplitudes = np.ctypeslib.as_array(data, shape=(2 << size,)).view(np.complex128)
+            self.amplitudes[:] = 0
+        else:
+            self._handle = None
+            self.amplitudes = np.zeros(1 << size, dtype=np.complex128)
+
+    def __enter__(self) -> 'QuReg':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Free the register; its amplitude array must not be used afterwards."""
+        if self._handle is not None:
+            del self.amplitudes
+            self._lib.qureg_free(self._handle)
+            self._handle = None
+
+    def set_average(self, number: int) -> None:
+        """Set an equal superposition of the states 0 to number inclusive (QuReg::SetAverage)."""
+        if self._handle is not None:
+            self._lib.qureg_set_average(self._handle, number)
+        else:
+            self.amplitudes[:number + 1] = number ** -0.5
+
+    def norm(self) -> None:
+        """Normalise the amplitudes (QuReg::Norm)."""
+        if self._handle is not None:
+            self._lib.qureg_norm(self._handle)
+        else:
+            self.amplitudes /= np.linalg.norm(self.amplitudes)
+
+    def dec_measure(self) -> int:
+        """Measure and collapse the register, returning the state measured or -1 (QuReg::DecMeasure)."""
+        if self._handle is not None:
+            return self._lib.qureg_dec_measure(self._handle)
+        probabilities = self.amplitudes.real ** 2 + self.amplitudes.imag ** 2
+        cumulative = np.cumsum(probabilities)
+        index = int(np.searchsorted(cumulative, _FALLBACK_RNG.random() * cumulative[-1], side='right'))
+        if index >= len(cumulative):
+            return -1
+        self.amplitudes[:] = 0
+        self.amplitudes[index] = 1
+        return index
+
+    def dft(self, q: int) -> None:
+        """
+        Apply the discrete Fourier transform exp(2 pi i a c / q) / sqrt(q) to entries 0 to q - 1 (util.C's DFT).
+
+        The C++ version takes O(q^2 / r) time for a state with q / r non-zero
+        amplitudes; the fallback uses an FFT.
+        """
+        if self._handle is not None:
+            self._lib.qureg_dft(self._handle, q)
+        else:
+            transformed = np.fft.ifft(self.amplitudes[:q]) * math.sqrt(q)
+            self.amplitudes[:] = 0
+            self.amplitudes[:q] = transformed
+            self.norm()
+
+
+if __name__ == '__main__':
+    print(f"Built {build(sys.argv[1] if len(sys.argv) > 1 else None)}")
@@ -0,0 +1,272 @@
+"""
+Checkpoints of the state-vector engine between period-finding stages.
+
+A checkpoint holds the amplitudes after a stage ('oracle': collapsed onto the
+measured output y, 'qft': transformed and ready to sample) together with the
+(a, N) run it belongs to. Later runs with the same (a, N) resume from the
+latest stage stored, so a failed attempt skips the oracle, further shots skip
+the QFT, and a preempted worker picks up where it stopped.
+
+The binary format is little-endian:
+
+- header ``<8sHBBHQ``: magic, format version, dtype code, layout
+  (dense or sparse), input bits and the number of stored amplitudes;
+- the stage name, a, N and y, each as a u32 length and its bytes (integers
+  are unsigned big-endian, y is empty when absent);
+- the amplitudes, preceded by their uint64 indices in the sparse layout,
+  which is used when at most a third are non-zero (the post-oracle state
+  has about Q/r of them);
+- the CRC-32 of everything before it.
+
+Disk checkpoints default to ``~/.cache/shor-checkpoints``, set with
+SHOR_CHECKPOINT_DIR.
+"""
+
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+import numpy as np
+
+MAGIC = b'SHORCKPT'
+FORMAT_VERSION = 1
+DENSE, SPARSE = 0, 1
+
+_HEADER = struct.Struct('<8sHBBHQ')
+_LENGTH = struct.Struct('<I')
+_CRC = struct.Struct('<I')
+_DTYPES = {0: np.dtype(np.complex128), 1: np.dtype(np.complex64)}
+_DTYPE_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+
+# Stages a run can resume from, latest first.
+RESUMABLE_STAGES = ('qft', 'oracle')
+
+
+class CheckpointError(ValueError):
+    """Raised when checkpoint data is truncated, corrupt or of an unknown format."""
+
+
+@dataclass
+class Checkpoint:
+    """Amplitudes of a period-finding run after ``stage``."""
+    stage: str
+    a: int
+    N: int
+    input_num_bits: int
+    state: np.ndarray
+    y: Optional[int] = None
+
+    @property
+    def key(self) -> Tuple:
+        return checkpoint_key(self.stage, self.a, self.N, self.input_num_bits, self.state.dtype)
+
+
+def checkpoint_key(stage: str, a: int, N: int, input_num_bits: int, dtype: np.dtype) -> Tuple:
+    """Return the key identifying a checkpoint in a store."""
+    return (stage, a, N, input_num_bits, np.dtype(dtype).name)
+
+
+def _int_bytes(value: Optional[int]) -> bytes:
+    if value is None:
+        return b''
+    return value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big')
+
+
+class _CRCWriter:
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.crc = 0
+
+    def write(self, data) -> None:
+        self.crc = zlib.crc32(data, self.crc)
+        self.f.write(data)
+
+
+class _CRCReader:
+    def __init__(self, f: BinaryIO):
+        self.f = f
+        self.crc = 0
+
+    def read(self, size: int) -> bytes:
+        data = self.f.read(size)
+        if len(data) != size:
+            raise CheckpointError("Checkpoint is truncated")
+        self.crc = zlib.crc32(data, self.crc)
+        return data
+
+    def read_array(self, count: int, dtype: np.dtype) -> np.ndarray:
+        array = np.empty(count, dtype=dtype)
+        view = array.view(np.uint8)
+        if self.f.readinto(view) != len(view):
+            raise CheckpointError("Checkpoint is truncated")
+        self.crc = zlib.crc32(view, self.crc)
+        return array
+
+
+def write(checkpoint: Checkpoint, f: BinaryIO) -> None:
+    """
+    Serialize a checkpoint to a binary file, streaming the amplitudes.
+
+    Args:
+        checkpoint: Checkpoint to write
+        f: File opened for binary writing
+    """
+    state = np.ascontiguousarray(checkpoint.state)
+    indices = np.flatnonzero(state)
+    layout = SPARSE if 3 * len(indices) <= len(state) else DENSE
+    count = len(indices) if layout == SPARSE else len(state)
+
+    out = _CRCWriter(f)
+    out.write(_HEADER.pack(MAGIC, FORMAT_VERSION, _DTYPE_CODES[state.dtype], layout,
+                           checkpoint.input_num_bits, count))
+    for field in (checkpoint.stage.encode(), _int_bytes(checkpoint.a), _int_bytes(checkpoint.N),
+                  _int_bytes(checkpoint.y)):
+        out.write(_LENGTH.pack(len(field)))
+        out.write(field)
+    if layout == SPARSE:
+        out.write(indices.astype('<u8').view(np.uint8))
+        out.write(state[indices].view(np.uint8))
+    else:
+        out.write(state.view(np.uint8))
+    f.write(_CRC.pack(out.crc))
+
+
+def read(f: BinaryIO) -> Checkpoint:
+    """
+    Deserialize a checkpoint written by ``write``.
+
+    Args:
+        f: File opened for binary reading
+
+    Returns:
+        Checkpoint: The stored checkpoint
+
+    Raises:
+        CheckpointError: If the data is truncated, corrupt or of an unknown format
+    """
+    src = _CRCReader(f)
+    magic, version, dtype_code, layout, input_num_bits, count = _HEADER.unpack(src.read(_HEADER.size))
+    if magic != MAGIC:
+        raise CheckpointError("Not a checkpoint file")
+    if version != FORMAT_VERSION or dtype_code not in _DTYPES or layout not in (DENSE, SPARSE):
+        raise CheckpointError(f"Unsupported checkpoint format (version {version})")
+    stage, a, N, y = (src.read(_LENGTH.unpack(src.read(_LENGTH.size))[0]) for _ in range(4))
+
+    dtype = _DTYPES[dtype_code]
+    if layout == SPARSE:
+        indices = src.read_array(count, np.dtype('<u8'))
+        values = src.read_array(count, dtype)
+        state = np.zeros(1 << input_num_bits, dtype=dtype)
+        state[indices] = values
+    else:
+        state = src.read_array(count, dtype)
+
+    crc = f.read(_CRC.size)
+    if len(crc) != _CRC.size:
+        raise CheckpointError("Checkpoint is truncated")
+    expected, = _CRC.unpack(crc)
+    if expected != src.crc:
+        raise CheckpointError("Checkpoint failed its CRC-32 check")
+    return Checkpoint(stage.decode(), int.from_bytes(a, 'big'), int.from_bytes(N, 'big'), input_num_bits,
+                      state, int.from_bytes(y, 'big') if y else None)
+
+
+def encode(checkpoint: Checkpoint) -> bytes:
+    """Return the binary encoding of a checkpoint."""
+    buffer = io.BytesIO()
+    write(checkpoint, buffer)
+    return buffer.getvalue()
+
+
+def decode(data: bytes) -> Checkpoint:
+    """Decode a checkpoint from bytes; raises CheckpointError on bad data."""
+    return read(io.BytesIO(data))
+
+
+def resume(store: 'CheckpointStore', a: int, N: int, input_num_bits: int, dtype: np.dtype) -> Optional[Checkpoint]:
+    """Return the latest resumable checkpoint of an (a, N) run in a store, or None."""
+    for stage in RESUMABLE_STAGES:
+        found = store.load(stage, a, N, input_num_bits, dtype)
+        if found is not None:
+            return found
+    return None
+
+
+class MemoryCheckpointStore:
+    """Checkpoints kept in memory for the lifetime of the process."""
+
+    def __init__(self):
+        self._checkpoints: Dict[Tuple, Checkpoint] = {}
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        """Store a copy of a checkpoint, replacing any with the same key."""
+        self._checkpoints[checkpoint.key] = Checkpoint(checkpoint.stage, checkpoint.a, checkpoint.N,
+                                                       checkpoint.input_num_bits, checkpoint.state.copy(),
+                                                       checkpoint.y)
+
+    def load(self, stage: str, a: int, N: int, input_num_bits: int, dtype: np.dtype) -> Optional[Checkpoint]:
+        """Return a copy of a stored checkpoint, or None."""
+        stored = self._checkpoints.get(checkpoint_key(stage, a, N, input_num_bits, dtype))
+        if stored is None:
+            return None
+        return Checkpoint(stored.stage, stored.a, stored.N, stored.input_num_bits, stored.state.copy(), stored.y)
+
+    def clear(self) -> None:
+        """Remove every checkpoint."""
+        self._checkpoints.clear()
+
+
+class DiskCheckpointStore:
+    """Checkpoints written atomically to a directory, one file each."""
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: Checkpoint directory, created if missing
+        """
+        if directory is None:
+            directory = os.getenv('SHOR_CHECKPOINT_DIR',
+                                  os.path.join(os.path.expanduser('~'), '.cache', 'shor-checkpoints'))
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: Tuple) -> str:
+        """Return the file holding the checkpoint with ``key``."""
+        name = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.ckpt")
+
+    def save(self, checkpoint: Checkpoint) -> None:
+        """Write a checkpoint, replacing any with the same key."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(checkpoint, f)
+            os.replace(tmp_path, self.path(checkpoint.key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, stage: str, a: int, N: int, input_num_bits: int, dtype: np.dtype) -> Optional[Checkpoint]:
+        """Read a checkpoint, or return None if it is missing; corrupt files are removed."""
+        path = self.path(checkpoint_key(stage, a, N, input_num_bits, dtype))
+        try:
+            with open(path, 'rb') as f:
+                return read(f)
+        except FileNotFoundError:
+            return None
+        except CheckpointError:
+            os.unlink(path)
+            return None
+
+    def clear(self) -> None:
+        """Remove every checkpoint."""
+        for name in os.listdir(self.directory):
+            if name.endswith('.ckpt'):
+                os.unlink(os.path.join(self.directory, name))
+
+
+CheckpointStore = Union[MemoryCheckpointStore, DiskCheckpointStore]
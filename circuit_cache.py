@@ -0,0 +1,213 @@
+"""
+Content-addressed on-disk cache of built and transpiled circuits.
+
+Entries are keyed by a hash of the parameters that determine a circuit
+(N, a, approach, QFT approximation, backend target, ...) and stored as a
+payload file (QPY for Qiskit circuits, ``.qp`` text for Q-Kit programs) next
+to a JSON metadata file holding the payload's SHA-256. Entries that fail the
+integrity check are dropped and rebuilt. The cache is bounded in size and
+evicts least recently used entries first.
+
+The cache directory defaults to ``~/.cache/shor-circuits`` and can be set with
+SHOR_CIRCUIT_CACHE; its size limit with SHOR_CIRCUIT_CACHE_SIZE (e.g. '1G').
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, List, Optional
+from backends import BackendUnavailableError, get_backend
+from memory import parse_bytes
+
+# Bump when circuit construction changes so stale entries are not reused.
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 512 << 20
+
+
+class CircuitCache:
+    """Size-bounded, content-addressed cache of circuit files."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            directory: Cache directory, created if missing
+            max_bytes: Total size above which least recently used entries are evicted
+        """
+        if directory is None:
+            directory = os.getenv('SHOR_CIRCUIT_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'shor-circuits'))
+        if max_bytes is None:
+            env = os.getenv('SHOR_CIRCUIT_CACHE_SIZE')
+            max_bytes = parse_bytes(env) if env else DEFAULT_MAX_BYTES
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(params: Dict[str, Any]) -> str:
+        """
+        Return the content address of a set of circuit parameters.
+
+        Args:
+            params: JSON-serializable parameters that fully determine the circuit
+
+        Returns:
+            str: Hex SHA-256 of the canonical parameter encoding
+        """
+        canonical = json.dumps({'version': CACHE_VERSION, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _paths(self, key: str, fmt: str):
+        base = os.path.join(self.directory, key)
+        return f"{base}.{fmt}", f"{base}.json"
+
+    def get(self, params: Dict[str, Any], fmt: str) -> Optional[bytes]:
+        """
+        Return a cached payload, or None on a miss or failed integrity check.
+
+        Args:
+            params: Circuit parameters
+            fmt: Payload format, used as the file extension ('qp' or 'qpy')
+        """
+        key = self.key(params)
+        payload_path, meta_path = self._paths(key, fmt)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(payload_path, 'rb') as f:
+                payload = f.read()
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if meta.get('key') != key or meta.get('sha256') != hashlib.sha256(payload).hexdigest():
+            self._remove(key, fmt)
+            self.misses += 1
+            return None
+
+        os.utime(payload_path)
+        self.hits += 1
+        return payload
+
+    def put(self, params: Dict[str, Any], fmt: str, payload: bytes) -> None:
+        """
+        Store a payload atomically, then evict entries beyond the size limit.
+
+        Args:
+            params: Circuit parameters
+            fmt: Payload format, used as the file extension ('qp' or 'qpy')
+            payload: Serialized circuit
+        """
+        key = self.key(params)
+        payload_path, meta_path = self._paths(key, fmt)
+        meta = {'key': key, 'format': fmt, 'sha256': hashlib.sha256(payload).hexdigest(),
+                'size': len(payload), 'params': params}
+        self._write_atomic(payload_path, payload)
+        self._write_atomic(meta_path, json.dumps(meta, default=str).encode())
+        self.evict()
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _remove(self, key: str, fmt: str) -> None:
+        for path in self._paths(key, fmt):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Return the key, format, size and last use time of every cached payload."""
+        entries = []
+        for name in os.listdir(self.directory):
+            key, _, fmt = name.partition('.')
+            if fmt in ('json', '') or fmt.endswith('tmp'):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append({'key': key, 'format': fmt, 'size': stat.st_size, 'used': stat.st_mtime})
+        return entries
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits max_bytes.
+
+        Returns:
+            int: Number of entries removed
+        """
+        entries = sorted(self.entries(), key=lambda e: e['used'])
+        total = sum(e['size'] for e in entries)
+        removed = 0
+        while entries and total > self.max_bytes:
+            entry = entries.pop(0)
+            self._remove(entry['key'], entry['format'])
+            total -= entry['size']
+            removed += 1
+        return removed
+
+    def get_or_build_qp(self, params: Dict[str, Any], build: Callable[[], str]) -> str:
+        """
+        Return a cached Q-Kit program, building and storing it on a miss.
+
+        Args:
+            params: Circuit parameters
+            build: Returns the program text
+
+        Returns:
+            str: The program text
+        """
+        payload = self.get(params, 'qp')
+        if payload is not None:
+            return payload.decode()
+        text = build()
+        self.put(params, 'qp', text.encode())
+        return text
+
+    def get_or_build_circuit(self, params: Dict[str, Any], build: Callable[[], Any]) -> Any:
+        """
+        Return a cached Qiskit circuit, building and storing it as QPY on a miss.
+
+        Args:
+            params: Circuit parameters
+            build: Returns the QuantumCircuit
+
+        Returns:
+            QuantumCircuit: The circuit
+        """
+        qpy = _get_qpy()
+        payload = self.get(params, 'qpy')
+        if payload is not None:
+            return qpy.load(io.BytesIO(payload))[0]
+        circuit = build()
+        buffer = io.BytesIO()
+        qpy.dump(circuit, buffer)
+        self.put(params, 'qpy', buffer.getvalue())
+        return circuit
+
+
+def _get_qpy() -> Any:
+    """Return Qiskit's QPY module, which moved between Qiskit releases."""
+    try:
+        return get_backend('qpy')
+    except BackendUnavailableError:
+        return get_backend('qpy_legacy')
+
+
+_DEFAULT_CACHE: Optional[CircuitCache] = None
+
+
+def default_cache() -> CircuitCache:
+    """Return the process-wide cache, created on first use."""
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = CircuitCache()
+    return _DEFAULT_CACHE
@@ -0,0 +1,321 @@
+"""
+Compact binary encoding of Q-Kit ``.qp`` programs.
+
+``largeCircuits.buildShorCommands`` emits one text command per gate, which
+for large N means millions of lines that take longer to parse than to
+simulate. The binary format stores the same program as fixed-width records
+in a NumPy structured array, so a reader memory-maps the file and hands
+gates to a simulator without parsing any text.
+
+The file is little-endian:
+
+- a header (``HEADER_DTYPE``): magic, format version, the number of
+  records, operands and string bytes, the qubit and classical bit counts
+  from AddQubits/AddCbits, and N and a when known (0 otherwise, or when
+  they do not fit in 64 bits);
+- the records (``RECORD_DTYPE``): opcode, gate, operand form, up to three
+  parameter keys and values, and the span of the record's operands (or of
+  its text, for comments and blank lines) in the pools below;
+- the operand pool, int64 qubit and bit indices;
+- the string pool, UTF-8 text of the records kept as text.
+
+Conversion is lossless: ``from_qp`` keeps any line it cannot encode
+exactly (comments, the timestamp, unknown commands) as a text record, and
+``to_qp`` reproduces the original program byte for byte.
+
+Example:
+    write('Shor-N15.qpb', qp_text, N=15, a=2)
+    for instruction in load('Shor-N15.qpb').instructions():
+        simulator.apply(instruction.opcode, instruction.gate, instruction.qubits, instruction.params)
+"""
+
+import math
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+
+# Eight bytes with no trailing NUL, which the 'S8' header field would drop.
+MAGIC = b'SHOR.QPB'
+FORMAT_VERSION = 1
+
+# Opcodes; TEXT records hold a line verbatim in the string pool.
+TEXT, ADD_QUBITS, ADD_CBITS, GATE_OP, MEASURE = range(5)
+OPCODES = {'AddQubits': ADD_QUBITS, 'AddCbits': ADD_CBITS, 'GateOp': GATE_OP, 'Measure': MEASURE}
+OPCODE_NAMES = {code: name for name, code in OPCODES.items()}
+
+# Gates emitted by largeCircuits; the index is the gate code.
+GATES = ('', 'SigmaX', 'Hadamard', 'QuModExpUaj', 'RPhase', 'Copy', 'CPHASE', 'SWAP')
+GATE_CODES = {name: code for code, name in enumerate(GATES) if name}
+
+# Operand forms: a comma-separated list, or an inclusive range 'lo:hi'.
+LIST, RANGE = 0, 1
+
+# Parameter keys as written in the text, with the name a simulator sees;
+# 'phi=PI/k' is stored as its divisor k.
+PARAM_KEYS = ('', 'a=', 'j=', 'N=', 'phi=PI/')
+PARAM_NAMES = ('', 'a', 'j', 'N', 'phi')
+PARAM_CODES = {key: code for code, key in enumerate(PARAM_KEYS) if key}
+MAX_PARAMS = 3
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'), ('version', '<u4'), ('reserved', '<u4'),
+    ('num_records', '<u8'), ('num_operands', '<u8'), ('num_string_bytes', '<u8'),
+    ('num_qubits', '<u8'), ('num_cbits', '<u8'), ('N', '<u8'), ('a', '<u8'),
+])
+RECORD_DTYPE = np.dtype([
+    ('opcode', 'u1'), ('gate', 'u1'), ('form', 'u1'), ('keys', 'u1', (MAX_PARAMS,)), ('reserved', 'u1', (2,)),
+    ('start', '<u8'), ('count', '<u4'), ('params', '<i8', (MAX_PARAMS,)),
+])
+OPERAND_DTYPE = np.dtype('<i8')
+
+_INT64 = np.iinfo(np.int64)
+_UINT64_MAX = np.iinfo(np.uint64).max
+
+
+class CircuitFormatError(ValueError):
+    """Raised when binary circuit data is truncated or of an unknown format."""
+
+
+class Instruction(NamedTuple):
+    """One executable command of a binary circuit."""
+    opcode: str
+    gate: str
+    qubits: np.ndarray
+    params: Dict[str, Union[int, float]]
+
+
+class BinaryCircuit:
+    """A binary circuit's header and its record, operand and string arrays."""
+
+    def __init__(self, header: np.ndarray, records: np.ndarray, operands: np.ndarray, strings: np.ndarray):
+        self.header = header
+        self.records = records
+        self.operands = operands
+        self.strings = strings
+
+    @property
+    def num_qubits(self) -> int:
+        return int(self.header['num_qubits'])
+
+    @property
+    def num_cbits(self) -> int:
+        return int(self.header['num_cbits'])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _qubits(self, record: np.void) -> np.ndarray:
+        start, count = int(record['start']), int(record['count'])
+        operands = self.operands[start:start + count]
+        if record['form'] == RANGE:
+            return np.arange(operands[0], operands[1] + 1, dtype=OPERAND_DTYPE)
+        return operands
+
+    def instructions(self) -> Iterator[Instruction]:
+        """
+        Yield the executable commands in program order, skipping text records.
+
+        Operand lists are views into the (memory-mapped) operand pool; ranges
+        are expanded.
+        """
+        for record in self.records:
+            opcode = int(record['opcode'])
+            if opcode == TEXT:
+                continue
+            params = {}
+            for key, value in zip(record['keys'], record['params']):
+                if key:
+                    params[PARAM_NAMES[key]] = math.pi / int(value) if PARAM_NAMES[key] == 'phi' else int(value)
+            yield Instruction(OPCODE_NAMES[opcode], GATES[record['gate']], self._qubits(record), params)
+
+    def lines(self) -> Iterator[str]:
+        """Yield the program's ``.qp`` text lines."""
+        for record in self.records:
+            start, count = int(record['start']), int(record['count'])
+            if record['opcode'] == TEXT:
+                yield self.strings[start:start + count].tobytes().decode()
+            else:
+                yield _format_line(record, self.operands[start:start + count])
+
+
+def _format_operands(form: int, operands: np.ndarray) -> str:
+    if form == RANGE:
+        return f"{operands[0]}:{operands[1]}"
+    return ','.join(str(operand) for operand in operands)
+
+
+def _format_line(record: np.void, operands: np.ndarray) -> str:
+    opcode = int(record['opcode'])
+    parts = [OPCODE_NAMES[opcode]]
+    if opcode == GATE_OP:
+        parts.append(GATES[record['gate']])
+    parts.append(_format_operands(int(record['form']), operands))
+    parts.extend(PARAM_KEYS[key] + str(value) for key, value in zip(record['keys'], record['params']) if key)
+    return ' '.join(parts)
+
+
+def _parse_operands(text: str) -> Optional[Tuple[int, List[int]]]:
+    try:
+        if ':' in text:
+            lo, hi = text.split(':')
+            return RANGE, [int(lo), int(hi)]
+        return LIST, [int(operand) for operand in text.split(',')]
+    except ValueError:
+        return None
+
+
+def _encode_line(line: str) -> Optional[Tuple[Tuple, List[int]]]:
+    """Return a record's fields and operands for line, or None if it must stay text."""
+    tokens = line.split(' ')
+    opcode = OPCODES.get(tokens[0])
+    if opcode is None:
+        return None
+    gate = 0
+    if opcode == GATE_OP:
+        if len(tokens) < 3 or tokens[1] not in GATE_CODES:
+            return None
+        gate = GATE_CODES[tokens[1]]
+        tokens = tokens[1:]
+    if len(tokens) < 2 or len(tokens) - 2 > MAX_PARAMS:
+        return None
+    parsed = _parse_operands(tokens[1])
+    if parsed is None:
+        return None
+    form, operands = parsed
+
+    keys, params = [0] * MAX_PARAMS, [0] * MAX_PARAMS
+    for i, token in enumerate(tokens[2:]):
+        key = next((k for k in PARAM_KEYS[1:] if token.startswith(k)), None)
+        if key is None:
+            return None
+        try:
+            value = int(token[len(key):])
+        except ValueError:
+            return None
+        if key == 'phi=PI/' and value == 0:
+            # Kept verbatim rather than decoded into a division by zero.
+            return None
+        keys[i], params[i] = PARAM_CODES[key], value
+    if not all(_INT64.min <= value <= _INT64.max for value in operands + params):
+        return None
+    return (opcode, gate, form, tuple(keys), (0, 0), 0, len(operands), tuple(params)), operands
+
+
+def from_qp(text: str, N: Optional[int] = None, a: Optional[int] = None) -> BinaryCircuit:
+    """
+    Encode a ``.qp`` program.
+
+    Args:
+        text: Program text
+        N: Modulus the program factors, recorded in the header
+        a: Base the program uses, recorded in the header
+
+    Returns:
+        BinaryCircuit: The encoded program, held in memory
+    """
+    lines = text.split('\n')
+    records = np.zeros(len(lines), dtype=RECORD_DTYPE)
+    operand_pool: List[int] = []
+    string_pool = bytearray()
+    num_qubits = num_cbits = 0
+
+    for i, line in enumerate(lines):
+        encoded = _encode_line(line)
+        if encoded is not None:
+            fields, operands = encoded
+            record = np.array(fields, dtype=RECORD_DTYPE)
+            # Only lines that format back to themselves are encoded, e.g. '01' stays text.
+            if _format_line(record, np.array(operands, dtype=OPERAND_DTYPE)) != line:
+                encoded = None
+        if encoded is None:
+            data = line.encode()
+            records[i] = (TEXT, 0, LIST, (0,) * MAX_PARAMS, (0, 0), len(string_pool), len(data), (0,) * MAX_PARAMS)
+            string_pool += data
+            continue
+        record['start'] = len(operand_pool)
+        records[i] = record
+        operand_pool.extend(operands)
+        if fields[0] == ADD_QUBITS:
+            num_qubits += sum(operands)
+        elif fields[0] == ADD_CBITS:
+            num_cbits += sum(operands)
+
+    header = np.zeros((), dtype=HEADER_DTYPE)
+    header['magic'], header['version'] = MAGIC, FORMAT_VERSION
+    header['num_records'], header['num_operands'] = len(records), len(operand_pool)
+    header['num_string_bytes'] = len(string_pool)
+    header['num_qubits'], header['num_cbits'] = num_qubits, num_cbits
+    header['N'] = N if N is not None and 0 <= N <= _UINT64_MAX else 0
+    header['a'] = a if a is not None and 0 <= a <= _UINT64_MAX else 0
+    return BinaryCircuit(header, records, np.array(operand_pool, dtype=OPERAND_DTYPE),
+                         np.frombuffer(bytes(string_pool), dtype=np.uint8))
+
+
+def to_qp(circuit: BinaryCircuit) -> str:
+    """Decode a binary circuit back to its ``.qp`` program text."""
+    return '\n'.join(circuit.lines())
+
+
+def dump(circuit: BinaryCircuit, f: BinaryIO) -> None:
+    """
+    Write a binary circuit.
+
+    Args:
+        circuit: Circuit to write
+        f: File opened for binary writing
+    """
+    for array in (circuit.header, circuit.records, circuit.operands, circuit.strings):
+        f.write(np.ascontiguousarray(array).tobytes())
+
+
+def write(path: str, text: str, N: Optional[int] = None, a: Optional[int] = None) -> None:
+    """
+    Encode a ``.qp`` program and write it to path.
+
+    Args:
+        path: Output file
+        text: Program text
+        N: Modulus the program factors, recorded in the header
+        a: Base the program uses, recorded in the header
+    """
+    with open(path, 'wb') as f:
+        dump(from_qp(text, N, a), f)
+
+
+def load(path: str, mmap: bool = True) -> BinaryCircuit:
+    """
+    Open a binary circuit file.
+
+    Args:
+        path: File written by ``write`` or ``dump``
+        mmap: Memory-map the arrays instead of reading them into memory
+
+    Returns:
+        BinaryCircuit: The circuit
+
+    Raises:
+        CircuitFormatError: If the file is truncated or not a binary circuit
+    """
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header[0]['magic'] != MAGIC:
+        raise CircuitFormatError(f"{path} is not a binary circuit")
+    header = header[0]
+    if header['version'] != FORMAT_VERSION:
+        raise CircuitFormatError(f"Unsupported binary circuit version {header['version']}")
+
+    sections = ((RECORD_DTYPE, int(header['num_records'])), (OPERAND_DTYPE, int(header['num_operands'])),
+                (np.dtype(np.uint8), int(header['num_string_bytes'])))
+    offset = HEADER_DTYPE.itemsize
+    size = offset + sum(dtype.itemsize * count for dtype, count in sections)
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        if f.tell() < size:
+            raise CircuitFormatError(f"{path} is truncated")
+
+    arrays = []
+    for dtype, count in sections:
+        if mmap and count:
+            arrays.append(np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,)))
+        else:
+            arrays.append(np.fromfile(path, dtype=dtype, count=count, offset=offset))
+        offset += dtype.itemsize * count
+    return BinaryCircuit(header, *arrays)
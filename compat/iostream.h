@@ -0,0 +1,4 @@
+// Pre-standard <iostream.h> shim so the original simulator sources build
+// with modern compilers.
+#include <iostream>
+using namespace std;
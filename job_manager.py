@@ -0,0 +1,259 @@
+"""
+Asynchronous job manager for factoring jobs.
+
+Factoring jobs are submitted concurrently to a provider through one shared
+session, with a bound on the number of jobs in flight, result polling, and
+retries with exponential backoff on transient failures.
+
+Two providers ship with the manager:
+
+- ``LocalProvider`` runs the in-repo simulator in worker processes, so the
+  manager can be exercised offline.
+- ``IBMQProvider`` runs Qiskit Aqua's Shor algorithm on an IBM Quantum backend.
+
+Example:
+    results = run_jobs([15, 21, 33], LocalProvider(engine='classical'))
+"""
+
+import asyncio
+import contextlib
+import io
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+# Job statuses reported by providers.
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+
+class TransientJobError(Exception):
+    """A job failure that is worth retrying, e.g. a dropped connection or full queue."""
+
+
+@dataclass
+class JobResult:
+    """Outcome of one factoring job."""
+    N: int
+    factors: Optional[List[int]]
+    submissions: int
+    elapsed: float
+    error: Optional[str] = None
+
+
+class Provider:
+    """
+    Interface of a job provider.
+
+    A provider hands out one session from connect(), which the manager reuses
+    for every submission, status poll and result fetch.
+    """
+
+    async def connect(self) -> Any:
+        """Open and return a session."""
+        raise NotImplementedError
+
+    async def submit(self, session: Any, N: int) -> Any:
+        """Submit a factoring job for N and return a job handle."""
+        raise NotImplementedError
+
+    async def status(self, session: Any, job: Any) -> str:
+        """Return the job's status: QUEUED, RUNNING, DONE or ERROR."""
+        raise NotImplementedError
+
+    async def result(self, session: Any, job: Any) -> Optional[List[int]]:
+        """Return the factors found by a finished job, or None."""
+        raise NotImplementedError
+
+    async def close(self, session: Any) -> None:
+        """Release the session."""
+
+
+class _ExecutorProvider(Provider):
+    """Provider whose jobs are futures of blocking calls run in an executor."""
+
+    async def status(self, session: Executor, job: Future) -> str:
+        if not job.done():
+            return RUNNING if job.running() else QUEUED
+        return ERROR if job.exception() is not None else DONE
+
+    async def result(self, session: Executor, job: Future) -> Optional[List[int]]:
+        return job.result()
+
+    async def close(self, session: Executor) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, session.shutdown)
+
+
+def _local_factor(N: int, attempts: int, engine: str, timeout: Optional[float] = None) -> Optional[List[int]]:
+    from cancellation import Deadline
+    from shor_2_0 import execute_shors
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = execute_shors(N, attempts=attempts, engine=engine, deadline=Deadline(timeout))
+    return None if result is None else list(result)
+
+
+class LocalProvider(_ExecutorProvider):
+    """Stand-in provider running shor_2_0.execute_shors in local worker processes."""
+
+    def __init__(self, workers: Optional[int] = None, attempts: int = 20, engine: str = 'object',
+                 timeout: Optional[float] = None):
+        """
+        Args:
+            workers: Number of worker processes, defaults to the CPU count
+            attempts: Attempts passed to execute_shors
+            engine: Period-finding engine passed to execute_shors
+            timeout: Seconds a job may run before it stops and fails with
+                cancellation.DeadlineExceeded, or None for no limit
+        """
+        self.workers = workers
+        self.attempts = attempts
+        self.engine = engine
+        self.timeout = timeout
+
+    async def connect(self) -> Executor:
+        return ProcessPoolExecutor(self.workers)
+
+    async def submit(self, session: Executor, N: int) -> Future:
+        return session.submit(_local_factor, N, self.attempts, self.engine, self.timeout)
+
+
+def _aqua_factor(N: int, backend: Any, shots: int) -> List[List[int]]:
+    from backends import get_backend
+    Shor = get_backend('aqua_shor')
+    QuantumInstance = get_backend('quantum_instance')
+    return Shor(N).run(QuantumInstance(backend, shots=shots, skip_qobj_validation=False))['factors']
+
+
+class IBMQProvider(_ExecutorProvider):
+    """Provider running Qiskit Aqua's Shor algorithm on an IBM Quantum backend."""
+
+    def __init__(self, api_token: Optional[str] = None, shots: int = 1, workers: int = 8,
+                 factor: Optional[Callable[[int, Any, int], List]] = None):
+        """
+        Args:
+            api_token: IBM Quantum API token, defaults to IBMQ_API_TOKEN
+            shots: Number of shots per job
+            workers: Number of jobs waiting on the backend at once
+            factor: Blocking call (N, backend, shots) -> factors, defaults to
+                running Aqua's Shor directly
+        """
+        self.api_token = api_token
+        self.shots = shots
+        self.workers = workers
+        self.factor = factor or _aqua_factor
+        self.backend = None
+
+    async def connect(self) -> Executor:
+        from main import setup_quantum_backend
+        session = ThreadPoolExecutor(self.workers)
+        loop = asyncio.get_running_loop()
+        self.backend = await loop.run_in_executor(session, setup_quantum_backend, self.api_token)
+        return session
+
+    async def submit(self, session: Executor, N: int) -> Future:
+        return session.submit(self._run, N)
+
+    def _run(self, N: int) -> Optional[List[int]]:
+        try:
+            factors = self.factor(N, self.backend, self.shots)
+        except (ConnectionError, TimeoutError) as e:
+            raise TransientJobError(str(e)) from e
+        # Aqua reports a list of factor pairs.
+        if factors and isinstance(factors[0], (list, tuple)):
+            factors = factors[0]
+        return list(factors) if factors else None
+
+
+class JobManager:
+    """
+    Submits factoring jobs concurrently through one provider session.
+
+    Use as an async context manager so the session is opened once and closed
+    when all jobs are done.
+    """
+
+    def __init__(self, provider: Provider, max_in_flight: int = 4, retries: int = 3,
+                 backoff: float = 0.5, poll_interval: float = 0.05):
+        """
+        Args:
+            provider: Provider to submit jobs to
+            max_in_flight: Maximum number of jobs submitted and not yet finished
+            retries: Resubmissions of a job after a transient failure
+            backoff: Delay in seconds before the first retry, doubled on each retry
+            poll_interval: Delay in seconds between status polls
+        """
+        self.provider = provider
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.session: Any = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'JobManager':
+        self.session = await self.provider.connect()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.provider.close(self.session)
+        self.session = None
+
+    async def _wait(self, job: Any) -> Optional[List[int]]:
+        while True:
+            status = await self.provider.status(self.session, job)
+            if status in (DONE, ERROR):
+                return await self.provider.result(self.session, job)
+            await asyncio.sleep(self.poll_interval)
+
+    async def factor(self, N: int) -> JobResult:
+        """
+        Factor N, retrying transient failures with exponential backoff.
+
+        Args:
+            N: Number to factor
+
+        Returns:
+            JobResult: Factors found, or the error of the last submission
+        """
+        start = time.perf_counter()
+        error = None
+        for submission in range(1, self.retries + 2):
+            try:
+                async with self._slots:
+                    job = await self.provider.submit(self.session, N)
+                    factors = await self._wait(job)
+                return JobResult(N, factors, submission, time.perf_counter() - start)
+            except (TransientJobError, ConnectionError, TimeoutError) as e:
+                error = str(e)
+                if submission <= self.retries:
+                    await asyncio.sleep(self.backoff * 2 ** (submission - 1))
+            except Exception as e:
+                return JobResult(N, None, submission, time.perf_counter() - start, str(e))
+        return JobResult(N, None, self.retries + 1, time.perf_counter() - start, error)
+
+    async def factor_all(self, numbers: Sequence[int]) -> List[JobResult]:
+        """Factor every number concurrently, returning results in input order."""
+        return list(await asyncio.gather(*(self.factor(N) for N in numbers)))
+
+
+def run_jobs(numbers: Sequence[int], provider: Optional[Provider] = None, **options: Any) -> List[JobResult]:
+    """
+    Factor numbers concurrently from synchronous code.
+
+    Args:
+        numbers: Numbers to factor
+        provider: Provider to use, defaults to a LocalProvider
+        **options: Options passed to JobManager
+
+    Returns:
+        List[JobResult]: One result per number, in input order
+    """
+    async def run() -> List[JobResult]:
+        async with JobManager(provider or LocalProvider(), **options) as manager:
+            return await manager.factor_all(numbers)
+
+    return asyncio.run(run())
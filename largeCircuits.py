@@ -1,12 +1,32 @@
 import datetime
 from math import log2
 
-def buildShorQP (N = None, a = 2, file = None, approach = '3nx1'):
+def buildShorQP (N = None, a = 2, file = None, approach = '3nx1', cache = None, binary = False):
 
-    # Output file for Quantum Program
+    # Output file for Quantum Program, in the binary encoding if asked for.
     if not file:
-        file = 'Shor-N'+str(N)+'-a'+str(a)+'-'+approach+'.qp'
-    
+        file = 'Shor-N'+str(N)+'-a'+str(a)+'-'+approach+('.qpb' if binary else '.qp')
+
+    # Reuse a previously generated program from the circuit cache if given.
+    if cache is None:
+        program = '\n'.join(buildShorCommands(N, a, approach))
+    else:
+        params = {'kind': 'qkit', 'N': N, 'a': a, 'approach': approach}
+        program = cache.get_or_build_qp(params, lambda: '\n'.join(buildShorCommands(N, a, approach)))
+
+    # Binary programs are memory-mapped by circuit_format.load instead of parsed.
+    if binary:
+        import circuit_format
+        circuit_format.write(file, program, N, a)
+        return
+
+    # Write commands to .qp file to be loaded directly to Q-Kit.
+    filePtr = open(file, 'w')
+    filePtr.write(program)
+    filePtr.close()
+
+def buildShorCommands (N = None, a = 2, approach = '3nx1'):
+
     # Timestamp the command generation.
     cmds = []
     cmds.append('#! '+datetime.datetime.now().strftime("%Y-%m-%d %H:%M"))
@@ -90,11 +110,9 @@ def buildShorQP (N = None, a = 2, file = None, approach = '3nx1'):
         for i in range(nCQ//2):
             cmds.append('GateOp SWAP '+str(i)+','+str(nCQ-i-1))
  
-    # Write commands to .qp file to be loaded directly to Q-Kit.
-    filePtr = open(file, 'w')
-    filePtr.write('\n'.join(cmds))
-    filePtr.close()
+    return cmds
 
 # Run function to build Shor's factorization QP with choice of N and a.
-buildShorQP(N=15, a=2, approach='nx2n')
-buildShorQP(N=15, a=2, approach='3nx1')
\ No newline at end of file
+if __name__ == '__main__':
+    buildShorQP(N=15, a=2, approach='nx2n')
+    buildShorQP(N=15, a=2, approach='3nx1')
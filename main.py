@@ -5,15 +5,17 @@ This script demonstrates both the Qiskit implementation and a custom implementat
 of Shor's algorithm for integer factorization.
 """
 
-from typing import List, Optional, Tuple
+from typing import TYPE_CHECKING, List, Optional, Tuple
 import os
-import numpy as np
-from qiskit import IBMQ
-from qiskit.aqua import QuantumInstance
-from qiskit.providers.ibmq import IBMQBackend
+from backends import get_backend
+from cancellation import Deadline, DeadlineExceeded
+from planner import Planner
 from shors import Shors
 
-def setup_quantum_backend(api_token: Optional[str] = None) -> IBMQBackend:
+if TYPE_CHECKING:
+    from qiskit.providers.ibmq import IBMQBackend
+
+def setup_quantum_backend(api_token: Optional[str] = None) -> 'IBMQBackend':
     """
     Set up connection to IBM Quantum backend.
     
@@ -31,6 +33,7 @@ def setup_quantum_backend(api_token: Optional[str] = None) -> IBMQBackend:
         if api_token is None:
             raise ValueError("IBMQ API token not provided and IBMQ_API_TOKEN environment variable not set")
             
+    IBMQ = get_backend('ibmq')
     IBMQ.enable_account(api_token)
     provider = IBMQ.get_provider(hub='ibm-q')
     return provider.get_backend('ibmq_qasm_simulator')
@@ -42,33 +45,46 @@ def find_period(a: int, N: int, factors: Shors) -> Optional[int]:
     Args:
         a: Base number
         N: Modulus
-        factors: Shors instance
+        factors: Shors instance, whose deadline bounds the coprime scan
         
     Returns:
         Optional[int]: Period if found, None otherwise
+        
+    Raises:
+        DeadlineExceeded: If the deadline passes before a period is found
     """
+    timeout = None
     try:
-        xvals = factors.find_coprimes()
-        yvals = [np.mod(a ** x, N) for x in xvals]
+        try:
+            xvals = factors.find_coprimes()
+        except DeadlineExceeded as e:
+            # A period among the coprimes scanned so far is still a period.
+            xvals, timeout = e.partial or [], e
+        yvals = [pow(a, x, N) for x in xvals]
         
         # Find first occurrence of 1 after index 0
         try:
             r = yvals[1:].index(1) + 1
             return r
         except ValueError:
+            if timeout is not None:
+                raise timeout
             return None
             
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Error finding period: {str(e)}")
         return None
 
-def factor_number(N: int, a: int = 3) -> Optional[List[int]]:
+def factor_number(N: int, a: int = 3, timeout: Optional[float] = None) -> Optional[List[int]]:
     """
     Factor a number using Shor's algorithm.
     
     Args:
         N: Number to factor
         a: Base number for modular exponentiation
+        timeout: Seconds to spend before giving up, or None for no limit
         
     Returns:
         Optional[List[int]]: List of factors if found, None otherwise
@@ -77,7 +93,7 @@ def factor_number(N: int, a: int = 3) -> Optional[List[int]]:
         if N < 2:
             raise ValueError("Number to factor must be greater than 1")
             
-        factors = Shors(N, a)
+        factors = Shors(N, a, Deadline(timeout))
         r = find_period(a, N, factors)
         
         if r is None:
@@ -90,6 +106,9 @@ def factor_number(N: int, a: int = 3) -> Optional[List[int]]:
             
         return None
         
+    except DeadlineExceeded as e:
+        print(f"Timed out factoring {N}: {str(e)}")
+        return None
     except Exception as e:
         print(f"Error factoring {N}: {str(e)}")
         return None
@@ -105,18 +124,22 @@ def main() -> None:
         N = int(input("Enter a number to factor: "))
         N2 = int(input("Enter another number to factor: "))
         
+        # The planner picks the cheapest engine for each number; it only loads
+        # the NumPy engines for numbers classical triage cannot settle.
+        planner = Planner.from_benchmark(os.environ['SHOR_CALIBRATION']) if os.getenv('SHOR_CALIBRATION') else Planner()
+
         # Factor first number
         print(f"\nFactoring {N}...")
-        factors = factor_number(N)
+        factors = planner.run(N)
         if factors:
-            print(f"The prime factors of {N} are: {factors}")
+            print(f"The factors of {N} are: {list(factors)} (via {planner.decisions[-1]['engine']})")
             
         # Factor second number if it's large enough
         if N2 > 15:
             print(f"\nFactoring {N2}...")
-            factors2 = factor_number(N2)
+            factors2 = planner.run(N2)
             if factors2:
-                print(f"The prime factors of {N2} are: {factors2}")
+                print(f"The factors of {N2} are: {list(factors2)} (via {planner.decisions[-1]['engine']})")
                 
     except ValueError as e:
         print(f"Invalid input: {str(e)}")
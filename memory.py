@@ -0,0 +1,329 @@
+"""
+Memory model and admission control for period-finding simulations.
+
+Each engine has a model predicting the bytes live at the end of every stage
+of a ``get_period`` run, from which the peak is taken. Before allocating, the
+simulator asks ``admit`` for the first engine in its preference list whose
+predicted peak fits the budget; if none fits, ``MemoryBudgetExceeded`` is
+raised instead of letting the process be OOM-killed.
+
+Observed peak RSS is compared with the prediction after every run large
+enough to measure, and the median observed/predicted ratio scales later
+predictions so the model stays calibrated on the host it runs on. RSS growth
+under-reports when a run reuses memory freed by an earlier one, so the
+calibration only ever raises predictions.
+"""
+
+import os
+import resource
+import statistics
+import threading
+from fractions import Fraction
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Bytes per object in the object simulator, measured with tracemalloc on CPython 3.11.
+STATE_BYTES = 200  # QuantumState with its entanglement dict
+ENTANGLE_BYTES = 129  # QuantumMapping (and its complex amplitude) stored on one side of an entanglement
+TENSOR_BYTES = 184  # Transient map_tensor_x/map_tensor_y entry built by set_map
+ORACLE_BYTES = 260  # Codomain list and QuantumMapping built per input state by the oracle mapping
+TRANSFORM_BYTES = 340  # Per state while set_transform rebuilds the amplitudes in place
+CLASSICAL_BYTES = 4096  # Order finding keeps a handful of integers alive
+AMPLITUDE_BYTES = 16  # complex128 amplitude in the state-vector engines (8 for complex64)
+OBJECT_TABLE_BYTES = 8 + 36  # Pointer and Python int per residue when N >= 2^32
+
+# Only runs predicted to allocate at least this much are used for calibration,
+# smaller ones are lost in interpreter noise.
+MIN_CALIBRATION_BYTES = 16 << 20
+CALIBRATION_WINDOW = 20
+
+_SUFFIXES = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """Raised when no candidate engine fits within the memory budget."""
+
+
+def parse_bytes(text: str) -> int:
+    """
+    Parse a byte count such as '1048576', '512M' or '2G'.
+
+    Args:
+        text: Byte count with an optional K/M/G/T suffix
+
+    Returns:
+        int: Number of bytes
+    """
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def default_budget() -> Optional[int]:
+    """
+    Return the memory budget used when none is given.
+
+    The SHOR_MEMORY_BUDGET environment variable takes precedence; otherwise
+    80% of the currently available physical memory is used (MemAvailable,
+    which counts reclaimable page cache, where /proc/meminfo has it, else
+    free pages), or None (no limit) where that cannot be determined.
+    """
+    env = os.getenv('SHOR_MEMORY_BUDGET')
+    if env:
+        return parse_bytes(env)
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(0.8 * int(line.split()[1]) * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return int(0.8 * os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE'))
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _object_model(N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> Dict[str, int]:
+    Q = 1 << input_num_bits
+    registers = (Q + (1 << N.bit_length())) * STATE_BYTES
+    # The oracle entangles each input state with exactly one output state.
+    entangled = registers + 2 * Q * ENTANGLE_BYTES
+    return {
+        'registers': registers,
+        'hadamard': registers + Q * TRANSFORM_BYTES,
+        'oracle': entangled + Q * (2 * TENSOR_BYTES + ORACLE_BYTES),
+        'measure': entangled + 2 * Q * 8,
+        'qft': registers + Q * TRANSFORM_BYTES,
+    }
+
+
+def _vector_model(N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> Dict[str, int]:
+    Q = 1 << input_num_bits
+    state = Q * amplitude_bytes
+    table = Q * 8 if N < 1 << 32 else Q * OBJECT_TABLE_BYTES
+    return {
+        'registers': state,
+        # Butterfly chunks copy their upper half.
+        'hadamard': state + state // 2,
+        # Square-and-multiply holds exponents, results, masks and their temporaries.
+        'oracle': state + table + Q * 26,
+        # Probabilities and their double-precision cumulative sum.
+        'measure': state + table + Q * (amplitude_bytes // 2 + 8),
+        # Bit-reversal indices, the reordered copy and the twiddle table.
+        'qft': 2 * state + Q * 24,
+    }
+
+
+def _native_model(N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> Dict[str, int]:
+    Q = 1 << input_num_bits
+    # The C++ register always holds complex128 amplitudes.
+    state = Q * AMPLITUDE_BYTES
+    table = Q * 8 if N < 1 << 32 else Q * OBJECT_TABLE_BYTES
+    return {
+        'registers': state,
+        'oracle': state + table + Q * 26,
+        'measure': state + table + Q * 16,
+        # DFT builds the transformed state in a second array (the NumPy
+        # fallback's FFT needs one more).
+        'qft': 3 * state,
+    }
+
+
+def _sharded_model(N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> Dict[str, int]:
+    from sharded import ORACLE_CHUNK, default_shards
+    Q = 1 << input_num_bits
+    state = Q * amplitude_bytes
+    shards = max(1, min(default_shards(), Q // 2))
+    return {
+        # Shards live in shared memory, counted once across all workers.
+        'registers': state,
+        # Every worker copies the upper half of its butterflies.
+        'hadamard': state + state // 2,
+        'oracle': state + shards * min(ORACLE_CHUNK, Q // shards) * (8 + 26),
+        # Sampling holds the probabilities and their cumulative sum for one shard.
+        'measure': state + (amplitude_bytes // 2 + 8) * Q // shards,
+        'qft': state + state // 2,
+    }
+
+
+def _classical_model(N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> Dict[str, int]:
+    return {'order_finding': CLASSICAL_BYTES}
+
+
+def _analytic_model(N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> Dict[str, int]:
+    # Factorizations and a handful of integers of about input_num_bits bits.
+    return {'order_finding': CLASSICAL_BYTES + input_num_bits, 'measure': CLASSICAL_BYTES + input_num_bits}
+
+
+# Engine name -> model mapping (N, input_num_bits, amplitude_bytes) to bytes
+# live per stage. Engines without an amplitude array ignore amplitude_bytes.
+ENGINE_MODELS: Dict[str, Callable[..., Dict[str, int]]] = {
+    'object': _object_model,
+    'vector': _vector_model,
+    'sharded': _sharded_model,
+    'native': _native_model,
+    'analytic': _analytic_model,
+    'classical': _classical_model,
+}
+
+_OBSERVATIONS: Dict[str, List[float]] = {}
+
+
+def register_model(engine: str, model: Callable[..., Dict[str, int]]) -> None:
+    """Register the memory model of an engine."""
+    ENGINE_MODELS[engine] = model
+
+
+def estimate(engine: str, N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> Dict[str, int]:
+    """
+    Predict the bytes live at the end of every stage, scaled by the engine's calibration.
+
+    Args:
+        engine: Engine name
+        N: Modulus
+        input_num_bits: Size of the input register in bits
+        amplitude_bytes: Bytes per amplitude of state-vector engines
+
+    Returns:
+        Dict[str, int]: Stage name -> predicted bytes
+    """
+    # Exact, as float(size) overflows for the models of N above ~500 bits.
+    factor = Fraction(calibration_factor(engine))
+    model = ENGINE_MODELS[engine](N, input_num_bits, amplitude_bytes)
+    return {name: int(size * factor) for name, size in model.items()}
+
+
+def predicted_peak(engine: str, N: int, input_num_bits: int, amplitude_bytes: int = AMPLITUDE_BYTES) -> int:
+    """Predict the peak bytes of a run of ``engine``."""
+    return max(estimate(engine, N, input_num_bits, amplitude_bytes).values())
+
+
+def admit(N: int, input_num_bits: int, engines: Sequence[str], budget: Optional[int] = None,
+          amplitude_bytes: int = AMPLITUDE_BYTES) -> str:
+    """
+    Pick the first engine whose predicted peak fits the budget.
+
+    Args:
+        N: Modulus
+        input_num_bits: Size of the input register in bits
+        engines: Candidate engines in order of preference
+        budget: Budget in bytes, defaults to default_budget()
+        amplitude_bytes: Bytes per amplitude of state-vector engines
+
+    Returns:
+        str: The admitted engine
+
+    Raises:
+        MemoryBudgetExceeded: If no engine fits
+    """
+    if budget is None:
+        budget = default_budget()
+    predictions: List[Tuple[str, int]] = []
+    for engine in engines:
+        peak = predicted_peak(engine, N, input_num_bits, amplitude_bytes)
+        if budget is None or peak <= budget:
+            return engine
+        predictions.append((engine, peak))
+    # Integer division, as the peaks of very large N overflow a float.
+    details = ', '.join(f"{engine}: {peak // (1 << 20)} MiB" for engine, peak in predictions)
+    raise MemoryBudgetExceeded(f"Simulating N={N} with {input_num_bits} input bits needs more than the "
+                               f"{budget / (1 << 20):.1f} MiB budget ({details})")
+
+
+def max_batch(engine: str, N: int, input_num_bits: int, count: int, budget: Optional[int] = None,
+              amplitude_bytes: int = AMPLITUDE_BYTES) -> int:
+    """
+    Return how many runs of an engine fit the budget side by side, at most ``count``.
+
+    Args:
+        engine: Engine name
+        N: Modulus
+        input_num_bits: Size of the input register in bits
+        count: Number of runs wanted
+        budget: Budget in bytes, defaults to default_budget()
+        amplitude_bytes: Bytes per amplitude of state-vector engines
+
+    Returns:
+        int: Batch size, at least 1
+
+    Raises:
+        MemoryBudgetExceeded: If not even one run fits
+    """
+    if budget is None:
+        budget = default_budget()
+    admit(N, input_num_bits, [engine], budget, amplitude_bytes)
+    if budget is None:
+        return count
+    return max(1, min(count, budget // predicted_peak(engine, N, input_num_bits, amplitude_bytes)))
+
+
+def current_rss() -> int:
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the lifetime peak in KiB, the best available fallback.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def record_observation(engine: str, predicted: int, observed: int) -> None:
+    """
+    Record the observed peak growth of a run against its uncalibrated prediction.
+
+    Runs predicted below MIN_CALIBRATION_BYTES are ignored.
+    """
+    if predicted < MIN_CALIBRATION_BYTES or observed <= 0:
+        return
+    history = _OBSERVATIONS.setdefault(engine, [])
+    history.append(observed / predicted)
+    del history[:-CALIBRATION_WINDOW]
+
+
+def calibration_factor(engine: str) -> float:
+    """Return the median observed/predicted ratio of an engine, never below 1.0."""
+    history = _OBSERVATIONS.get(engine)
+    return max(1.0, statistics.median(history)) if history else 1.0
+
+
+class PeakRSSTracker:
+    """
+    Context manager sampling RSS in a background thread while a run executes.
+
+    On exit the peak growth over the starting RSS is stored in ``peak_bytes``
+    and recorded against the engine's prediction for calibration. Runs
+    predicted below MIN_CALIBRATION_BYTES would not be recorded, so they are
+    not sampled at all and ``peak_bytes`` stays 0.
+    """
+
+    def __init__(self, engine: str, N: int, input_num_bits: int, interval: float = 0.005,
+                 amplitude_bytes: int = AMPLITUDE_BYTES):
+        self.engine = engine
+        self.predicted = max(ENGINE_MODELS[engine](N, input_num_bits, amplitude_bytes).values())
+        self.interval = interval
+        self.peak_bytes = 0
+        self._start = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, current_rss() - self._start)
+
+    def __enter__(self) -> 'PeakRSSTracker':
+        if self.predicted < MIN_CALIBRATION_BYTES:
+            return self
+        self._start = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, current_rss() - self._start)
+        if exc_info[0] is None:
+            record_observation(self.engine, self.predicted, self.peak_bytes)
@@ -0,0 +1,376 @@
+"""
+Compiler expanding controlled modular exponentiation into reversible gates.
+
+``largeCircuits`` emits modular exponentiation as one opaque ``QuModExpUaj``
+gate per exponent qubit, which can neither be simulated gate by gate nor
+costed. ``compile_modexp`` expands |e>|1> -> |e>|a^e mod N> into X, CX and
+multi-controlled X gates (named 'c' * controls + 'x'):
+
+- ``ripple_adder``: Cuccaro's ripple-carry adder, b += k over n + 1 bits;
+- ``modular_adder``: b = (b + k) mod N from four adder calls, with N held
+  in a constant register;
+- ``lookup``: XORs a classical table entry, addressed by control qubits,
+  into a register;
+- ``multiplier``: out-of-place multiply-accumulate by a^(e 2^j) mod N for
+  every value e of a window of exponent qubits, followed by the uncompute
+  of the input with the inverse factor, so the product ends up in the
+  other work register and registers swap roles instead of being swapped.
+
+Windowed exponentiation looks up ``exponent_window`` exponent qubits
+together with ``multiplicand_window`` multiplicand bits at a time, cutting
+the number of modular additions by about their product at the cost of
+larger table lookups. Multiplications by 1 (once a^(2^j) = 1 mod N) are
+skipped.
+
+Every builder is memoized: subcircuits are built once per distinct
+parameters and shared by reference, within one circuit (across exponent
+bits whose factors repeat) and across calls. Gate counts are computed per
+subcircuit and multiplied by their number of calls, so costing a circuit
+never flattens it.
+
+The circuit only permutes basis states, so ``evaluate`` checks it on
+classical inputs.
+"""
+
+import functools
+import math
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+Gate = Tuple  # (name, *wires), the target last
+
+
+class Subcircuit:
+    """A named sequence of gates and calls to other subcircuits on local wires 0..num_wires-1."""
+
+    def __init__(self, name: str, num_wires: int, ops: Sequence[Union[Gate, 'Call']]):
+        self.name = name
+        self.num_wires = num_wires
+        self.ops = tuple(ops)
+
+    def __repr__(self) -> str:
+        return f"Subcircuit({self.name!r}, {self.num_wires} wires, {len(self.ops)} ops)"
+
+    @functools.cached_property
+    def gate_counts(self) -> Counter:
+        """Number of gates of each name in the flattened subcircuit."""
+        counts = Counter()
+        for op in self.ops:
+            if isinstance(op, Call):
+                counts.update(op.subcircuit.gate_counts)
+            else:
+                counts[op[0]] += 1
+        return counts
+
+    def gates(self, wires: Optional[Sequence[int]] = None) -> Iterator[Gate]:
+        """
+        Yield the flattened gates.
+
+        Args:
+            wires: Global wire of every local wire, defaults to the identity
+        """
+        for op in self.ops:
+            if isinstance(op, Call):
+                inner = op.wires if wires is None else tuple(wires[w] for w in op.wires)
+                yield from op.subcircuit.gates(inner)
+            elif wires is None:
+                yield op
+            else:
+                yield (op[0],) + tuple(wires[w] for w in op[1:])
+
+    def subcircuits(self) -> List['Subcircuit']:
+        """Return every distinct subcircuit this one calls, directly or not."""
+        seen = {}
+        stack = [self]
+        while stack:
+            for op in stack.pop().ops:
+                if isinstance(op, Call) and id(op.subcircuit) not in seen:
+                    seen[id(op.subcircuit)] = op.subcircuit
+                    stack.append(op.subcircuit)
+        return list(seen.values())
+
+
+@dataclass(frozen=True)
+class Call:
+    """A subcircuit applied to the given wires of the calling subcircuit."""
+    subcircuit: Subcircuit
+    wires: Tuple[int, ...]
+
+
+@dataclass
+class CompiledModExp:
+    """A compiled modular exponentiation and where its registers live."""
+    circuit: Subcircuit
+    N: int
+    a: int
+    exponent: Tuple[int, ...]
+    output: Tuple[int, ...]
+
+    @property
+    def num_qubits(self) -> int:
+        return self.circuit.num_wires
+
+    @property
+    def gate_counts(self) -> Counter:
+        return self.circuit.gate_counts
+
+    def toffoli_count(self) -> int:
+        """Toffolis after decomposing every multi-controlled X with clean ancillas."""
+        return toffoli_count(self.gate_counts)
+
+
+def toffoli_count(counts: Counter) -> int:
+    """
+    Count the Toffolis a set of gates decomposes into.
+
+    A k-controlled X takes 2k - 3 Toffolis with k - 2 clean ancillas.
+
+    Args:
+        counts: Gate counts, e.g. Subcircuit.gate_counts
+    """
+    total = 0
+    for name, count in counts.items():
+        controls = len(name) - 1
+        if controls >= 2:
+            total += count * (2 * controls - 3)
+    return total
+
+
+def _controlled_x(controls: Sequence[int], target: int) -> Gate:
+    return ('c' * len(controls) + 'x',) + tuple(controls) + (target,)
+
+
+@functools.lru_cache(maxsize=None)
+def inverse(subcircuit: Subcircuit) -> Subcircuit:
+    """Return the inverse of a subcircuit; every gate is its own inverse."""
+    ops = [Call(inverse(op.subcircuit), op.wires) if isinstance(op, Call) else op for op in reversed(subcircuit.ops)]
+    return Subcircuit(subcircuit.name + '_inverse', subcircuit.num_wires, ops)
+
+
+@functools.lru_cache(maxsize=None)
+def ripple_adder(n: int) -> Subcircuit:
+    """
+    Cuccaro ripple-carry adder: b += k modulo 2^(n + 1).
+
+    Wires: k (n), b (n + 1, its top bit receiving the carry out), a carry
+    ancilla that starts and ends at 0.
+    """
+    k = list(range(n))
+    b = list(range(n, 2 * n + 1))
+    carry = 2 * n + 1
+
+    def majority(c: int, y: int, x: int) -> List[Gate]:
+        return [('cx', x, y), ('cx', x, c), ('ccx', c, y, x)]
+
+    def unmajority(c: int, y: int, x: int) -> List[Gate]:
+        return [('ccx', c, y, x), ('cx', x, c), ('cx', c, y)]
+
+    carries = [carry] + k[:-1]
+    ops = []
+    for i in range(n):
+        ops += majority(carries[i], b[i], k[i])
+    ops.append(('cx', k[-1], b[n]))
+    for i in reversed(range(n)):
+        ops += unmajority(carries[i], b[i], k[i])
+    return Subcircuit(f'add{n}', 2 * n + 2, ops)
+
+
+@functools.lru_cache(maxsize=None)
+def modular_adder(N: int) -> Subcircuit:
+    """
+    b = (b + k) mod N for b, k < N.
+
+    Wires: k (n), m (n, holding N), b (n + 1), the adder's carry and a flag,
+    both starting and ending at 0.
+    """
+    n = N.bit_length()
+    k = list(range(n))
+    m = list(range(n, 2 * n))
+    b = list(range(2 * n, 3 * n + 1))
+    carry, flag = 3 * n + 1, 3 * n + 2
+    add = ripple_adder(n)
+    subtract = inverse(add)
+    modulus_bits = [m[i] for i in range(n) if N >> i & 1]
+
+    ops = [
+        Call(add, tuple(k + b + [carry])),
+        Call(subtract, tuple(m + b + [carry])),
+        # The flag is set when b + k - N did not go negative; N is then
+        # cleared from m so that adding m back is a no-op.
+        ('x', b[n]), ('cx', b[n], flag), ('x', b[n]),
+    ]
+    ops += [('cx', flag, bit) for bit in modulus_bits]
+    ops.append(Call(add, tuple(m + b + [carry])))
+    ops += [('cx', flag, bit) for bit in modulus_bits]
+    # The sum wrapped exactly when it is now below k.
+    ops += [Call(subtract, tuple(k + b + [carry])), ('cx', b[n], flag), Call(add, tuple(k + b + [carry]))]
+    return Subcircuit(f'addmod{N}', 3 * n + 3, ops)
+
+
+@functools.lru_cache(maxsize=None)
+def lookup(address_bits: int, n: int, table: Tuple[int, ...]) -> Subcircuit:
+    """
+    XOR table[v] into an n-bit register, where v is the value of the address qubits.
+
+    Wires: the address (address_bits, least significant first), the target
+    (n), an ancilla that starts and ends at 0.
+    """
+    address = list(range(address_bits))
+    target = list(range(address_bits, address_bits + n))
+    ancilla = address_bits + n
+    ops = []
+    # Address qubits are flipped so that the entry's value reads as all ones;
+    # only the flips that differ from the previous entry's are applied.
+    flipped = 0
+    for v, value in enumerate(table):
+        if not value:
+            continue
+        mask = ~v & ((1 << address_bits) - 1)
+        ops += [('x', address[i]) for i in range(address_bits) if (mask ^ flipped) >> i & 1]
+        flipped = mask
+        bits = [target[i] for i in range(n) if value >> i & 1]
+        if address_bits >= 2 and len(bits) > 2:
+            # Matching the address once into the ancilla and fanning it out
+            # takes two multi-controlled X instead of one per set bit.
+            ops.append(_controlled_x(address, ancilla))
+            ops += [('cx', ancilla, bit) for bit in bits]
+            ops.append(_controlled_x(address, ancilla))
+        else:
+            ops += [_controlled_x(address, bit) for bit in bits]
+    ops += [('x', address[i]) for i in range(address_bits) if flipped >> i & 1]
+    return Subcircuit(f'lookup{address_bits}x{n}', address_bits + n + 1, ops)
+
+
+@functools.lru_cache(maxsize=None)
+def multiplier(N: int, factors: Tuple[int, ...], multiplicand_window: int = 1) -> Subcircuit:
+    """
+    Multiply by factors[e] mod N, where e is the value of the exponent qubits.
+
+    The product of x is accumulated into the zeroed register y, then x is
+    uncomputed with the inverse factors, leaving |e>|0>|factors[e] x mod N>.
+
+    Wires: the exponent window (log2 len(factors)), x (n + 1), y (n + 1), k
+    (n), m (n, holding N), carry, flag.
+    """
+    n = N.bit_length()
+    window = (len(factors) - 1).bit_length()
+    exponent = list(range(window))
+    x = list(range(window, window + n + 1))
+    y = list(range(window + n + 1, window + 2 * n + 2))
+    k = list(range(window + 2 * n + 2, window + 3 * n + 2))
+    m = list(range(window + 3 * n + 2, window + 4 * n + 2))
+    ancillas = [window + 4 * n + 2, window + 4 * n + 3]
+    inverses = tuple(pow(factor, -1, N) for factor in factors)
+
+    def accumulate(source: List[int], target: List[int], sign: int, values: Tuple[int, ...]) -> List[Call]:
+        ops = []
+        add = Call(modular_adder(N), tuple(k + m + target + ancillas))
+        for start in range(0, n, multiplicand_window):
+            width = min(multiplicand_window, n - start)
+            # Entry (e, v) of the table is at address e + v * 2^window.
+            table = tuple(sign * values[e] * v * (1 << start) % N
+                          for v in range(1 << width) for e in range(len(values)))
+            load = Call(lookup(window + width, n, table), tuple(exponent + source[start:start + width] + k + ancillas[1:]))
+            ops += [load, add, load]
+        return ops
+
+    ops = accumulate(x, y, 1, factors) + accumulate(y, x, -1, inverses)
+    return Subcircuit(f'mulmod{N}', window + 4 * n + 4, ops)
+
+
+def compile_modexp(N: int, a: int, exponent_bits: int, exponent_window: int = 1,
+                   multiplicand_window: int = 1) -> CompiledModExp:
+    """
+    Compile |e>|1> -> |e>|a^e mod N> for an exponent of exponent_bits qubits.
+
+    Args:
+        N: Modulus, at least 3
+        a: Base, coprime to N
+        exponent_bits: Number of exponent qubits
+        exponent_window: Exponent qubits combined into one multiplication
+        multiplicand_window: Multiplicand bits combined into one modular addition
+
+    Returns:
+        CompiledModExp: The circuit, with the exponent and output wires
+
+    Raises:
+        ValueError: If a is not coprime to N or a window is not positive
+    """
+    if N < 3:
+        raise ValueError(f"N must be at least 3, got {N}")
+    if exponent_window < 1 or multiplicand_window < 1:
+        raise ValueError("Window sizes must be positive")
+    a %= N
+    if math.gcd(a, N) != 1:
+        raise ValueError(f"a = {a} is not coprime to N = {N}")
+
+    # Besides the exponent: two (n + 1)-bit registers taking turns as
+    # multiplicand and accumulator, then the table register k, the register
+    # holding N, the carry and the flag.
+    n = N.bit_length()
+    exponent = list(range(exponent_bits))
+    x = list(range(exponent_bits, exponent_bits + n + 1))
+    y = list(range(exponent_bits + n + 1, exponent_bits + 2 * n + 2))
+    work = list(range(exponent_bits + 2 * n + 2, exponent_bits + 4 * n + 4))
+    modulus = work[n:2 * n]
+
+    ops = [('x', x[0])] + [('x', modulus[i]) for i in range(n) if N >> i & 1]
+    for start in range(0, exponent_bits, exponent_window):
+        width = min(exponent_window, exponent_bits - start)
+        factors = tuple(pow(a, e << start, N) for e in range(1 << width))
+        if all(factor == 1 for factor in factors):
+            continue
+        wires = tuple(exponent[start:start + width] + x + y + work)
+        ops.append(Call(multiplier(N, factors, multiplicand_window), wires))
+        x, y = y, x
+    ops += [('x', modulus[i]) for i in range(n) if N >> i & 1]
+
+    circuit = Subcircuit(f'modexp{N}_{a}', exponent_bits + 4 * n + 4, ops)
+    return CompiledModExp(circuit, N, a, tuple(exponent), tuple(x[:n]))
+
+
+def clear_cache() -> None:
+    """Drop every memoized subcircuit."""
+    for builder in (inverse, ripple_adder, modular_adder, lookup, multiplier):
+        builder.cache_clear()
+
+
+def evaluate(compiled: CompiledModExp, e: int) -> int:
+    """
+    Run a compiled circuit on the basis state |e>|1> and read its output register.
+
+    Every gate permutes basis states, so this checks the circuit classically.
+
+    Raises:
+        ValueError: If the work registers are not returned to 0
+    """
+    state = 0
+    for i, wire in enumerate(compiled.exponent):
+        state |= (e >> i & 1) << wire
+    for gate in compiled.circuit.gates():
+        if all(state >> control & 1 for control in gate[1:-1]):
+            state ^= 1 << gate[-1]
+    result = sum((state >> wire & 1) << i for i, wire in enumerate(compiled.output))
+    for wire in compiled.output + compiled.exponent:
+        state &= ~(1 << wire)
+    if state:
+        raise ValueError("Work registers were not returned to 0")
+    return result
+
+
+def to_qiskit(compiled: CompiledModExp):
+    """Return the compiled circuit as a Qiskit QuantumCircuit on compiled.num_qubits qubits."""
+    from backends import get_backend
+    qiskit = get_backend('qiskit')
+    circuit = qiskit.QuantumCircuit(compiled.num_qubits, name=compiled.circuit.name)
+    for gate in compiled.circuit.gates():
+        if gate[0] == 'x':
+            circuit.x(gate[1])
+        elif gate[0] == 'cx':
+            circuit.cx(gate[1], gate[2])
+        elif gate[0] == 'ccx':
+            circuit.ccx(gate[1], gate[2], gate[3])
+        else:
+            circuit.mcx(list(gate[1:-1]), gate[-1])
+    return circuit
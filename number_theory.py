@@ -0,0 +1,331 @@
+"""
+Number theory helpers for validating period finding classically.
+
+Orders are computed from the factorization of N: the order of a divides the
+Carmichael function lambda(N), so it is found by dividing prime factors out
+of lambda(N) while a^(lambda/q) is still 1. With a known factorization of N
+(e.g. a validation modulus built from safe primes) this works at
+cryptographic sizes; otherwise N is factored with Pollard's rho.
+
+``multiplicative_orders`` does the same for a whole array of bases at once:
+for every prime power q^e dividing lambda(N), a^(lambda/q^e) has order q^j,
+and j is found by raising the array to the q-th power up to e times. The
+orders of every unit modulo N are cached per N by ``order_table``. NumPy is
+only imported by these bulk routines, so the planner's classical triage can
+use this module without loading it.
+"""
+
+import functools
+import math
+import random
+from typing import TYPE_CHECKING, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+Factorization = Dict[int, int]
+
+# Deterministic Miller-Rabin witnesses for n < 3.3 * 10^24.
+_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+_DETERMINISTIC_LIMIT = 3317044064679887385961981
+_SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47)
+
+
+def integer_root(n: int, k: int) -> int:
+    """
+    Return the integer k-th root of n, floor(n^(1/k)), exactly.
+
+    Uses Newton's iteration on integers, so it works for n of any size.
+
+    Args:
+        n: Non-negative integer
+        k: Root, at least 1
+
+    Returns:
+        int: The largest x with x^k <= n
+    """
+    if n < 2 or k == 1:
+        return n
+    x = 1 << -(-n.bit_length() // k)
+    while True:
+        y = ((k - 1) * x + n // x ** (k - 1)) // k
+        if y >= x:
+            return x
+        x = y
+
+
+def is_probable_prime(n: int, rounds: int = 20) -> bool:
+    """
+    Miller-Rabin primality test, deterministic below 3.3 * 10^24.
+
+    Args:
+        n: Number to test
+        rounds: Random witnesses used above the deterministic limit
+
+    Returns:
+        bool: True if n is (very probably) prime
+    """
+    if n < 2:
+        return False
+    for p in _SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    if n < _DETERMINISTIC_LIMIT:
+        witnesses = _WITNESSES
+    else:
+        witnesses = [random.randrange(2, n - 1) for _ in range(rounds)]
+    for w in witnesses:
+        x = pow(w, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def pollard_rho(n: int) -> int:
+    """
+    Find a non-trivial factor of a composite n with Brent's variant of Pollard's rho.
+
+    Args:
+        n: Composite number
+
+    Returns:
+        int: A factor 1 < d < n
+    """
+    if n % 2 == 0:
+        return 2
+    while True:
+        y, c, m = random.randrange(1, n), random.randrange(1, n), 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
+def factorize(n: int) -> Factorization:
+    """
+    Return the prime factorization of n as {prime: exponent}.
+
+    Args:
+        n: Number to factor, at least 1
+    """
+    factors: Factorization = {}
+    for p in _SMALL_PRIMES:
+        while n % p == 0:
+            factors[p] = factors.get(p, 0) + 1
+            n //= p
+    pending = [n] if n > 1 else []
+    while pending:
+        m = pending.pop()
+        if is_probable_prime(m):
+            factors[m] = factors.get(m, 0) + 1
+        else:
+            d = pollard_rho(m)
+            pending.extend((d, m // d))
+    return factors
+
+
+def carmichael_factorization(factorization: Factorization) -> Factorization:
+    """
+    Return the prime factorization of the Carmichael function lambda(N).
+
+    Args:
+        factorization: Prime factorization of N
+
+    Returns:
+        Factorization: Prime factorization of lambda(N)
+    """
+    result: Factorization = {}
+
+    def merge(part: Factorization) -> None:
+        for q, e in part.items():
+            result[q] = max(result.get(q, 0), e)
+
+    for p, k in factorization.items():
+        if p == 2:
+            # lambda(2) = 1, lambda(4) = 2, lambda(2^k) = 2^(k-2) for k >= 3.
+            exponent = 0 if k == 1 else (1 if k == 2 else k - 2)
+            if exponent:
+                merge({2: exponent})
+        else:
+            part = factorize(p - 1)
+            if k > 1:
+                part[p] = part.get(p, 0) + k - 1
+            merge(part)
+    return result
+
+
+def carmichael(factorization: Factorization) -> int:
+    """Return lambda(N) from the prime factorization of N."""
+    return math.prod(q ** e for q, e in carmichael_factorization(factorization).items())
+
+
+def multiplicative_order(a: int, N: int, factorization: Optional[Factorization] = None) -> int:
+    """
+    Return the multiplicative order of a modulo N.
+
+    Args:
+        a: Base, coprime to N
+        N: Modulus
+        factorization: Prime factorization of N, computed if not given
+
+    Returns:
+        int: The smallest r > 0 with a^r = 1 (mod N)
+
+    Raises:
+        ValueError: If a is not coprime to N
+    """
+    if math.gcd(a, N) != 1:
+        raise ValueError(f"{a} is not coprime to {N}, it has no multiplicative order")
+    if N == 1:
+        return 1
+    lam_factors = carmichael_factorization(factorization or factorize(N))
+    order = math.prod(q ** e for q, e in lam_factors.items())
+    for q, e in lam_factors.items():
+        for _ in range(e):
+            if pow(a, order // q, N) != 1:
+                break
+            order //= q
+    return order
+
+
+def _power_mod(values: 'np.ndarray', exponents: Union[int, 'np.ndarray'], N: int) -> 'np.ndarray':
+    """
+    Compute values^exponents mod N elementwise by square-and-multiply.
+
+    uint64 arrays are exact while N < 2^32; object arrays of Python integers
+    are used above that.
+    """
+    import numpy as np
+    exponents = np.broadcast_to(np.asarray(exponents, dtype=values.dtype), values.shape)
+    modulus = values.dtype.type(N)
+    result = np.ones_like(values)
+    base = values % modulus
+    num_bits = int(exponents.max(initial=0)).bit_length()
+    for bit in range(num_bits):
+        mask = ((exponents >> values.dtype.type(bit)) & values.dtype.type(1)).astype(bool)
+        result[mask] = result[mask] * base[mask] % modulus
+        if bit + 1 < num_bits:
+            base = base * base % modulus
+    return result
+
+
+def _as_residues(bases, N: int) -> 'np.ndarray':
+    """Reduce bases mod N into uint64 while N < 2^32, Python integers above."""
+    import numpy as np
+    if N >= 1 << 32:
+        return np.array([int(a) % N for a in np.ravel(bases)], dtype=object)
+    return (np.asarray(bases).astype(np.int64).ravel() % N).astype(np.uint64)
+
+
+def multiplicative_orders(bases, N: int, factorization: Optional[Factorization] = None) -> 'np.ndarray':
+    """
+    Return the multiplicative order modulo N of every base in an array.
+
+    Args:
+        bases: Bases, coprime to N
+        N: Modulus
+        factorization: Prime factorization of N, computed if not given
+
+    Returns:
+        np.ndarray: The orders, uint64 while N < 2^32 and Python integers
+        (object dtype) above
+
+    Raises:
+        ValueError: If a base is not coprime to N
+    """
+    import numpy as np
+    residues = _as_residues(bases, N)
+    if np.any(np.gcd(residues, residues.dtype.type(N)) != 1):
+        raise ValueError(f"Not every base is coprime to {N}, some have no multiplicative order")
+    orders = np.ones_like(residues)
+    if N == 1:
+        return orders
+    lam_factors = carmichael_factorization(factorization or factorize(N))
+    lam = math.prod(q ** e for q, e in lam_factors.items())
+    for q, e in lam_factors.items():
+        # The q-part of every order is the order of a^(lambda / q^e).
+        powers = _power_mod(residues, lam // q ** e, N)
+        for _ in range(e):
+            pending = powers != 1
+            if not pending.any():
+                break
+            orders[pending] *= residues.dtype.type(q)
+            powers = _power_mod(powers, q, N)
+    return orders
+
+
+@functools.lru_cache(maxsize=16)
+def order_table(N: int) -> 'np.ndarray':
+    """
+    Return the multiplicative order of every a in range(N) modulo N, cached per N.
+
+    Entries of bases sharing a factor with N are 0. The table is read-only.
+
+    Args:
+        N: Modulus, below 2^32
+
+    Returns:
+        np.ndarray: uint64 table indexed by the base
+    """
+    import numpy as np
+    if N >= 1 << 32:
+        raise ValueError(f"An order table of N = {N} would not fit in memory")
+    bases = np.arange(N, dtype=np.uint64)
+    units = np.gcd(bases, np.uint64(N)) == 1
+    table = np.zeros(N, dtype=np.uint64)
+    table[units] = multiplicative_orders(bases[units], N)
+    table.flags.writeable = False
+    return table
+
+
+def useful_bases(bases, N: int, factorization: Optional[Factorization] = None) -> 'np.ndarray':
+    """
+    Return which bases split N in Shor's algorithm once their order r is known.
+
+    A base is useful when r is even and a^(r/2) != -1 (mod N); gcd(a^(r/2) - 1, N)
+    is then a non-trivial factor.
+
+    Args:
+        bases: Bases, coprime to N
+        N: Modulus
+        factorization: Prime factorization of N, computed if not given
+
+    Returns:
+        np.ndarray: Boolean mask over the bases
+    """
+    import numpy as np
+    residues = _as_residues(bases, N)
+    orders = multiplicative_orders(residues, N, factorization)
+    two = residues.dtype.type(2)
+    even = orders % two == 0
+    useful = np.zeros(len(residues), dtype=bool)
+    halves = _power_mod(residues[even], orders[even] // two, N)
+    useful[even] = halves != N - 1
+    return useful
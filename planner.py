@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Cost-based planner routing each N to the cheapest engine that can handle it.
+
+A request either wants factors ('factor') or wants to exercise the period
+finding pipeline ('validate'). Factor requests first go through classical
+triage (even N, primes, prime powers, small factors), which settles most of
+a mixed workload for free. The rest go to the feasible engine with the lowest
+estimated cost:
+
+- ``classical_order``: ``execute_shors`` with classical order finding;
+- ``statevector``: ``execute_shors`` on the NumPy state-vector engine, if it
+  fits the memory budget;
+- ``analytic``: closed-form sampling of the measurement (validation only, as
+  it computes the order from N's factorization);
+- ``remote``: Aqua's Shor on the IBMQ backend, if credentials are configured
+  and the circuit fits the backend.
+
+Each engine's cost is modelled as c * N^k nanoseconds. The coefficients come
+from a benchmark report (``benchmark.py --output``) when one is given, else
+from built-in defaults (main.py and the CLI read the report path from
+SHOR_CALIBRATION); exponents are the fitted scaling exponents, but never
+below the engine's asymptotic growth, as small-N runs are dominated by fixed
+overheads. Every decision is kept in ``Planner.decisions`` and emitted as a
+'plan' profiling event.
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import memory
+import number_theory
+import profiling
+from backends import is_available
+
+REQUESTS = ('factor', 'validate')
+
+# Default (coefficient in ns, exponent) of every engine's cost c * N^k,
+# measured on a desktop CPU.
+DEFAULT_COSTS: Dict[str, Tuple[float, float]] = {
+    'triage': (2e4, 0.0),
+    'classical_order': (2e3, 1.0),
+    'statevector': (1.5e3, 2.0),
+    'analytic': (3e5, 0.25),
+    'remote': (6e10, 0.0),
+}
+# Asymptotic exponents: order finding walks up to N powers, the state vector
+# has about N^2 amplitudes, Pollard's rho takes about N^(1/4) steps.
+MIN_EXPONENTS = {'triage': 0.0, 'classical_order': 1.0, 'statevector': 2.0, 'analytic': 0.25, 'remote': 0.0}
+# Benchmark engines whose timings calibrate each planner engine.
+BENCHMARK_SOURCES = {
+    'classical_order': 'shor_2_0_classical',
+    'statevector': 'shor_2_0_vector',
+    'analytic': 'shor_2_0_analytic',
+}
+
+TRIAGE_BOUND = 1 << 16
+# Aqua's Shor circuit uses 4n + 2 qubits for an n-bit N.
+REMOTE_MAX_QUBITS = 32
+ATTEMPTS = 20
+# Requests no engine is expected to serve within this many nanoseconds are refused.
+MAX_COST_NS = 3600e9
+
+
+class PlanningError(RuntimeError):
+    """Raised when no engine can serve a request."""
+
+
+def triage(N: int) -> Optional[Tuple[int, ...]]:
+    """
+    Settle N classically when that is cheap.
+
+    Args:
+        N: Number to factor
+
+    Returns:
+        Optional[Tuple[int, ...]]: (N,) for a prime, a factor pair when one is
+        found by trial division or a perfect power check, or None
+
+    Raises:
+        ValueError: If N is less than 2
+    """
+    if N < 2:
+        raise ValueError(f"Number to factor must be greater than 1, got {N}")
+    if N < 4 or number_theory.is_probable_prime(N):
+        return (N,)
+    for p in range(2, min(TRIAGE_BOUND, math.isqrt(N)) + 1):
+        if N % p == 0:
+            return (p, N // p)
+    for k in range(2, N.bit_length()):
+        root = number_theory.integer_root(N, k)
+        if root > 1 and root ** k == N:
+            return (root, N // root)
+    return None
+
+
+def _execute_shors(N: int, engine: str, **options) -> Optional[Tuple[int, int]]:
+    # shor_2_0 loads NumPy and the compiled engines, so it is only imported
+    # once a request gets past triage.
+    from shor_2_0 import execute_shors
+    return execute_shors(N, ATTEMPTS, engine=engine, **options)
+
+
+def _remote_factor(N: int, **options) -> Optional[Tuple[int, int]]:
+    from job_manager import IBMQProvider, run_jobs
+    job, = run_jobs([N], IBMQProvider())
+    if job.error or not job.factors:
+        return None
+    return (job.factors[0], N // job.factors[0])
+
+
+def _feasible(engine: str, N: int, request: str, memory_budget: Optional[int]) -> bool:
+    if engine == 'analytic':
+        return request == 'validate'
+    if engine == 'classical_order':
+        return request == 'factor'
+    if engine == 'statevector':
+        from shor_2_0 import get_input_num_bits
+        try:
+            memory.admit(N, get_input_num_bits(N), ['vector'], memory_budget)
+        except memory.MemoryBudgetExceeded:
+            return False
+        return True
+    if engine == 'remote':
+        return (4 * N.bit_length() + 2 <= REMOTE_MAX_QUBITS and bool(os.getenv('IBMQ_API_TOKEN'))
+                and is_available('aqua_shor'))
+    return False
+
+
+# Planner engine -> callable taking N (and engine options) and returning factors or None.
+PLAN_ENGINES: Dict[str, Callable[..., Optional[Tuple[int, int]]]] = {
+    'classical_order': lambda N, **options: _execute_shors(N, 'classical', **options),
+    'statevector': lambda N, **options: _execute_shors(N, 'vector', **options),
+    'analytic': lambda N, **options: _execute_shors(N, 'analytic', **options),
+    'remote': _remote_factor,
+}
+
+
+def calibrate(report: Dict) -> Dict[str, Tuple[float, float]]:
+    """
+    Derive engine costs from a benchmark report.
+
+    Args:
+        report: Report from benchmark.run_benchmarks
+
+    Returns:
+        Dict[str, Tuple[float, float]]: (coefficient, exponent) of every
+        engine, defaults for those the report does not cover
+    """
+    costs = dict(DEFAULT_COSTS)
+    for engine, source in BENCHMARK_SOURCES.items():
+        results = report.get('engines', {}).get(source)
+        runs = [r for r in (results or {}).get('runs', []) if r['times_ns'] and r['N'] > 1]
+        if not runs:
+            continue
+        fitted = results.get('scaling_exponent')
+        exponent = max(MIN_EXPONENTS[engine], fitted if fitted is not None else 0.0)
+        coefficient = statistics.median(r['median_ns'] / r['N'] ** exponent for r in runs)
+        costs[engine] = (coefficient, exponent)
+    return costs
+
+
+class Planner:
+    """Chooses and runs an engine for every request, recording its decisions."""
+
+    def __init__(self, costs: Optional[Dict[str, Tuple[float, float]]] = None,
+                 memory_budget: Optional[int] = None, max_cost_ns: Optional[float] = MAX_COST_NS, quiet: bool = True):
+        """
+        Args:
+            costs: (coefficient, exponent) per engine, defaults to DEFAULT_COSTS
+            memory_budget: Budget for simulations, defaults to memory.default_budget()
+            max_cost_ns: Engines estimated to take longer are not considered, None for no limit
+            quiet: Suppress the engines' progress output
+        """
+        self.costs = dict(DEFAULT_COSTS if costs is None else costs)
+        self.memory_budget = memory_budget
+        self.max_cost_ns = max_cost_ns
+        self.quiet = quiet
+        self.decisions: List[Dict] = []
+
+    @classmethod
+    def from_benchmark(cls, path: str, **kwargs) -> 'Planner':
+        """Create a planner calibrated by a benchmark report stored at ``path``."""
+        with open(path) as f:
+            return cls(calibrate(json.load(f)), **kwargs)
+
+    def estimate(self, engine: str, N: int) -> float:
+        """Return the estimated cost of running ``engine`` on N, in nanoseconds (inf if it overflows)."""
+        coefficient, exponent = self.costs[engine]
+        # Through the logarithm, as float(N) overflows above 1024 bits.
+        log_cost = exponent * math.log(max(N, 1))
+        return coefficient * math.exp(log_cost) if log_cost < 709 else math.inf
+
+    def plan(self, N: int, request: str = 'factor') -> Dict:
+        """
+        Choose an engine for N without running it.
+
+        Args:
+            N: Number to factor
+            request: 'factor' or 'validate'
+
+        Returns:
+            Dict: The decision, with the estimate of every feasible engine
+
+        Raises:
+            ValueError: If N is less than 2 or the request is unknown
+            PlanningError: If no engine can serve the request
+        """
+        if N < 2:
+            raise ValueError(f"Number to factor must be greater than 1, got {N}")
+        if request not in REQUESTS:
+            raise ValueError(f"Unknown request '{request}', expected one of {REQUESTS}")
+        estimates = {engine: self.estimate(engine, N) for engine in PLAN_ENGINES
+                     if _feasible(engine, N, request, self.memory_budget)}
+        if self.max_cost_ns is not None:
+            estimates = {engine: cost for engine, cost in estimates.items() if cost <= self.max_cost_ns}
+        if not estimates:
+            raise PlanningError(f"No engine can {request} N={N} ({N.bit_length()} bits)")
+        engine = min(estimates, key=estimates.get)
+        return {'N': N, 'bits': N.bit_length(), 'request': request, 'engine': engine,
+                'estimated_ns': estimates[engine], 'estimates': estimates}
+
+    def _run(self, func: Callable, *args, **kwargs):
+        if not self.quiet:
+            return func(*args, **kwargs)
+        with redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+
+    def run(self, N: int, request: str = 'factor', **options) -> Optional[Tuple[int, ...]]:
+        """
+        Serve a request, recording the decision and its outcome.
+
+        Args:
+            N: Number to factor
+            request: 'factor' or 'validate'
+            **options: Options for the chosen engine, e.g. factorization for 'analytic'
+
+        Returns:
+            Optional[Tuple[int, ...]]: Factors (or (N,) for a prime), None on failure
+
+        Raises:
+            ValueError: If N is less than 2
+        """
+        start = time.perf_counter_ns()
+        if request == 'factor':
+            result = triage(N)
+            if result is not None:
+                decision = {'N': N, 'bits': N.bit_length(), 'request': request, 'engine': 'triage',
+                            'estimated_ns': self.estimate('triage', N), 'estimates': {}}
+                return self._record(decision, result, start)
+
+        decision = self.plan(N, request)
+        result = self._run(PLAN_ENGINES[decision['engine']], N, **options)
+        return self._record(decision, result, start)
+
+    def _record(self, decision: Dict, result: Optional[Tuple[int, ...]], start: int) -> Optional[Tuple[int, ...]]:
+        decision.update(elapsed_ns=time.perf_counter_ns() - start, factors=result)
+        self.decisions.append(decision)
+        profiling.emit('plan', **decision)
+        return result
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Plan and run a mixed workload given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('numbers', nargs='+', type=int)
+    parser.add_argument('--request', choices=REQUESTS, default='factor')
+    parser.add_argument('--calibration', default=os.getenv('SHOR_CALIBRATION'),
+                        help='benchmark report to calibrate engine costs, defaults to SHOR_CALIBRATION')
+    parser.add_argument('--dry-run', action='store_true', help='only print the plan')
+    args = parser.parse_args(argv)
+
+    planner = Planner.from_benchmark(args.calibration) if args.calibration else Planner()
+    for N in args.numbers:
+        try:
+            if args.dry_run:
+                decision = planner.plan(N, args.request)
+                print(f"N={N}: {decision['engine']} (~{decision['estimated_ns'] / 1e9:.3g}s)")
+                continue
+            result = planner.run(N, args.request)
+        except PlanningError as e:
+            print(f"N={N}: {e}")
+            continue
+        decision = planner.decisions[-1]
+        print(f"N={N}: {decision['engine']} -> {result} in {decision['elapsed_ns'] / 1e9:.3g}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
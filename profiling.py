@@ -0,0 +1,192 @@
+"""
+Instrumentation hooks and profiler for Shor's algorithm simulations.
+
+The simulator reports what it is doing as structured events (plain dicts)
+passed to every registered hook. Four kinds of event are emitted:
+
+- ``stage``: one stage of period finding finished, with its wall time,
+  allocations (when tracemalloc is tracing) and entanglement count.
+- ``attempt``: one attempt of ``execute_shors`` finished, with its outcome.
+- ``precision``: a state-vector run finished, with the normalization error
+  its amplitudes had accumulated after every stage.
+- ``plan``: the planner served a request, with the engine it chose, the
+  cost estimates it compared and the time the run took.
+
+With no hooks registered, emitting is a no-op, so instrumentation costs
+nothing in normal runs.
+"""
+
+import json
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+Event = Dict[str, Any]
+Hook = Callable[[Event], None]
+
+# Possible outcomes of an execute_shors attempt.
+ATTEMPT_OUTCOMES = ('gcd_factor', 'no_period', 'bad_candidate', 'success', 'timeout')
+
+_HOOKS: List[Hook] = []
+
+
+def add_hook(hook: Hook) -> None:
+    """Register a callable that receives every emitted event."""
+    _HOOKS.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    """Unregister a hook added with add_hook."""
+    _HOOKS.remove(hook)
+
+
+def is_enabled() -> bool:
+    """Return True if any hook is registered."""
+    return bool(_HOOKS)
+
+
+def emit(event: str, **fields: Any) -> None:
+    """
+    Send an event to all registered hooks.
+
+    Args:
+        event: Event type, e.g. 'stage' or 'attempt'
+        **fields: Event payload
+    """
+    if not _HOOKS:
+        return
+    record = {'event': event, 'time_ns': time.perf_counter_ns()}
+    record.update(fields)
+    for hook in list(_HOOKS):
+        hook(record)
+
+
+@contextmanager
+def stage(name: str, registers: Iterable[Any] = (), **fields: Any) -> Iterator[None]:
+    """
+    Time a stage of the simulation and emit a 'stage' event when it ends.
+
+    Args:
+        name: Stage name
+        registers: Registers whose entanglement count is recorded after the stage
+        **fields: Extra fields for the event, e.g. N and a
+    """
+    if not _HOOKS:
+        yield
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        wall_ns = time.perf_counter_ns() - start
+        alloc_bytes = peak_bytes = None
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            alloc_bytes, peak_bytes = current - before, peak - before
+        entangles = sum(register.get_entangles() for register in registers)
+        emit('stage', stage=name, wall_ns=wall_ns, alloc_bytes=alloc_bytes,
+             peak_bytes=peak_bytes, entangles=entangles, **fields)
+
+
+def attempt(outcome: str, **fields: Any) -> None:
+    """
+    Emit an 'attempt' event.
+
+    Args:
+        outcome: One of ATTEMPT_OUTCOMES
+        **fields: Extra fields for the event, e.g. N, a and r
+    """
+    if outcome not in ATTEMPT_OUTCOMES:
+        raise ValueError(f"Unknown attempt outcome '{outcome}', expected one of {ATTEMPT_OUTCOMES}")
+    emit('attempt', outcome=outcome, **fields)
+
+
+class Profiler:
+    """
+    Context manager that collects events emitted while it is active.
+
+    Example:
+        with Profiler() as profiler:
+            execute_shors(15, attempts=5)
+        print(profiler.hottest_stage())
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        """
+        Args:
+            trace_memory: Start tracemalloc (if not already tracing) so stage
+                events carry allocation figures
+        """
+        self.trace_memory = trace_memory
+        self.events: List[Event] = []
+        self._started_tracing = False
+
+    def __enter__(self) -> 'Profiler':
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        add_hook(self.events.append)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        remove_hook(self.events.append)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def stage_summary(self, N: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregate stage events by stage name.
+
+        Args:
+            N: Only include stages of this modulus
+
+        Returns:
+            Dict[str, Dict[str, Any]]: count, total wall time, total allocations
+            and maximum entanglement count per stage
+        """
+        summary: Dict[str, Dict[str, Any]] = {}
+        for event in self.events:
+            if event['event'] != 'stage' or (N is not None and event.get('N') != N):
+                continue
+            entry = summary.setdefault(event['stage'], {'count': 0, 'wall_ns': 0, 'alloc_bytes': 0, 'entangles': 0})
+            entry['count'] += 1
+            entry['wall_ns'] += event['wall_ns']
+            entry['alloc_bytes'] += event['alloc_bytes'] or 0
+            entry['entangles'] = max(entry['entangles'], event['entangles'])
+        return summary
+
+    def hottest_stage(self, N: Optional[int] = None) -> Optional[str]:
+        """Return the stage with the largest total wall time, if any."""
+        summary = self.stage_summary(N)
+        if not summary:
+            return None
+        return max(summary, key=lambda name: summary[name]['wall_ns'])
+
+    def attempt_outcomes(self, N: Optional[int] = None) -> Counter:
+        """Count attempt outcomes, optionally for a single modulus."""
+        return Counter(event['outcome'] for event in self.events
+                       if event['event'] == 'attempt' and (N is None or event.get('N') == N))
+
+    def to_json_lines(self, path: Optional[str] = None) -> str:
+        """
+        Export the collected events as JSON lines.
+
+        Args:
+            path: If given, also write the events to this file
+
+        Returns:
+            str: One JSON object per line
+        """
+        text = '\n'.join(json.dumps(event) for event in self.events)
+        if path:
+            with open(path, 'w') as f:
+                f.write(text + '\n')
+        return text
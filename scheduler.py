@@ -0,0 +1,121 @@
+"""
+Base selection for the attempts of ``execute_shors``.
+
+Every attempt costs a full period-finding simulation, so bases are chosen to
+avoid wasted ones:
+
+- 0, 1 and N - 1 (whose order 2 always gives a^(r/2) = -1) are never drawn,
+  and no base is drawn twice in a run;
+- a base sharing a factor with N is returned to the caller, which reads the
+  factor off the gcd instead of simulating;
+- a base found to have odd order, or a^(r/2) = -1 (mod N), is recorded as
+  bad for N, and so are its powers when the order is odd (they have odd
+  order too); later runs skip them;
+- bases that gave short verified periods for N in earlier runs are tried
+  first, shortest first, since short periods are recovered from the
+  measurement most reliably.
+
+The history is kept per process in ``BASE_HISTORY``.
+"""
+
+import random
+from typing import Dict, Iterator, Optional, Set
+
+# Candidate lists are shuffled up front below this N, and drawn by rejection above it.
+SHUFFLE_LIMIT = 1 << 20
+# Powers of an odd-order base marked bad along with it.
+MAX_BAD_POWERS = 64
+
+
+class BaseHistory:
+    """Verified periods and known-bad bases of every N seen so far."""
+
+    def __init__(self):
+        self.periods: Dict[int, Dict[int, int]] = {}
+        self.bad: Dict[int, Set[int]] = {}
+
+    def clear(self) -> None:
+        """Forget everything."""
+        self.periods.clear()
+        self.bad.clear()
+
+
+BASE_HISTORY = BaseHistory()
+
+
+class BaseScheduler:
+    """Yields the bases to try for one N, and learns from their outcomes."""
+
+    def __init__(self, N: int, history: Optional[BaseHistory] = None, rng: random.Random = random):
+        """
+        Args:
+            N: Number to factor
+            history: Outcomes of earlier runs, defaults to BASE_HISTORY
+            rng: Random number generator
+        """
+        self.N = N
+        self.history = BASE_HISTORY if history is None else history
+        self.rng = rng
+        self.tried: Set[int] = set()
+        self._bases = self._generate()
+
+    @property
+    def bad(self) -> Set[int]:
+        """Bases known to fail for N."""
+        return self.history.bad.setdefault(self.N, set())
+
+    def _usable(self, a: int) -> bool:
+        return a not in self.tried and a not in self.bad
+
+    def _generate(self) -> Iterator[int]:
+        known = self.history.periods.get(self.N, {})
+        for a in sorted(known, key=known.get):
+            if self._usable(a):
+                yield a
+
+        if self.N - 3 <= SHUFFLE_LIMIT:
+            candidates = list(range(2, self.N - 1))
+            self.rng.shuffle(candidates)
+            for a in candidates:
+                if self._usable(a):
+                    yield a
+            return
+
+        while True:
+            a = self.rng.randrange(2, self.N - 1)
+            if self._usable(a):
+                yield a
+
+    def next_base(self) -> Optional[int]:
+        """Return a base not tried yet in this run, or None once all are exhausted."""
+        a = next(self._bases, None)
+        if a is not None:
+            self.tried.add(a)
+        return a
+
+    def record(self, a: int, r: Optional[int]) -> None:
+        """
+        Record the outcome of an attempt with base a.
+
+        Args:
+            a: Base
+            r: Period found for a, verified by a^r = 1 (mod N), or None
+        """
+        N = self.N
+        if r is None or r <= 0 or pow(a, r, N) != 1:
+            return
+        # r may be any multiple of the order, whose parity and a^(r/2) can
+        # differ from the order's. Both only depend on the power of 2 in the
+        # order, so strip the 2s the order does not have.
+        while r % 2 == 0 and pow(a, r // 2, N) == 1:
+            r //= 2
+        if r % 2:
+            power = a
+            for _ in range(min(r, MAX_BAD_POWERS)):
+                self.bad.add(power)
+                power = power * a % N
+        elif pow(a, r // 2, N) == N - 1:
+            self.bad.add(a)
+        else:
+            known = self.history.periods.setdefault(N, {})
+            known[a] = min(r, known.get(a, r))
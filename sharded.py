@@ -0,0 +1,280 @@
+"""
+State vector sharded across worker processes in shared memory.
+
+The 2^n amplitudes of a ``ShardedRegister`` are split into 2^k equal shards,
+each living in its own ``multiprocessing.shared_memory`` segment and owned by
+one worker process. The low n-k qubits are local to every shard; gates on
+them touch only the owner's segment. The high k qubits select the shard, so a
+gate on one of them pairs shard s with shard s ^ bit: both workers map both
+segments and each updates half of the pair in place, reading its partner's
+amplitudes directly from shared memory. Workers receive small command tuples
+over pipes; amplitude arrays are never pickled or copied between processes.
+
+The shard count defaults to SHOR_SHARDS, or the number of CPUs, rounded
+down to a power of two.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+from multiprocessing import shared_memory
+from typing import Any, List, Optional
+import numpy as np
+import statevector
+
+# Residues are computed in chunks of this many amplitudes to bound worker memory.
+ORACLE_CHUNK = 1 << 16
+
+
+def default_shards() -> int:
+    """Return the shard count from SHOR_SHARDS, defaulting to the CPU count."""
+    env = os.getenv('SHOR_SHARDS')
+    shards = int(env) if env else (os.cpu_count() or 1)
+    return 1 << (max(1, shards).bit_length() - 1)
+
+
+class _Shard:
+    """Worker-side view of the register: its own shard plus every partner's."""
+
+    def __init__(self, names: List[str], shard: int, local_bits: int, dtype: str):
+        self.segments = [shared_memory.SharedMemory(name=name) for name in names]
+        self.shard = shard
+        self.local_bits = local_bits
+        self.size = 1 << local_bits
+        self.views = [np.ndarray(self.size, dtype=dtype, buffer=segment.buf) for segment in self.segments]
+        self.state = self.views[shard]
+
+    def close(self) -> None:
+        # Views export the segment buffers and must go before the segments close.
+        del self.state, self.views
+        for segment in self.segments:
+            segment.close()
+
+    def _has_bit(self, qubit: int) -> bool:
+        return bool((self.shard >> (qubit - self.local_bits)) & 1)
+
+    def hadamard(self, qubit: int) -> None:
+        scale = 1.0 / math.sqrt(2.0)
+        if qubit < self.local_bits:
+            view = self.state.reshape(-1, 2, 1 << qubit)
+            upper, lower = view[:, 0], view[:, 1]
+        else:
+            # Shard pair (upper, lower); this worker updates its half of both.
+            partner = self.shard ^ (1 << (qubit - self.local_bits))
+            first, second = sorted((self.shard, partner))
+            half = self.size // 2
+            rows = slice(0, half) if self.shard == first else slice(half, self.size)
+            upper, lower = self.views[first][rows], self.views[second][rows]
+        upper *= scale
+        lower *= scale
+        copy = upper.copy()
+        upper += lower
+        np.subtract(copy, lower, out=lower)
+
+    def controlled_phase(self, control: int, target: int, theta: float) -> None:
+        local = []
+        for qubit in (control, target):
+            if qubit < self.local_bits:
+                local.append(qubit)
+            elif not self._has_bit(qubit):
+                return
+        factor = complex(math.cos(theta), math.sin(theta))
+        if not local:
+            self.state *= factor
+        elif len(local) == 1:
+            self.state.reshape(-1, 2, 1 << local[0])[:, 1] *= factor
+        else:
+            low, high = sorted(local)
+            self.state.reshape(-1, 2, 1 << (high - low - 1), 2, 1 << low)[:, 1, :, 1] *= factor
+
+    def mass(self) -> float:
+        return float(np.sum(statevector.probabilities(self.state), dtype=np.float64))
+
+    def sample(self, u: float) -> int:
+        return statevector.sample(statevector.probabilities(self.state), u)
+
+    def collapse(self, a: int, N: int, y: int) -> float:
+        offset = self.shard * self.size
+        for start in range(0, self.size, ORACLE_CHUNK):
+            stop = min(self.size, start + ORACLE_CHUNK)
+            f_values = statevector.mod_exp_table(a, N, stop - start, threads=1, start=offset + start)
+            self.state[start:stop][f_values != y] = 0.0
+        return self.mass()
+
+    def scale(self, factor: float) -> None:
+        self.state *= factor
+
+
+def _worker(conn: Any, names: List[str], shard: int, local_bits: int, dtype: str) -> None:
+    worker = _Shard(names, shard, local_bits, dtype)
+    try:
+        while True:
+            command, args = conn.recv()
+            if command == 'stop':
+                break
+            try:
+                conn.send(('ok', getattr(worker, command)(*args)))
+            except Exception as e:
+                conn.send(('error', repr(e)))
+    finally:
+        worker.close()
+        conn.close()
+
+
+class ShardedRegister:
+    """
+    Register of 2^num_bits amplitudes sharded over worker processes.
+
+    Use as a context manager; leaving it stops the workers and frees the
+    shared memory. The register starts in |0>.
+    """
+
+    def __init__(self, num_bits: int, shards: Optional[int] = None, dtype: Any = np.complex128):
+        """
+        Args:
+            num_bits: Number of qubits
+            shards: Number of shards and worker processes, a power of two
+            dtype: Amplitude dtype
+        """
+        shards = default_shards() if shards is None else shards
+        shards = max(1, min(shards, 1 << (num_bits - 1)))
+        if shards & (shards - 1):
+            raise ValueError(f"Shard count must be a power of two, got {shards}")
+        self.num_bits = num_bits
+        self.shards = shards
+        self.local_bits = num_bits - (shards.bit_length() - 1)
+        self.dtype = np.dtype(dtype)
+        self.segments: List[shared_memory.SharedMemory] = []
+        self.workers: List[Any] = []
+        self.pipes: List[Any] = []
+        self._reversed = False
+
+        try:
+            shard_bytes = (1 << self.local_bits) * self.dtype.itemsize
+            for _ in range(shards):
+                segment = shared_memory.SharedMemory(create=True, size=shard_bytes)
+                self.segments.append(segment)
+                np.ndarray(1 << self.local_bits, dtype=self.dtype, buffer=segment.buf)[:] = 0
+            np.ndarray(1, dtype=self.dtype, buffer=self.segments[0].buf)[0] = 1.0
+
+            names = [segment.name for segment in self.segments]
+            for shard in range(shards):
+                parent, child = multiprocessing.Pipe()
+                worker = multiprocessing.Process(target=_worker, daemon=True,
+                                                 args=(child, names, shard, self.local_bits, self.dtype.str))
+                worker.start()
+                child.close()
+                self.pipes.append(parent)
+                self.workers.append(worker)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self) -> 'ShardedRegister':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the workers and free the shared memory."""
+        for pipe in self.pipes:
+            try:
+                pipe.send(('stop', ()))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join()
+        for pipe in self.pipes:
+            pipe.close()
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.pipes, self.workers, self.segments = [], [], []
+
+    def _collect(self, pipes: List[Any]) -> List[Any]:
+        results = []
+        for pipe in pipes:
+            status, value = pipe.recv()
+            if status == 'error':
+                raise RuntimeError(f"Shard worker failed: {value}")
+            results.append(value)
+        return results
+
+    def _broadcast(self, command: str, *args: Any) -> List[Any]:
+        # Every worker finishes a gate before the next one starts.
+        for pipe in self.pipes:
+            pipe.send((command, args))
+        return self._collect(self.pipes)
+
+    def _call(self, shard: int, command: str, *args: Any) -> Any:
+        self.pipes[shard].send((command, args))
+        return self._collect([self.pipes[shard]])[0]
+
+    def get_state(self) -> np.ndarray:
+        """Return a copy of the full amplitude vector."""
+        return np.concatenate([np.ndarray(1 << self.local_bits, dtype=self.dtype, buffer=segment.buf)
+                               for segment in self.segments])
+
+    def set_state(self, state: np.ndarray) -> None:
+        """Overwrite the amplitudes with ``state``."""
+        for shard, part in enumerate(np.split(np.asarray(state, dtype=self.dtype), self.shards)):
+            np.ndarray(1 << self.local_bits, dtype=self.dtype, buffer=self.segments[shard].buf)[:] = part
+        self._reversed = False
+
+    def hadamard(self, qubit: Optional[int] = None) -> None:
+        """Apply a Hadamard gate to one qubit, or to every qubit."""
+        for q in (range(self.num_bits) if qubit is None else [qubit]):
+            self._broadcast('hadamard', q)
+
+    def controlled_phase(self, control: int, target: int, theta: float) -> None:
+        """Multiply amplitudes with both qubits set by exp(i theta)."""
+        self._broadcast('controlled_phase', control, target, theta)
+
+    def qft(self) -> None:
+        """
+        Apply the quantum Fourier transform exp(-2 pi i x y / Q) / sqrt(Q).
+
+        The final qubit reversal is not performed; measure() undoes it on the
+        measured value instead of swapping amplitudes between shards.
+        """
+        for target in reversed(range(self.num_bits)):
+            self.hadamard(target)
+            for control in range(target):
+                self.controlled_phase(control, target, -math.pi / (1 << (target - control)))
+        self._reversed = not self._reversed
+
+    def _sample(self) -> int:
+        masses = self._broadcast('mass')
+        u = random.random() * sum(masses)
+        shard = len(masses) - 1
+        for index, mass in enumerate(masses):
+            if u < mass:
+                shard = index
+                break
+            u -= mass
+        return (shard << self.local_bits) + self._call(shard, 'sample', random.random())
+
+    def norm(self) -> float:
+        """Return <state|state>, summed over all shards."""
+        return sum(self._broadcast('mass'))
+
+    def measure(self) -> int:
+        """Sample a basis state from the register (without collapsing it)."""
+        x = self._sample()
+        if self._reversed:
+            x = int(format(x, f'0{self.num_bits}b')[::-1], 2)
+        return x
+
+    def measure_oracle(self, a: int, N: int) -> int:
+        """
+        Measure the output register of f(x) = a^x mod N and collapse onto its preimage.
+
+        Returns:
+            int: The measured output y
+        """
+        y = pow(a, self._sample(), N)
+        total = sum(self._broadcast('collapse', a, N, y))
+        self._broadcast('scale', 1.0 / math.sqrt(total))
+        return y
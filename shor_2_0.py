@@ -1,7 +1,17 @@
 import math
 import random
-from typing import List, Dict, Optional, Tuple, Union
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 import numpy as np
+import analytic
+import cancellation
+import cbridge
+import checkpoint
+import memory
+import number_theory
+import profiling
+import scheduler
+import sharded
+import statevector
 
 class QuantumMapping:
     def __init__(self, state: int, amplitude: complex):
@@ -27,29 +37,51 @@ class QuantumState:
         return len(self.entangled.get(register, []))
 
 class QuantumRegister:
-    def __init__(self, num_bits: int):
+    def __init__(self, num_bits: int, deadline: Optional[cancellation.Deadline] = None):
         self.num_bits = num_bits
         self.num_states = 1 << num_bits
+        self.deadline = deadline
         self.entangled: List['QuantumRegister'] = []
-        self.states = [QuantumState(complex(0.0), self) for _ in range(self.num_states)]
+        self.states: List[QuantumState] = []
+        for start in range(0, self.num_states, cancellation.CHECK_INTERVAL):
+            cancellation.check(deadline, what='Register construction')
+            self.states.extend(QuantumState(complex(0.0), self)
+                               for _ in range(start, min(start + cancellation.CHECK_INTERVAL, self.num_states)))
         self.states[0].amplitude = complex(1.0)
+        # Register whose change this one has not caught up with yet, or None
+        # when the amplitudes are current.
+        self.dirty_from: Optional['QuantumRegister'] = None
     
     def set_propagate(self, from_register: Optional['QuantumRegister'] = None) -> None:
-        if from_register is not None:
-            for state in self.states:
-                amplitude = complex(0.0)
-                try:
-                    entangles = state.entangled[from_register]
-                    amplitude = sum(entangle.state.amplitude * entangle.amplitude 
-                                  for entangle in entangles)
-                except KeyError:
-                    pass
-                state.amplitude = amplitude
-        
+        # Entangled registers are only marked dirty here; their amplitudes are
+        # recomputed when they are next read.
         for register in self.entangled:
             if register is from_register:
                 continue
-            register.propagate(self)
+            register.set_dirty(self)
+
+    def set_dirty(self, from_register: 'QuantumRegister') -> None:
+        if self.dirty_from is from_register:
+            return
+        self.dirty_from = from_register
+        self.set_propagate(from_register)
+
+    def set_refresh(self) -> None:
+        from_register = self.dirty_from
+        if from_register is None:
+            return
+        from_register.set_refresh()
+        for y, state in enumerate(self.states):
+            cancellation.check(self.deadline, y, 'Propagation')
+            amplitude = complex(0.0)
+            try:
+                entangles = state.entangled[from_register]
+                amplitude = sum(entangle.state.amplitude * entangle.amplitude 
+                              for entangle in entangles)
+            except KeyError:
+                pass
+            state.amplitude = amplitude
+        self.dirty_from = None
 
     def set_map(self, to_register: 'QuantumRegister', mapping: callable, propagate: bool = True) -> None:
         self.entangled.append(to_register)
@@ -60,6 +92,7 @@ class QuantumRegister:
         map_tensor_y: Dict[int, Dict[int, QuantumMapping]] = {}
         
         for x in range(self.num_states):
+            cancellation.check(self.deadline, x, 'Mapping')
             map_tensor_x[x] = {}
             codomain = mapping(x)
             for element in codomain:
@@ -90,9 +123,45 @@ class QuantumRegister:
                 from_state.set_entangled(to_state, amplitude.conjugate())
 
         if propagate:
-            to_register.propagate(self)
+            to_register.set_dirty(self)
+
+    def set_transform(self, mapping: callable) -> None:
+        # Applies mapping to the amplitudes in place, normalized as set_map
+        # normalizes its tensor, without materializing it or a second register.
+        if self.entangled:
+            raise ValueError("Cannot transform an entangled register in place")
+        self.set_refresh()
+        amplitudes = [complex(0.0)] * self.num_states
+        column_norms = [0.0] * self.num_states
+        for x, state in enumerate(self.states):
+            # Each row of a transform touches every state, so every row is checked.
+            cancellation.check(self.deadline, what='Transform')
+            codomain = mapping(x)
+            row_norm = math.sqrt(sum((element.amplitude * element.amplitude.conjugate()).real
+                                     for element in codomain))
+            for element in codomain:
+                amplitude = element.amplitude / row_norm
+                column_norms[element.state] += (amplitude * amplitude.conjugate()).real
+                amplitudes[element.state] += state.amplitude * amplitude
+        
+        for state, amplitude, column_norm in zip(self.states, amplitudes, column_norms):
+            state.amplitude = amplitude / math.sqrt(column_norm) if column_norm else complex(0.0)
+
+    def set_disentangled(self) -> None:
+        # A measured register is in a basis state, so it factors out of the
+        # joint state and its entanglements can be dropped once the registers
+        # it was entangled with have caught up with it.
+        for register in self.entangled:
+            register.set_refresh()
+            register.entangled = [r for r in register.entangled if r is not self]
+            for state in register.states:
+                state.entangled.pop(self, None)
+        for state in self.states:
+            state.entangled.clear()
+        self.entangled = []
 
     def get_measure(self) -> Optional[int]:
+        self.set_refresh()
         measure = random.random()
         sum_prob = 0.0
         final_xval = None
@@ -106,13 +175,14 @@ class QuantumRegister:
         idx = np.searchsorted(cumulative_prob, measure)
         if idx < len(self.states):
             final_state = self.states[idx]
-            final_xval = idx
+            final_xval = int(idx)
             
             # Collapse the state
             for state in self.states:
                 state.amplitude = complex(0.0)
             final_state.amplitude = complex(1.0)
-            self.propagate()
+            self.set_propagate()
+            self.set_disentangled()
             
         return final_xval
 
@@ -120,6 +190,7 @@ class QuantumRegister:
         return sum(state.get_entangles(register) for state in self.states)
 
     def get_amplitudes(self) -> List[complex]:
+        self.set_refresh()
         return [state.amplitude for state in self.states]
 
 def apply_hadamard(x: int, Q: int) -> List[QuantumMapping]:
@@ -137,44 +208,317 @@ def apply_qft(x: int, Q: int) -> List[QuantumMapping]:
                                     math.sin(k * float((x * y) % Q) / fQ)))
             for y in range(Q)]
 
-def get_period(a: int, N: int) -> Optional[int]:
+def get_input_num_bits(N: int) -> int:
     n_num_bits = N.bit_length()
     input_num_bits = (2 * n_num_bits) - 1
     input_num_bits += 1 if ((1 << input_num_bits) < (N * N)) else 0
+    return input_num_bits
+
+def get_period(a: int, N: int, engine: str = 'object', memory_budget: Optional[int] = None,
+               fallback: bool = True, **options) -> Optional[int]:
+    input_num_bits = get_input_num_bits(N)
+    engines = [engine] + (ENGINE_FALLBACKS.get(engine, []) if fallback else [])
+    amplitude_bytes = np.dtype(statevector.PRECISIONS[options.get('precision', 'double')]).itemsize
+    chosen = memory.admit(N, input_num_bits, engines, memory_budget, amplitude_bytes)
+    if chosen != engine:
+        print(f"Engine '{engine}' does not fit the memory budget, using '{chosen}'")
+    
+    with memory.PeakRSSTracker(chosen, N, input_num_bits, amplitude_bytes=amplitude_bytes):
+        return PERIOD_ENGINES[chosen](a, N, input_num_bits, **options)
+
+def simulate_period(a: int, N: int, input_num_bits: int, deadline: Optional[cancellation.Deadline] = None,
+                    **options) -> Optional[int]:
     Q = 1 << input_num_bits
     
     print(f"Finding the period...\nQ = {Q}\ta = {a}")
     
-    input_register = QuantumRegister(input_num_bits)
-    hmd_input_register = QuantumRegister(input_num_bits)
-    qft_input_register = QuantumRegister(input_num_bits)
-    output_register = QuantumRegister(input_num_bits)
+    # One input register is transformed stage by stage in place; the output
+    # register only has to hold residues mod N.
+    with profiling.stage('registers', N=N, a=a):
+        input_register = QuantumRegister(input_num_bits, deadline)
+        output_register = QuantumRegister(N.bit_length(), deadline)
     
     print("Registers generated")
     print("Performing Hadamard on input register")
-    input_register.set_map(hmd_input_register, lambda x: apply_hadamard(x, Q), False)
+    with profiling.stage('hadamard', [input_register], N=N, a=a):
+        input_register.set_transform(lambda x: apply_hadamard(x, Q))
     
     print("Mapping input register to output register, where f(x) is a^x mod N")
-    hmd_input_register.set_map(output_register, lambda x: get_q_mod_exp(a, x, N), False)
+    with profiling.stage('oracle', [output_register], N=N, a=a):
+        input_register.set_map(output_register, lambda x: get_q_mod_exp(a, x, N))
+    
+    # The output register is not acted on again, so measuring it before the
+    # QFT leaves the distribution of x unchanged.
+    print("Measuring output register")
+    with profiling.stage('measure', N=N, a=a):
+        y = output_register.get_measure()
     
-    print("Performing quantum Fourier transform on output register")
-    hmd_input_register.set_map(qft_input_register, lambda x: apply_qft(x, Q), False)
-    input_register.set_propagate()
+    print("Performing quantum Fourier transform on input register")
+    with profiling.stage('qft', [input_register], N=N, a=a):
+        input_register.set_transform(lambda x: apply_qft(x, Q))
     
-    print("Performing measurements")
-    y = output_register.get_measure()
-    x = qft_input_register.get_measure()
+    print("Measuring input register")
+    with profiling.stage('measure', N=N, a=a):
+        x = input_register.get_measure()
     
     if x is None:
         return None
         
+    return get_measured_period(a, N, Q, x, y)
+
+def vector_state(a: int, N: int, input_num_bits: int, threads: Optional[int] = None, precision: str = 'double',
+                 y: Optional[int] = None, checkpoints: Optional[checkpoint.CheckpointStore] = None) -> Tuple[np.ndarray, int, Dict[str, float]]:
+    Q = 1 << input_num_bits
+    dtype = statevector.PRECISIONS[precision]
+    norm_errors = {}
+    
+    resumed = None
+    if checkpoints is not None and y is None:
+        resumed = checkpoint.resume(checkpoints, a, N, input_num_bits, dtype)
+    
+    if resumed is None:
+        with profiling.stage('registers', N=N, a=a):
+            state = np.zeros(Q, dtype=dtype)
+            state[0] = 1.0
+        
+        with profiling.stage('hadamard', N=N, a=a):
+            statevector.hadamard(state, threads)
+        norm_errors['hadamard'] = statevector.norm_error(state)
+        
+        with profiling.stage('oracle', N=N, a=a):
+            f_values = statevector.mod_exp_table(a, N, Q, threads)
+        
+        with profiling.stage('measure', N=N, a=a):
+            # Measuring the output register collapses the input register onto
+            # the preimage of the measured value.
+            if y is None:
+                y = int(f_values[statevector.sample(statevector.probabilities(state), random.random())])
+            state[f_values != y] = 0.0
+            state /= np.linalg.norm(state)
+            del f_values
+        norm_errors['measure'] = statevector.norm_error(state)
+        if checkpoints is not None:
+            checkpoints.save(checkpoint.Checkpoint('oracle', a, N, input_num_bits, state, y))
+    else:
+        print(f"Resuming from the post-{resumed.stage} checkpoint")
+        state, y = resumed.state, resumed.y
+    
+    if resumed is None or resumed.stage == 'oracle':
+        with profiling.stage('qft', N=N, a=a):
+            statevector.qft(state, threads)
+        norm_errors['qft'] = statevector.norm_error(state)
+        if checkpoints is not None:
+            checkpoints.save(checkpoint.Checkpoint('qft', a, N, input_num_bits, state, y))
+    
+    profiling.emit('precision', precision=precision, norm_errors=norm_errors, N=N, a=a)
+    return state, y, norm_errors
+
+def vector_period(a: int, N: int, input_num_bits: int, threads: Optional[int] = None, precision: str = 'double',
+                  checkpoints: Optional[checkpoint.CheckpointStore] = None, **options) -> Optional[int]:
+    Q = 1 << input_num_bits
+    
+    print(f"Finding the period with the state-vector engine...\nQ = {Q}\ta = {a}")
+    
+    state, y, norm_errors = vector_state(a, N, input_num_bits, threads, precision, checkpoints=checkpoints)
+    norm_error = max(norm_errors.values(), default=0.0)
+    if norm_error > NORM_TOLERANCE[precision]:
+        print(f"Warning: {precision} precision amplitudes drifted from unit norm by {norm_error:.2e}")
+    
+    with profiling.stage('measure', N=N, a=a):
+        x = statevector.sample(statevector.probabilities(state), random.random())
+    
+    return get_measured_period(a, N, Q, x, y)
+
+def get_precision_error(a: int, N: int, precision: str = 'single', threads: Optional[int] = None) -> float:
+    # Both runs collapse onto the output of x = 0 so their distributions are comparable.
+    input_num_bits = get_input_num_bits(N)
+    reference, _, _ = vector_state(a, N, input_num_bits, threads, 'double', y=1)
+    reduced, _, _ = vector_state(a, N, input_num_bits, threads, precision, y=1)
+    return statevector.total_variation(statevector.probabilities(reference), statevector.probabilities(reduced))
+
+def get_periods_batched(bases: Sequence[int], N: int, memory_budget: Optional[int] = None,
+                        precision: str = 'double', **options) -> List[Optional[int]]:
+    input_num_bits = get_input_num_bits(N)
+    amplitude_bytes = np.dtype(statevector.PRECISIONS[precision]).itemsize
+    # Each row of a batch costs as much as one state-vector run.
+    batch_size = memory.max_batch('vector', N, input_num_bits, len(bases), memory_budget, amplitude_bytes)
+    
+    periods = []
+    for start in range(0, len(bases), batch_size):
+        cancellation.check(options.get('deadline'), what=f"Factoring {N}")
+        periods.extend(batched_periods(bases[start:start + batch_size], N, input_num_bits,
+                                       precision=precision, **options))
+    return periods
+
+def batched_periods(bases: Sequence[int], N: int, input_num_bits: int, threads: Optional[int] = None,
+                    precision: str = 'double', **options) -> List[Optional[int]]:
+    Q = 1 << input_num_bits
+    
+    print(f"Finding the periods of {len(bases)} bases with the batched engine...\nQ = {Q}\ta = {list(bases)}")
+    
+    # Every row starts in the same uniform superposition, so the Hadamard
+    # stage runs once and is copied across the batch.
+    with profiling.stage('registers', N=N, batch=len(bases)):
+        row = np.zeros(Q, dtype=statevector.PRECISIONS[precision])
+        row[0] = 1.0
+    
+    with profiling.stage('hadamard', N=N, batch=len(bases)):
+        statevector.hadamard(row, threads)
+        state = np.tile(row, (len(bases), 1))
+        del row
+    
+    with profiling.stage('oracle', N=N, batch=len(bases)):
+        outputs = []
+        for i, a in enumerate(bases):
+            f_values = statevector.mod_exp_table(a, N, Q, threads)
+            y = int(f_values[statevector.sample(statevector.probabilities(state[i]), random.random())])
+            state[i][f_values != y] = 0.0
+            state[i] /= np.linalg.norm(state[i])
+            outputs.append(y)
+        del f_values
+    
+    with profiling.stage('qft', N=N, batch=len(bases)):
+        statevector.qft(state, threads)
+    
+    with profiling.stage('measure', N=N, batch=len(bases)):
+        inputs = [statevector.sample(statevector.probabilities(state[i]), random.random())
+                  for i in range(len(bases))]
+    
+    return [get_measured_period(a, N, Q, x, y) for a, x, y in zip(bases, inputs, outputs)]
+
+def sharded_period(a: int, N: int, input_num_bits: int, shards: Optional[int] = None, precision: str = 'double',
+                   **options) -> Optional[int]:
+    Q = 1 << input_num_bits
+    
+    print(f"Finding the period with the sharded engine...\nQ = {Q}\ta = {a}")
+    
+    with profiling.stage('registers', N=N, a=a):
+        register = sharded.ShardedRegister(input_num_bits, shards, statevector.PRECISIONS[precision])
+    
+    with register:
+        with profiling.stage('hadamard', N=N, a=a, shards=register.shards):
+            register.hadamard()
+        
+        with profiling.stage('oracle', N=N, a=a, shards=register.shards):
+            y = register.measure_oracle(a, N)
+        
+        with profiling.stage('qft', N=N, a=a, shards=register.shards):
+            register.qft()
+        
+        with profiling.stage('measure', N=N, a=a, shards=register.shards):
+            norm_error = abs(register.norm() - 1.0)
+            x = register.measure()
+    
+    profiling.emit('precision', precision=precision, norm_errors={'qft': norm_error}, N=N, a=a)
+    if norm_error > NORM_TOLERANCE[precision]:
+        print(f"Warning: {precision} precision amplitudes drifted from unit norm by {norm_error:.2e}")
+    
+    return get_measured_period(a, N, Q, x, y)
+
+def native_period(a: int, N: int, input_num_bits: int, **options) -> Optional[int]:
+    Q = 1 << input_num_bits
+    if input_num_bits > 30:
+        raise ValueError(f"The C++ engine indexes registers with int, Q = 2^{input_num_bits} is too large")
+    
+    implementation = 'compiled' if cbridge.is_native() else 'NumPy fallback of the'
+    print(f"Finding the period with the {implementation} C++ engine...\nQ = {Q}\ta = {a}")
+    
+    with profiling.stage('registers', N=N, a=a):
+        register = cbridge.QuReg(input_num_bits)
+        cbridge.seed(random.getrandbits(32))
+    
+    with register:
+        with profiling.stage('hadamard', N=N, a=a):
+            register.set_average(Q - 1)
+            register.norm()
+        
+        with profiling.stage('oracle', N=N, a=a):
+            f_values = statevector.mod_exp_table(a, N, Q)
+        
+        with profiling.stage('measure', N=N, a=a):
+            # Measuring register one picks a uniformly random x0, and with
+            # it the output y; register one is then collapsed onto the
+            # preimage of y in place, as shor.C does.
+            x0 = register.dec_measure()
+            if x0 < 0:
+                return None
+            y = int(f_values[x0])
+            register.amplitudes[:] = f_values == y
+            register.norm()
+            del f_values
+        
+        with profiling.stage('qft', N=N, a=a):
+            register.dft(Q)
+        
+        with profiling.stage('measure', N=N, a=a):
+            x = register.dec_measure()
+    
+    if x < 0:
+        return None
+    return get_measured_period(a, N, Q, x, y)
+
+def analytic_period(a: int, N: int, input_num_bits: int, factorization: Optional[Dict[int, int]] = None,
+                    **options) -> Optional[int]:
+    Q = 1 << input_num_bits
+    
+    print(f"Finding the period with the analytic engine...\nQ = {Q}\ta = {a}")
+    
+    # The order is computed classically, then the measurement is sampled from
+    # its closed-form distribution without allocating a register.
+    with profiling.stage('order_finding', N=N, a=a):
+        r_order = number_theory.multiplicative_order(a, N, factorization)
+    
+    with profiling.stage('measure', N=N, a=a):
+        x, y = analytic.sample_measurement(a, N, Q, r_order)
+    
+    return get_measured_period(a, N, Q, x, y)
+
+def get_measured_period(a: int, N: int, Q: int, x: int, y: Optional[int]) -> int:
     print(f"Measurements: x = {x}, y = {y}")
     print("Finding the period via continued fractions")
     
-    r_period = get_continued_fraction(x, Q, N)
+    with profiling.stage('continued_fraction', N=N, a=a):
+        r_period = get_continued_fraction(x, Q, N)
     print(f"Candidate period r = {r_period}")
     return r_period
 
+def classical_period(a: int, N: int, input_num_bits: int, deadline: Optional[cancellation.Deadline] = None,
+                     **options) -> Optional[int]:
+    print(f"Finding the period classically...\ta = {a}")
+    with profiling.stage('order_finding', N=N, a=a):
+        value, r_period = a % N, 1
+        while value != 1:
+            cancellation.check(deadline, r_period, 'Order finding')
+            if r_period >= N:
+                return None
+            value = (value * a) % N
+            r_period += 1
+    print(f"Period r = {r_period}")
+    return r_period
+
+# Largest normalization error expected from rounding alone in each precision,
+# and the largest total variation distance from the double-precision
+# measurement distribution accepted for reduced precision.
+NORM_TOLERANCE = {'double': 1e-9, 'single': 1e-4}
+PRECISION_TOLERANCE = 1e-4
+
+# Period-finding engines, and the cheaper engines to fall back to when an
+# engine does not fit the memory budget.
+PERIOD_ENGINES = {
+    'object': simulate_period,
+    'vector': vector_period,
+    'sharded': sharded_period,
+    'native': native_period,
+    'analytic': analytic_period,
+    'classical': classical_period,
+}
+ENGINE_FALLBACKS = {
+    'object': ['vector', 'classical'],
+    'vector': ['classical'],
+    'sharded': ['classical'],
+    'native': ['vector', 'classical'],
+}
+
 def get_bit_count(x_val: int) -> int:
     return bin(x_val).count('1')
 
@@ -198,7 +542,8 @@ def get_continued_fraction(y: int, Q: int, N: int) -> int:
         c, r = 0, 1
         for i in reversed(range(depth)):
             c, r = r, fractions[i] * r + c
-        return r
+        # The convergent is r / c; the period candidate is its denominator.
+        return c
     
     r_cf = 0
     for d in range(depth, len(fractions) + 1):
@@ -218,9 +563,6 @@ def get_mod_exp(a_val: int, exp_val: int, mod_val: int) -> int:
         exp_val >>= 1
     return result
 
-def random_pick(N_val: int) -> int:
-    return math.floor(random.random() * (N_val - 1) + 0.5)
-
 def get_candidates(a: int, r: Optional[int], N: int, neighborhood: float) -> Optional[int]:
     if r is None:
         return None
@@ -238,32 +580,84 @@ def get_candidates(a: int, r: Optional[int], N: int, neighborhood: float) -> Opt
             
     return None
 
-def execute_shors(N: int, attempts: int = 1, neighborhood: float = 0.0, num_periods: int = 1) -> Optional[Tuple[int, int]]:
+def check_period(a: int, r: Optional[int], N: int, neighborhood: float, attempt: int,
+                 bases: Optional[scheduler.BaseScheduler] = None) -> Optional[Tuple[int, int]]:
+    if r is None:
+        profiling.attempt('no_period', N=N, a=a, attempt=attempt)
+        return None
+        
+    candidates = get_candidates(a, r, N, neighborhood)
+    if bases is not None:
+        bases.record(a, candidates)
+    if candidates is not None:
+        factor1 = get_gcd(pow(a, candidates // 2, N) + 1, N)
+        factor2 = get_gcd(pow(a, candidates // 2, N) - 1, N)
+        if factor1 != 1 and factor1 != N:
+            profiling.attempt('success', N=N, a=a, r=candidates, attempt=attempt)
+            return (factor1, N // factor1)
+        if factor2 != 1 and factor2 != N:
+            profiling.attempt('success', N=N, a=a, r=candidates, attempt=attempt)
+            return (factor2, N // factor2)
+    profiling.attempt('bad_candidate', N=N, a=a, r=r, attempt=attempt)
+    return None
+
+def execute_shors(N: int, attempts: int = 1, neighborhood: float = 0.0, num_periods: int = 1,
+                  engine: str = 'object', memory_budget: Optional[int] = None, batch: int = 1,
+                  bases: Optional[scheduler.BaseScheduler] = None, deadline: Optional[cancellation.Deadline] = None,
+                  **options) -> Optional[Tuple[int, int]]:
     if N < 2:
         return None
         
     if N % 2 == 0:
         return (2, N // 2)
+    
+    if batch > 1 and engine != 'vector':
+        raise ValueError(f"Batched period finding runs on the 'vector' engine, got '{engine}'")
         
-    for _ in range(attempts):
-        a = random_pick(N)
-        if get_gcd(a, N) != 1:
-            continue
-            
-        r = get_period(a, N)
-        if r is None:
-            continue
-            
-        candidates = get_candidates(a, r, N, neighborhood)
-        if candidates is not None:
-            factor1 = get_gcd(pow(a, candidates // 2, N) + 1, N)
-            factor2 = get_gcd(pow(a, candidates // 2, N) - 1, N)
-            if factor1 != 1 and factor1 != N:
-                return (factor1, N // factor1)
-            if factor2 != 1 and factor2 != N:
-                return (factor2, N // factor2)
+    if bases is None:
+        bases = scheduler.BaseScheduler(N)
+        
+    # Attempts run in rounds of up to `batch` bases whose periods are found
+    # together. The deadline is checked before every attempt and inside the
+    # engines' loops.
+    attempt = 0
+    try:
+        for first in range(0, attempts, batch):
+            picks = []
+            for attempt in range(first, min(attempts, first + batch)):
+                cancellation.check(deadline, what=f"Factoring {N}")
+                a = bases.next_base()
+                if a is None:
+                    break
+                factor = get_gcd(a, N)
+                if factor != 1:
+                    # A base sharing a factor with N needs no period at all.
+                    profiling.attempt('gcd_factor', N=N, a=a, attempt=attempt)
+                    return (factor, N // factor)
+                if batch == 1:
+                    r = get_period(a, N, engine, memory_budget, deadline=deadline, **options)
+                    factors = check_period(a, r, N, neighborhood, attempt, bases)
+                    if factors is not None:
+                        return factors
+                else:
+                    picks.append((attempt, a))
+        
+            if picks:
+                periods = get_periods_batched([base for _, base in picks], N, memory_budget, deadline=deadline,
+                                              **options)
+                for (attempt, base), r in zip(picks, periods):
+                    factors = check_period(base, r, N, neighborhood, attempt, bases)
+                    if factors is not None:
+                        return factors
+            if a is None:
+                # Every base has been tried.
+                break
+    except cancellation.DeadlineExceeded:
+        profiling.attempt('timeout', N=N, attempt=attempt)
+        raise
                 
     return None
 
-results_algo = execute_shors(35, 20, 0.01, 2)
-print("Results from the algorithm:\t" + str(results_algo[0]) + ", " + str(results_algo[1]))
\ No newline at end of file
+if __name__ == "__main__":
+    results_algo = execute_shors(35, 20, 0.01, 2)
+    print("Results from the algorithm:\t" + str(results_algo[0]) + ", " + str(results_algo[1]))
@@ -1,17 +1,22 @@
 import math
 from typing import List, Optional, Set
+import cancellation
 
 class Shors:
-    def __init__(self, num: int, divisor: int):
+    def __init__(self, num: int, divisor: int, deadline: Optional[cancellation.Deadline] = None):
         """
         Initialize Shor's algorithm implementation.
         
         Args:
             num: The number to factor
             divisor: Initial divisor to try
+            deadline: Deadline checked inside the trial division and coprime
+                scan loops, which raise cancellation.DeadlineExceeded once it
+                has passed
         """
         self.num = num
         self.div = divisor
+        self.deadline = deadline
         self._prime_cache: Set[int] = {2, 3}  # Cache of known primes
         
     def is_prime(self, number: int) -> bool:
@@ -34,6 +39,7 @@ class Shors:
         # Only check up to square root of number
         sqrt_num = int(math.sqrt(number))
         for i in range(3, sqrt_num + 1, 2):
+            cancellation.check(self.deadline, i >> 1, 'Primality test')
             if number % i == 0:
                 return False
                 
@@ -54,6 +60,7 @@ class Shors:
         sqrt_num = int(math.sqrt(number))
         
         for i in range(1, sqrt_num + 1):
+            cancellation.check(self.deadline, i, 'Factor search')
             if number % i == 0:
                 factors.add(i)
                 factors.add(number // i)
@@ -66,29 +73,41 @@ class Shors:
         
         Returns:
             List[int]: List of numbers coprime to self.num
+            
+        Raises:
+            cancellation.DeadlineExceeded: If the deadline passes, with the
+                coprimes found so far as its partial result
         """
         coprimes = []
         num_factors = set(self.get_factors(self.num))
         
         for a in range(3, self.num):
+            cancellation.check(self.deadline, a, 'Coprime scan', coprimes)
             a_factors = set(self.get_factors(a))
             if len(num_factors.intersection(a_factors)) == 1:  # Only 1 is shared
                 coprimes.append(a)
                 
         return coprimes
 
-    def find_prime_factors(self) -> List[int]:
+    def find_prime_factors(self, number: Optional[int] = None) -> List[int]:
         """
-        Find all prime factors of self.num.
+        Find all prime factors of a number.
         
+        Args:
+            number: The number to factor, defaults to self.num
+            
         Returns:
             List[int]: List of prime factors
+            
+        Raises:
+            cancellation.DeadlineExceeded: If the deadline passes, with the
+                prime factors found so far as its partial result
         """
-        if self.is_prime(self.num):
-            return [self.num]
+        num = self.num if number is None else number
+        if self.is_prime(num):
+            return [num]
             
         factors = []
-        num = self.num
         
         # Handle 2 separately
         while num % 2 == 0:
@@ -98,6 +117,7 @@ class Shors:
         # Check odd numbers up to square root
         sqrt_num = int(math.sqrt(num))
         for i in range(3, sqrt_num + 1, 2):
+            cancellation.check(self.deadline, i >> 1, 'Trial division', factors)
             while num % i == 0:
                 if self.is_prime(i):
                     factors.append(i)
@@ -6,10 +6,41 @@ This script tests both the custom implementation and the Qiskit implementation
 to ensure they correctly factor numbers.
 """
 
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
 import unittest
+from unittest import mock
 import numpy as np
+import analytic
+import backends
+import benchmark
+import cancellation
+import cbridge
+import checkpoint
+import circuit_format
+import job_manager
+import largeCircuits
+import memory
+import modexp_compiler
+import number_theory
+import planner
+import profiling
+import scheduler
+import sharded
+import shor_2_0
+import statevector
+from circuit_cache import CircuitCache
 from shors import Shors
-from shor_2_0 import execute_shors
+from shor_2_0 import (PRECISION_TOLERANCE, apply_hadamard, apply_qft, execute_shors, get_input_num_bits, get_period,
+                      get_periods_batched, get_precision_error)
 
 class TestShorsAlgorithm(unittest.TestCase):
     """Test cases for Shor's Algorithm implementations."""
@@ -58,5 +89,787 @@ class TestShorsAlgorithm(unittest.TestCase):
             factor1, factor2 = result
             self.assertEqual(factor1 * factor2, 21)
 
+class TestBackends(unittest.TestCase):
+    """Test cases for the lazy backend registry."""
+
+    def test_main_does_not_import_heavy_backends(self):
+        """Importing the classical entry point must not pull in Qiskit or matplotlib."""
+        code = "import sys, main; print(any(m.split('.')[0] in ('qiskit', 'matplotlib', 'numpy') for m in sys.modules))"
+        output = subprocess.check_output([sys.executable, '-c', code], text=True)
+        self.assertEqual(output.strip(), 'False')
+
+    def test_get_backend(self):
+        """Registered backends load once; unknown names raise."""
+        self.assertIs(backends.get_backend('classical'), Shors)
+        self.assertIn('ibmq', backends.available_backends())
+        with self.assertRaises(KeyError):
+            backends.get_backend('no_such_backend')
+
+class TestBenchmark(unittest.TestCase):
+    """Test cases for the benchmark harness."""
+
+    def test_summarize_and_scaling(self):
+        """Median/IQR statistics and the log-log scaling fit."""
+        stats = benchmark.summarize([1, 2, 3, 4, 5])
+        self.assertEqual(stats['median_ns'], 3)
+        self.assertEqual(stats['iqr_ns'], 2)
+        k = benchmark.fit_scaling_exponent([(N, 5.0 * N ** 2) for N in (15, 21, 35)])
+        self.assertAlmostEqual(k, 2.0)
+
+    def test_report_and_baseline(self):
+        """A report is JSON-serializable and regressions are flagged against a baseline."""
+        report = benchmark.run_benchmarks(['shors_class'], [15, 21], repeats=3, warmup=1)
+        self.assertEqual(json.loads(json.dumps(report))['version'], benchmark.SCHEMA_VERSION)
+        runs = report['engines']['shors_class']['runs']
+        self.assertTrue(all(r['success_rate'] == 1 and len(r['times_ns']) == 3 for r in runs))
+        self.assertEqual(benchmark.compare_to_baseline(report, report), [])
+
+        faster = json.loads(json.dumps(report))
+        for r in faster['engines']['shors_class']['runs']:
+            r['median_ns'], r['iqr_ns'] = r['median_ns'] / 10, 0
+        regressions = benchmark.compare_to_baseline(report, faster)
+        self.assertEqual([r['N'] for r in regressions], [15, 21])
+
+class TestProfiling(unittest.TestCase):
+    """Test cases for the instrumentation hooks and profiler."""
+
+    def test_profiler_records_stages_and_attempts(self):
+        """Every get_period stage and attempt outcome is recorded as an event."""
+        # With this seed the first base is coprime to 15, so a period is simulated.
+        random.seed(2)
+        with profiling.Profiler() as profiler:
+            execute_shors(15, attempts=3, bases=scheduler.BaseScheduler(15, scheduler.BaseHistory()))
+        self.assertFalse(profiling.is_enabled())
+
+        summary = profiler.stage_summary(15)
+        self.assertEqual(set(summary), {'registers', 'hadamard', 'oracle', 'qft', 'measure', 'continued_fraction'})
+        # The transforms run in place, so only the oracle entangles registers.
+        self.assertEqual(summary['hadamard']['entangles'], 0)
+        self.assertEqual(summary['oracle']['entangles'], 256)
+        self.assertGreater(summary['hadamard']['alloc_bytes'], 0)
+        self.assertIn(profiler.hottest_stage(15), summary)
+
+        outcomes = profiler.attempt_outcomes(15)
+        self.assertTrue(set(outcomes) <= set(profiling.ATTEMPT_OUTCOMES))
+        self.assertGreaterEqual(sum(outcomes.values()), 1)
+        lines = profiler.to_json_lines().splitlines()
+        self.assertEqual(len(lines), len(profiler.events))
+        self.assertEqual(json.loads(lines[0])['event'], profiler.events[0]['event'])
+
+    def test_hooks(self):
+        """Hooks receive events only while registered."""
+        events = []
+        profiling.add_hook(events.append)
+        try:
+            profiling.attempt('success', N=15, a=7)
+        finally:
+            profiling.remove_hook(events.append)
+        profiling.attempt('success', N=15, a=7)
+        self.assertEqual([e['outcome'] for e in events], ['success'])
+        with self.assertRaises(ValueError):
+            profiling.attempt('unknown')
+
+class TestMemoryModel(unittest.TestCase):
+    """Test cases for the memory model and admission control."""
+
+    def test_parse_bytes(self):
+        """Byte counts accept K/M/G suffixes."""
+        self.assertEqual(memory.parse_bytes('1024'), 1024)
+        self.assertEqual(memory.parse_bytes('512M'), 512 << 20)
+        self.assertEqual(memory.parse_bytes('2g'), 2 << 30)
+
+    def test_small_runs_are_not_sampled(self):
+        """Runs too small to calibrate from start no sampling thread."""
+        threads = threading.active_count()
+        with memory.PeakRSSTracker('classical', 15, get_input_num_bits(15)) as tracker:
+            self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(tracker.peak_bytes, 0)
+
+    def test_prediction_matches_traced_peak(self):
+        """The object engine model is within 25% of the traced peak for N=15."""
+        predicted = max(memory.ENGINE_MODELS['object'](15, get_input_num_bits(15)).values())
+        # Observations from earlier runs must not push admission to another engine.
+        tracemalloc.start()
+        try:
+            with mock.patch.dict(memory._OBSERVATIONS, clear=True):
+                get_period(7, 15, memory_budget=predicted * 2)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(abs(peak - predicted) / predicted, 0.25)
+
+    def test_admission(self):
+        """Runs over budget fall back to a cheaper engine or fail fast."""
+        bits = get_input_num_bits(15)
+        self.assertEqual(memory.admit(15, bits, ['object', 'classical'], budget=1 << 40), 'object')
+        self.assertEqual(memory.admit(15, bits, ['object', 'classical'], budget=1 << 16), 'classical')
+        with self.assertRaises(memory.MemoryBudgetExceeded):
+            memory.admit(15, bits, ['object'], budget=1 << 16)
+
+        self.assertEqual(get_period(7, 15, memory_budget=8192), 4)
+        with self.assertRaises(MemoryError):
+            get_period(7, 15, memory_budget=8192, fallback=False)
+
+class TestQuantumRegister(unittest.TestCase):
+    """Test cases for lazy propagation between entangled registers."""
+
+    def test_propagation_is_lazy(self):
+        """Entangled registers are marked dirty on a change and recomputed once when read."""
+        random.seed(0)
+        source = shor_2_0.QuantumRegister(3)
+        low = shor_2_0.QuantumRegister(2)
+        high = shor_2_0.QuantumRegister(2)
+        source.set_transform(lambda x: apply_hadamard(x, 8))
+        source.set_map(low, lambda x: [shor_2_0.QuantumMapping(x % 4, complex(1.0))])
+        source.set_map(high, lambda x: [shor_2_0.QuantumMapping((x // 2) % 4, complex(1.0))])
+        self.assertIs(low.dirty_from, source)
+        self.assertIs(high.dirty_from, source)
+
+        y = low.get_measure()
+        self.assertIsNone(source.dirty_from)
+        self.assertIs(high.dirty_from, source)
+        amplitudes = high.get_amplitudes()
+        self.assertIsNone(high.dirty_from)
+        self.assertEqual({i for i, amplitude in enumerate(amplitudes) if abs(amplitude) > 1e-12},
+                         {y // 2, y // 2 + 2})
+        self.assertEqual(high.get_amplitudes(), amplitudes)
+
+class TestCircuitCache(unittest.TestCase):
+    """Test cases for the on-disk circuit cache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = CircuitCache(self.tmp.name, max_bytes=1 << 20)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip_and_integrity(self):
+        """Payloads round-trip; corrupted payloads are dropped."""
+        params = {'N': 15, 'a': 2, 'approach': '3nx1'}
+        self.assertIsNone(self.cache.get(params, 'qp'))
+        self.cache.put(params, 'qp', b'AddQubits 12')
+        self.assertEqual(self.cache.get(params, 'qp'), b'AddQubits 12')
+        self.assertIsNone(self.cache.get({**params, 'a': 7}, 'qp'))
+
+        with open(os.path.join(self.tmp.name, CircuitCache.key(params) + '.qp'), 'wb') as f:
+            f.write(b'AddQubits 13')
+        self.assertIsNone(self.cache.get(params, 'qp'))
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_eviction(self):
+        """The least recently used entries are evicted beyond max_bytes."""
+        cache = CircuitCache(self.tmp.name, max_bytes=25)
+        for a in (2, 4, 7):
+            cache.put({'N': 15, 'a': a}, 'qp', b'x' * 10)
+            os.utime(os.path.join(self.tmp.name, CircuitCache.key({'N': 15, 'a': a}) + '.qp'), (a, a))
+        cache.evict()
+        self.assertEqual(len(cache.entries()), 2)
+        self.assertIsNone(cache.get({'N': 15, 'a': 2}, 'qp'))
+
+    def test_build_shor_qp_skips_construction(self):
+        """A cached Q-Kit program is written without being rebuilt."""
+        first, second = (os.path.join(self.tmp.name, name) for name in ('first.qp', 'second.qp'))
+        largeCircuits.buildShorQP(N=15, a=2, file=first, approach='3nx1', cache=self.cache)
+        with mock.patch.object(largeCircuits, 'buildShorCommands', side_effect=AssertionError('rebuilt')):
+            largeCircuits.buildShorQP(N=15, a=2, file=second, approach='3nx1', cache=self.cache)
+        with open(first) as f1, open(second) as f2:
+            self.assertEqual(f1.read(), f2.read())
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+class TestCircuitFormat(unittest.TestCase):
+    """Test cases for the binary circuit encoding."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lossless_round_trip(self):
+        """Programs of both approaches convert to binary and back byte for byte, through a memory map."""
+        for approach in ('nx2n', '3nx1'):
+            text = '\n'.join(largeCircuits.buildShorCommands(21, 2, approach))
+            path = os.path.join(self.tmp.name, f'{approach}.qpb')
+            circuit_format.write(path, text, N=21, a=2)
+            circuit = circuit_format.load(path)
+            self.assertIsInstance(circuit.records, np.memmap)
+            self.assertEqual(circuit_format.to_qp(circuit), text)
+            self.assertEqual(circuit.num_qubits, 6 if approach == 'nx2n' else 14)
+            self.assertEqual(int(circuit.header['N']), 21)
+
+            # Only comments, the timestamp and blank lines are kept as text.
+            texts = [line for line in text.split('\n') if not line or line.startswith('#!')]
+            self.assertEqual(int((circuit.records['opcode'] == circuit_format.TEXT).sum()), len(texts))
+            self.assertEqual(len(list(circuit.instructions())), len(text.split('\n')) - len(texts))
+
+    def test_instructions(self):
+        """Instructions carry the gate, expanded qubits and decoded parameters."""
+        text = 'AddQubits 4\nGateOp Hadamard 0:2\nGateOp QuModExpUaj 2,3 a=2 j=1 N=15\nGateOp CPHASE 1,0 phi=PI/4'
+        instructions = list(circuit_format.from_qp(text).instructions())
+        self.assertEqual([(i.opcode, i.gate) for i in instructions],
+                         [('AddQubits', ''), ('GateOp', 'Hadamard'), ('GateOp', 'QuModExpUaj'), ('GateOp', 'CPHASE')])
+        self.assertEqual(list(instructions[1].qubits), [0, 1, 2])
+        self.assertEqual(instructions[2].params, {'a': 2, 'j': 1, 'N': 15})
+        self.assertAlmostEqual(instructions[3].params['phi'], np.pi / 4)
+
+    def test_unencodable_lines_and_corrupt_files(self):
+        """Lines that would not format back exactly stay text; foreign or truncated files are rejected."""
+        text = 'GateOp Toffoli 0,1,2\nMeasure 01\nGateOp SigmaX 1 theta=2\nGateOp CPHASE 1,0 phi=PI/0\nMeasure 0,1'
+        circuit = circuit_format.from_qp(text)
+        self.assertEqual(list(circuit.records['opcode']), [circuit_format.TEXT] * 4 + [circuit_format.MEASURE])
+        self.assertEqual(len(list(circuit.instructions())), 5)
+        self.assertEqual(circuit_format.to_qp(circuit), text)
+
+        path = os.path.join(self.tmp.name, 'program.qpb')
+        circuit_format.write(path, text)
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:-1])
+        with self.assertRaises(circuit_format.CircuitFormatError):
+            circuit_format.load(path)
+        with open(path, 'wb') as f:
+            f.write(b'AddQubits 4' + bytes(100))
+        with self.assertRaises(circuit_format.CircuitFormatError):
+            circuit_format.load(path)
+
+class TestModExpCompiler(unittest.TestCase):
+    """Test cases for the modular exponentiation compiler."""
+
+    def test_matches_modular_exponentiation(self):
+        """Every exponent maps |1> to a^e mod N and returns the work registers to 0, with and without windows."""
+        for N, a, bits in ((15, 7, 8), (21, 2, 5), (35, 3, 4)):
+            for windows in ((1, 1), (2, 2), (3, 1)):
+                compiled = modexp_compiler.compile_modexp(N, a, bits, *windows)
+                for e in range(1 << bits):
+                    self.assertEqual(modexp_compiler.evaluate(compiled, e), pow(a, e, N), (N, a, windows, e))
+        with self.assertRaises(ValueError):
+            modexp_compiler.compile_modexp(15, 5, 8)
+
+    def test_subcircuits_are_shared(self):
+        """Identical subcircuits are built once, within and across calls, and multiplications by 1 are skipped."""
+        compiled = modexp_compiler.compile_modexp(15, 7, 8)
+        # 7^1 and 7^2 = 4 mod 15; 7^4 = 1, so later exponent qubits need no gates.
+        calls = [op for op in compiled.circuit.ops if isinstance(op, modexp_compiler.Call)]
+        self.assertEqual(len(calls), 2)
+        adders = [sub for sub in compiled.circuit.subcircuits() if sub.name == 'add4']
+        self.assertEqual(len(adders), 1)
+
+        again = modexp_compiler.compile_modexp(15, 7, 8)
+        self.assertIs([op for op in again.circuit.ops if isinstance(op, modexp_compiler.Call)][0].subcircuit,
+                      calls[0].subcircuit)
+        self.assertEqual(again.gate_counts, compiled.gate_counts)
+        self.assertEqual(sum(compiled.gate_counts.values()), sum(1 for _ in compiled.circuit.gates()))
+
+    def test_windows_cut_toffolis(self):
+        """Windowed exponentiation needs fewer Toffolis."""
+        plain = modexp_compiler.compile_modexp(77, 10, 14).toffoli_count()
+        self.assertLess(modexp_compiler.compile_modexp(77, 10, 14, exponent_window=2).toffoli_count(), plain)
+        self.assertLess(modexp_compiler.compile_modexp(1 << 31 | 1 << 16 | 1, 3, 64, 2, 2).toffoli_count(),
+                        modexp_compiler.compile_modexp(1 << 31 | 1 << 16 | 1, 3, 64).toffoli_count())
+
+class _FlakyProvider(job_manager.Provider):
+    """Provider failing each job's first submission, tracking jobs in flight."""
+
+    def __init__(self):
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failed = set()
+
+    async def connect(self):
+        self.connections += 1
+        return 'session'
+
+    async def submit(self, session, N):
+        if N not in self.failed:
+            self.failed.add(N)
+            raise job_manager.TransientJobError('queue full')
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return {'N': N, 'polls': 2}
+
+    async def status(self, session, job):
+        job['polls'] -= 1
+        return job_manager.DONE if job['polls'] <= 0 else job_manager.RUNNING
+
+    async def result(self, session, job):
+        self.in_flight -= 1
+        return Shors(job['N'], 3).find_prime_factors()
+
+class TestJobManager(unittest.TestCase):
+    """Test cases for the asynchronous job manager."""
+
+    def test_retries_and_bounded_concurrency(self):
+        """Transient failures are retried on one session with a bound on jobs in flight."""
+        provider = _FlakyProvider()
+        results = job_manager.run_jobs([15, 21, 33, 35, 39], provider, max_in_flight=2,
+                                       backoff=0.001, poll_interval=0.001)
+        self.assertEqual([r.factors for r in results], [[3, 5], [3, 7], [3, 11], [5, 7], [3, 13]])
+        self.assertTrue(all(r.submissions == 2 and r.error is None for r in results))
+        self.assertEqual(provider.connections, 1)
+        self.assertEqual(provider.max_in_flight, 2)
+
+    def test_local_provider(self):
+        """The local stand-in provider factors numbers with the in-repo simulator."""
+        results = job_manager.run_jobs([15, 21, 35], job_manager.LocalProvider(workers=2, engine='classical'))
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertIsNotNone(result.factors)
+            self.assertEqual(result.factors[0] * result.factors[1], result.N)
+
+class TestCancellation(unittest.TestCase):
+    """Test cases for deadlines and cooperative cancellation."""
+
+    def test_execute_shors_stops_at_deadline(self):
+        """An expired deadline stops execute_shors before its next attempt and records a timeout."""
+        with profiling.Profiler() as profiler:
+            with self.assertRaises(cancellation.DeadlineExceeded):
+                execute_shors(15, attempts=20, engine='classical', deadline=cancellation.Deadline(0))
+        self.assertEqual(profiler.attempt_outcomes(15), {'timeout': 1})
+        self.assertIsNotNone(execute_shors(15, attempts=20, engine='classical', deadline=cancellation.Deadline(60)))
+
+    def test_cancel_returns_partial_coprimes(self):
+        """Cancelling a coprime scan from another thread returns the coprimes found so far."""
+        deadline = cancellation.Deadline()
+        timer = threading.Timer(0.05, deadline.cancel)
+        timer.start()
+        with self.assertRaises(cancellation.DeadlineExceeded) as caught:
+            Shors(10 ** 9 + 7, 3, deadline).find_coprimes()
+        timer.join()
+        partial = caught.exception.partial
+        self.assertTrue(partial)
+        self.assertEqual(partial, list(range(3, partial[-1] + 1)))
+
+    def test_benchmark_cuts_runs_at_budget(self):
+        """A run overrunning the benchmark's time budget is cancelled and the number truncated."""
+        def slow(N, deadline):
+            while True:
+                deadline.check()
+        with mock.patch.dict(benchmark.BENCHMARK_ENGINES, {'slow': slow}):
+            result = benchmark.benchmark_engine('slow', [15], repeats=3, warmup=0, max_time=0.05)
+        run = result['runs'][0]
+        self.assertTrue(run['truncated'])
+        self.assertEqual(run['times_ns'], [])
+
+class TestStateVector(unittest.TestCase):
+    """Test cases for the threaded state-vector engine."""
+
+    def test_transforms_match_object_mappings(self):
+        """Hadamard and QFT match the object simulator's mappings."""
+        Q = 16
+        state = np.random.default_rng(0).normal(size=Q) + 0j
+        for transform, mapping in ((statevector.hadamard, apply_hadamard), (statevector.qft, apply_qft)):
+            matrix = np.array([[m.amplitude for m in mapping(x, Q)] for x in range(Q)]) / np.sqrt(Q)
+            result = state.copy()
+            transform(result, threads=1)
+            np.testing.assert_allclose(result, state @ matrix, atol=1e-12)
+
+    def test_object_pipeline_matches_vector_engine(self):
+        """The in-place object pipeline leaves the same input distribution as the vector engine."""
+        a, N, bits = 7, 15, 8
+        Q = 1 << bits
+        input_register = shor_2_0.QuantumRegister(bits)
+        output_register = shor_2_0.QuantumRegister(N.bit_length())
+        self.assertEqual(output_register.num_states, 16)
+        input_register.set_transform(lambda x: apply_hadamard(x, Q))
+        input_register.set_map(output_register, lambda x: shor_2_0.get_q_mod_exp(a, x, N))
+        y = output_register.get_measure()
+        self.assertEqual(input_register.entangled, [])
+        input_register.set_transform(lambda x: apply_qft(x, Q))
+
+        expected, _, _ = shor_2_0.vector_state(a, N, bits, threads=1, y=y)
+        probabilities = [abs(amplitude) ** 2 for amplitude in input_register.get_amplitudes()]
+        np.testing.assert_allclose(probabilities, statevector.probabilities(expected), atol=1e-9)
+
+    def test_threads_are_bit_identical(self):
+        """Chunked transforms on any number of threads give the serial result exactly."""
+        rng = np.random.default_rng(1)
+        state = rng.normal(size=1 << 12) + 1j * rng.normal(size=1 << 12)
+        with mock.patch.object(statevector, 'MIN_CHUNK', 16):
+            results = []
+            for threads in (1, 2, 3, 8):
+                result = state.copy()
+                statevector.hadamard(result, threads)
+                statevector.qft(result, threads)
+                results.append(result)
+                table = statevector.mod_exp_table(7, 15, 1 << 12, threads)
+                self.assertTrue(all(int(v) == pow(7, x, 15) for x, v in enumerate(table)))
+        for result in results[1:]:
+            self.assertTrue(np.array_equal(result, results[0]))
+
+    def test_vector_engine(self):
+        """The vector engine factors numbers through execute_shors."""
+        random.seed(5)
+        for N in (15, 21, 33):
+            result = execute_shors(N, attempts=20, engine='vector', threads=2)
+            self.assertIsNotNone(result)
+            self.assertEqual(result[0] * result[1], N)
+
+    def test_batched_transforms(self):
+        """Transforms of a batch of registers give each row's own transform exactly."""
+        rng = np.random.default_rng(3)
+        batch = rng.normal(size=(5, 1 << 10)) + 1j * rng.normal(size=(5, 1 << 10))
+        with mock.patch.object(statevector, 'MIN_CHUNK', 16):
+            expected = batch.copy()
+            for row in expected:
+                statevector.hadamard(row, threads=3)
+                statevector.qft(row, threads=3)
+            statevector.hadamard(batch, threads=3)
+            statevector.qft(batch, threads=3)
+        self.assertTrue(np.array_equal(batch, expected))
+
+    def test_batched_periods(self):
+        """Batched period finding returns one candidate per base and factors through execute_shors."""
+        random.seed(11)
+        bases = [2, 4, 5, 8, 10, 11, 13]
+        periods = get_periods_batched(bases, 21, memory_budget=1 << 30, threads=2)
+        self.assertEqual(len(periods), len(bases))
+        self.assertTrue(all(r is None or 0 <= r < 21 for r in periods))
+
+        # A budget fitting only a few rows splits the bases into several batches.
+        peak = memory.predicted_peak('vector', 21, get_input_num_bits(21))
+        with mock.patch('shor_2_0.batched_periods', wraps=shor_2_0.batched_periods) as batched:
+            get_periods_batched(bases, 21, memory_budget=3 * peak)
+        self.assertEqual([len(call.args[0]) for call in batched.call_args_list], [3, 3, 1])
+
+        random.seed(5)
+        result = execute_shors(33, attempts=20, engine='vector', batch=4)
+        self.assertEqual(result[0] * result[1], 33)
+        with self.assertRaises(ValueError):
+            execute_shors(33, attempts=4, batch=4)
+
+    def test_single_precision(self):
+        """Single precision halves the state and keeps the measurement distribution within tolerance."""
+        bits = get_input_num_bits(4087)
+        double = memory.ENGINE_MODELS['vector'](4087, bits, 16)
+        single = memory.ENGINE_MODELS['vector'](4087, bits, 8)
+        self.assertEqual(single['registers'] * 2, double['registers'])
+        self.assertLess(max(single.values()), max(double.values()))
+
+        for N, a in ((21, 2), (221, 5), (1003, 3)):
+            self.assertLess(get_precision_error(a, N, 'single'), PRECISION_TOLERANCE)
+
+        random.seed(5)
+        result = execute_shors(33, attempts=20, engine='vector', precision='single')
+        self.assertEqual(result[0] * result[1], 33)
+        events = []
+        profiling.add_hook(events.append)
+        try:
+            get_period(2, 33, 'vector', precision='single')
+        finally:
+            profiling.remove_hook(events.append)
+        errors = [e['norm_errors'] for e in events if e['event'] == 'precision']
+        self.assertTrue(errors)
+        self.assertTrue(all(max(e.values()) < 1e-4 for e in errors))
+
+class TestCheckpoint(unittest.TestCase):
+    """Test cases for stage checkpoints of the state-vector engine."""
+
+    def test_round_trip(self):
+        """Dense and sparse checkpoints decode to the same state; corruption is detected."""
+        sparse = np.zeros(64, dtype=np.complex64)
+        sparse[3::8] = 0.25 + 0.5j
+        dense = np.random.default_rng(4).normal(size=64) + 1j
+        for state in (sparse, dense):
+            data = checkpoint.encode(checkpoint.Checkpoint('oracle', 7, 1 << 70, 6, state, 13))
+            restored = checkpoint.decode(data)
+            self.assertEqual((restored.stage, restored.a, restored.N, restored.y), ('oracle', 7, 1 << 70, 13))
+            self.assertEqual(restored.state.dtype, state.dtype)
+            self.assertTrue(np.array_equal(restored.state, state))
+        self.assertLess(len(checkpoint.encode(checkpoint.Checkpoint('oracle', 7, 15, 6, sparse))), sparse.nbytes)
+
+        corrupt = bytearray(data)
+        corrupt[-20] ^= 1
+        for bad in (bytes(corrupt), data[:-10], b'not a checkpoint' * 4):
+            with self.assertRaises(checkpoint.CheckpointError):
+                checkpoint.decode(bad)
+
+    def test_resume_skips_completed_stages(self):
+        """A later run resumes from the post-QFT state, or from the post-oracle state on disk."""
+        with tempfile.TemporaryDirectory() as directory:
+            for store in (checkpoint.MemoryCheckpointStore(), checkpoint.DiskCheckpointStore(directory)):
+                random.seed(2)
+                shor_2_0.vector_period(7, 15, 8, threads=1, checkpoints=store)
+                stored = store.load('oracle', 7, 15, 8, np.complex128)
+                self.assertEqual(np.count_nonzero(stored.state), 64)
+
+                with mock.patch.object(statevector, 'mod_exp_table') as oracle, \
+                        mock.patch.object(statevector, 'qft') as qft:
+                    self.assertIn(shor_2_0.vector_period(7, 15, 8, threads=1, checkpoints=store), (0, 1, 2, 4))
+                oracle.assert_not_called()
+                qft.assert_not_called()
+
+            # Without the post-QFT checkpoint only the oracle is skipped.
+            os.unlink(store.path(('qft', 7, 15, 8, 'complex128')))
+            with mock.patch.object(statevector, 'mod_exp_table') as oracle:
+                state, y, _ = shor_2_0.vector_state(7, 15, 8, threads=1, checkpoints=store)
+            oracle.assert_not_called()
+            expected, _, _ = shor_2_0.vector_state(7, 15, 8, threads=1, y=y)
+            np.testing.assert_allclose(state, expected, atol=1e-12)
+
+            # Corrupt files are discarded rather than resumed from.
+            path = store.path(('qft', 7, 15, 8, 'complex128'))
+            with open(path, 'r+b') as f:
+                f.seek(100)
+                f.write(b'\xff')
+            self.assertIsNone(store.load('qft', 7, 15, 8, np.complex128))
+            self.assertFalse(os.path.exists(path))
+
+class TestBaseScheduler(unittest.TestCase):
+    """Test cases for base selection in execute_shors."""
+
+    def test_bases_are_unique_and_useful(self):
+        """Every base from 2 to N - 2 is drawn exactly once, then the scheduler is exhausted."""
+        random.seed(0)
+        bases = scheduler.BaseScheduler(35, scheduler.BaseHistory())
+        drawn = list(iter(bases.next_base, None))
+        self.assertEqual(sorted(drawn), list(range(2, 34)))
+
+    def test_learns_bad_and_short_period_bases(self):
+        """Odd-order bases and their powers, and bases with a^(r/2) = -1, are skipped in later runs."""
+        history = scheduler.BaseHistory()
+        bases = scheduler.BaseScheduler(91, history)
+        bases.record(9, 6)  # 9^3 = 729 = 1 (mod 91): odd order, whatever multiple is found
+        bases.record(10, 6)  # 10^3 = 1000 = -1 (mod 91)
+        bases.record(4, 6)  # 4^3 = 64: a good period
+        bases.record(3, 12)  # reduced to the order 6 of 3, a good period
+        bases.record(5, 7)  # not a period of 5, ignored
+        self.assertEqual(history.bad[91], {9, 81, 1, 10})
+        self.assertEqual(history.periods[91], {4: 6, 3: 6})
+
+        later = scheduler.BaseScheduler(91, history)
+        drawn = list(iter(later.next_base, None))
+        self.assertEqual(drawn[:2], [4, 3])
+        self.assertEqual(len(drawn), len(set(drawn)))
+        self.assertFalse({9, 81, 10, 1, 0, 90} & set(drawn))
+
+    def test_gcd_gives_factor(self):
+        """A base sharing a factor with N returns the factor without simulating."""
+        random.seed(0)  # the first base drawn for 15 is 3
+        with mock.patch.object(shor_2_0, 'get_period') as get_period_mock:
+            result = execute_shors(15, attempts=5, bases=scheduler.BaseScheduler(15, scheduler.BaseHistory()))
+        self.assertEqual(result, (3, 5))
+        get_period_mock.assert_not_called()
+
+class TestNativeBridge(unittest.TestCase):
+    """Test cases for the ctypes bridge to the C++ simulator and its fallback."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.library = os.path.join(cls.directory.name, cbridge.LIBRARY_NAME)
+        try:
+            cbridge.build(cls.library)
+        except (OSError, subprocess.CalledProcessError):
+            cls.library = None
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def use_library(self, path):
+        """Load the library from ``path`` for the rest of the test."""
+        for patcher in (mock.patch.dict(os.environ, {'SHOR_NATIVE_LIB': path}),
+                        mock.patch.multiple(cbridge, _LIBRARY=None, _LOADED=False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_native_matches_fallback(self):
+        """The compiled routines share NumPy's buffer and agree with the fallback."""
+        if self.library is None:
+            self.skipTest("no C++ compiler")
+        rng = np.random.default_rng(6)
+        state = rng.normal(size=64) + 1j * rng.normal(size=64)
+        results = {}
+        for path in (self.library, os.path.join(self.directory.name, 'missing.so')):
+            self.use_library(path)
+            with cbridge.QuReg(6) as register:
+                register.amplitudes[:] = state
+                register.norm()
+                norm = np.linalg.norm(register.amplitudes)
+                register.dft(64)
+                results[cbridge.is_native()] = (norm, register.amplitudes.copy())
+            results[cbridge.is_native(), 'cf'] = [cbridge.denominator(x / 256, 15) for x in range(256)]
+            self.assertEqual(cbridge.modexp(7, 123, 15), pow(7, 123, 15))
+        self.assertAlmostEqual(results[True][0], 1.0)
+        np.testing.assert_allclose(results[True][1], results[False][1], atol=1e-9)
+        self.assertEqual(results[True, 'cf'], results[False, 'cf'])
+
+    def test_native_engine(self):
+        """The native engine factors numbers with the library and without it."""
+        paths = [os.path.join(self.directory.name, 'missing.so')] + ([self.library] if self.library else [])
+        for path in paths:
+            self.use_library(path)
+            random.seed(8)
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = execute_shors(21, attempts=20, engine='native')
+            self.assertEqual(result[0] * result[1], 21)
+
+class TestShardedRegister(unittest.TestCase):
+    """Test cases for the shared-memory sharded register."""
+
+    def test_gates_match_state_vector(self):
+        """Sharded Hadamard and QFT, including gates on shard-selecting qubits, match the vector engine."""
+        rng = np.random.default_rng(2)
+        state = rng.normal(size=1 << 8) + 1j * rng.normal(size=1 << 8)
+        state /= np.linalg.norm(state)
+        expected = state.copy()
+        statevector.hadamard(expected, threads=1)
+        statevector.qft(expected, threads=1)
+        reverse = [int(format(i, '08b')[::-1], 2) for i in range(1 << 8)]
+
+        with sharded.ShardedRegister(8, shards=4) as register:
+            self.assertEqual(register.local_bits, 6)
+            register.set_state(state)
+            register.hadamard()
+            register.qft()
+            np.testing.assert_allclose(register.get_state()[reverse], expected, atol=1e-12)
+
+    def test_sharded_engine(self):
+        """The sharded engine factors numbers through execute_shors."""
+        random.seed(7)
+        result = execute_shors(21, attempts=20, engine='sharded', shards=2)
+        self.assertIsNotNone(result)
+        self.assertEqual(result[0] * result[1], 21)
+        result = execute_shors(21, attempts=20, engine='sharded', shards=2, precision='single')
+        self.assertEqual(result[0] * result[1], 21)
+
+class TestNumberTheory(unittest.TestCase):
+    """Test cases for the bulk multiplicative-order routines."""
+
+    def test_multiplicative_orders(self):
+        """Bulk orders and the cached order table match the per-base orders."""
+        for N in (15, 21, 35, 91, 97, 128, 221, 1001):
+            bases = np.array([a for a in range(1, N) if np.gcd(a, N) == 1])
+            expected = [number_theory.multiplicative_order(int(a), N) for a in bases]
+            self.assertEqual(number_theory.multiplicative_orders(bases, N).tolist(), expected)
+            table = number_theory.order_table(N)
+            self.assertEqual(table[bases].tolist(), expected)
+            self.assertEqual(table[0], 0)
+            self.assertIs(number_theory.order_table(N), table)
+        N = (1 << 61) - 1
+        orders = number_theory.multiplicative_orders([2, 3], N)
+        self.assertEqual(list(orders), [number_theory.multiplicative_order(a, N) for a in (2, 3)])
+        with self.assertRaises(ValueError):
+            number_theory.multiplicative_orders([2, 3], 15)
+
+    def test_useful_bases(self):
+        """Bases are useful exactly when their order is even and a^(r/2) != -1."""
+        N = 21
+        bases = [a for a in range(2, N) if np.gcd(a, N) == 1]
+        expected = []
+        for a in bases:
+            r = number_theory.multiplicative_order(a, N)
+            expected.append(r % 2 == 0 and pow(a, r // 2, N) != N - 1)
+        self.assertEqual(number_theory.useful_bases(bases, N).tolist(), expected)
+
+class TestAnalyticEngine(unittest.TestCase):
+    """Test cases for the closed-form measurement sampler."""
+
+    def test_multiplicative_order(self):
+        """Orders from the Carmichael function match brute force."""
+        for N in (15, 21, 35, 91, 97, 128, 221, 1001):
+            for a in range(2, N):
+                if np.gcd(a, N) == 1:
+                    expected = next(r for r in range(1, N + 1) if pow(a, r, N) == 1)
+                    self.assertEqual(number_theory.multiplicative_order(a, N), expected)
+        with self.assertRaises(ValueError):
+            number_theory.multiplicative_order(3, 15)
+
+    def test_distribution_matches_state_vector(self):
+        """The closed form and its sampler agree with the vector engine's measurement distribution."""
+        a, N, Q, r = 2, 21, 512, 6
+        f_values = statevector.mod_exp_table(a, N, Q, threads=1)
+        expected = np.zeros(Q)
+        for y in set(int(v) for v in f_values):
+            state = np.where(f_values == y, 1.0, 0.0).astype(complex)
+            weight = np.vdot(state, state).real / Q
+            state /= np.linalg.norm(state)
+            statevector.qft(state, threads=1)
+            expected += weight * statevector.probabilities(state)
+
+        closed_form = np.zeros(Q)
+        for x0 in range(r):
+            m = (Q - 1 - x0) // r + 1
+            closed_form += [m / Q * analytic.measurement_probability(x, Q, r, m) for x in range(Q)]
+        np.testing.assert_allclose(closed_form, expected, atol=1e-12)
+
+        rng = random.Random(0)
+        samples = [analytic.sample_measurement(a, N, Q, r, rng) for _ in range(20000)]
+        histogram = np.bincount([x for x, _ in samples], minlength=Q) / len(samples)
+        self.assertLess(0.5 * np.abs(histogram - expected).sum(), 0.04)
+        self.assertTrue({y for _, y in samples} <= {int(v) for v in f_values})
+
+    def test_cryptographic_size(self):
+        """The analytic engine drives execute_shors on a 192-bit modulus of safe primes."""
+        p, q = 76345346243357037415723014527, 46686281195390218780733475047
+        random.seed(3)
+        result = execute_shors(p * q, attempts=20, engine='analytic', factorization={p: 1, q: 1})
+        self.assertIsNotNone(result)
+        self.assertEqual(set(result), {p, q})
+
+class TestPlanner(unittest.TestCase):
+    """Test cases for the cost-based engine planner."""
+
+    def test_triage(self):
+        """Primes, small factors and prime powers are settled classically."""
+        self.assertEqual(planner.triage(97), (97,))
+        self.assertEqual(planner.triage(15), (3, 5))
+        self.assertEqual(planner.triage(65537 ** 2), (65537, 65537))
+        self.assertIsNone(planner.triage(65539 * 65543))
+        for N in (-4, 0, 1):
+            with self.assertRaises(ValueError):
+                planner.Planner().run(N)
+        # Prime powers beyond float range need the exact integer root.
+        p = (1 << 1279) - 1
+        self.assertEqual(planner.triage(p ** 3), (p, p ** 2))
+        with self.assertRaises(planner.PlanningError):
+            planner.Planner().run(p * ((1 << 607) - 1))
+
+    def test_calibrate(self):
+        """Costs are fitted to a benchmark report, with exponents floored at the asymptotic growth."""
+        runs = [{'N': N, 'times_ns': [1], 'median_ns': 7.0 * N ** 2} for N in (15, 21, 35)]
+        flat = [{'N': N, 'times_ns': [1], 'median_ns': 1e5} for N in (15, 21, 35)]
+        report = {'engines': {'shor_2_0_vector': {'runs': runs, 'scaling_exponent': 2.0},
+                              'shor_2_0_classical': {'runs': flat, 'scaling_exponent': 0.0}}}
+        costs = planner.calibrate(report)
+        self.assertEqual(costs['statevector'], (7.0, 2.0))
+        self.assertEqual(costs['classical_order'][1], planner.MIN_EXPONENTS['classical_order'])
+        self.assertAlmostEqual(costs['classical_order'][0], 1e5 / 21)
+        self.assertEqual(costs['analytic'], planner.DEFAULT_COSTS['analytic'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            with open(path, 'w') as f:
+                json.dump(report, f)
+            self.assertEqual(planner.Planner.from_benchmark(path).costs, costs)
+
+    def test_routing(self):
+        """Each request goes to the cheapest feasible engine, and unservable ones are refused."""
+        plan = planner.Planner()
+        self.assertEqual(plan.plan(15, 'validate')['engine'], 'statevector')
+        self.assertEqual(plan.plan(4087, 'validate')['engine'], 'analytic')
+        self.assertEqual(plan.plan(4087)['engine'], 'classical_order')
+        self.assertNotIn('remote', plan.plan(15)['estimates'])
+        self.assertNotIn('statevector', planner.Planner(memory_budget=1024).plan(15, 'validate')['estimates'])
+        with self.assertRaises(planner.PlanningError):
+            plan.plan(65539 * 65543)
+        with self.assertRaises(ValueError):
+            plan.plan(15, 'simulate')
+
+    def test_decisions_recorded(self):
+        """Served requests are kept in decisions and emitted as plan events."""
+        plan = planner.Planner()
+        random.seed(0)
+        with profiling.Profiler() as profiler:
+            self.assertEqual(plan.run(15), (3, 5))
+            self.assertEqual(set(plan.run(221, 'validate')), {13, 17})
+        self.assertEqual([d['engine'] for d in plan.decisions], ['triage', 'analytic'])
+        self.assertTrue(all(d['elapsed_ns'] > 0 for d in plan.decisions))
+        events = [e for e in profiler.events if e['event'] == 'plan']
+        self.assertEqual([e['N'] for e in events], [15, 221])
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
@@ -6,53 +6,81 @@ This script generates and visualizes the quantum circuits used in
 Shor's algorithm for integer factorization.
 """
 
-import numpy as np
-import matplotlib.pyplot as plt
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit.visualization import plot_histogram
-from qiskit.circuit.library import QFT
+from backends import get_backend
+from circuit_cache import default_cache
 
-def create_shor_circuit(N, a=2):
+def create_shor_circuit(N, a=2, approximation_degree=0, cache=None, decompose=False, exponent_window=1,
+                        multiplicand_window=1):
     """
     Create a quantum circuit for Shor's algorithm.
     
     Args:
         N: Number to factor
         a: Base for modular exponentiation
+        approximation_degree: Approximation degree of the inverse QFT
+        cache: CircuitCache to reuse previously built circuits from
+        decompose: Expand the modular exponentiation into adder-based gates
+            with modexp_compiler instead of standing in a single cx for it
+        exponent_window: Exponent window of the decomposed exponentiation
+        multiplicand_window: Multiplicand window of the decomposed exponentiation
         
     Returns:
         QuantumCircuit: The created circuit
     """
+    if cache is not None:
+        params = {'kind': 'visualize', 'N': N, 'a': a, 'approach': 'compiled' if decompose else 'simplified',
+                  'approximation_degree': approximation_degree, 'backend': None}
+        if decompose:
+            params['windows'] = [exponent_window, multiplicand_window]
+        return cache.get_or_build_circuit(params, lambda: create_shor_circuit(
+            N, a, approximation_degree, decompose=decompose, exponent_window=exponent_window,
+            multiplicand_window=multiplicand_window))
+
+    qiskit = get_backend('qiskit')
+    QFT = get_backend('qft')
+
     # Calculate register sizes
     n = N.bit_length()
     q = 2 * n  # Size of the control register
     
-    # Create quantum registers
-    control = QuantumRegister(q, 'control')
-    target = QuantumRegister(n, 'target')
-    classical = ClassicalRegister(q, 'classical')
-    
-    # Create the circuit
-    circuit = QuantumCircuit(control, target, classical)
-    
-    # Initialize target register to |1⟩
-    circuit.x(target[0])
-    
-    # Apply Hadamard gates to control register
-    for i in range(q):
-        circuit.h(control[i])
-    
-    # Apply controlled modular exponentiation
-    # This is a simplified version - in a real implementation,
-    # you would use a more efficient modular exponentiation
-    for i in range(q):
-        # Apply controlled-U operation
-        # In a real implementation, this would be a modular exponentiation
-        # Here we use a simplified version for visualization
-        circuit.cx(control[i], target[0])
+    if decompose:
+        # The compiled exponentiation initializes its own work registers.
+        import modexp_compiler
+        compiled = modexp_compiler.compile_modexp(N, a, q, exponent_window, multiplicand_window)
+        control = qiskit.QuantumRegister(q, 'control')
+        work = qiskit.QuantumRegister(compiled.num_qubits - q, 'work')
+        classical = qiskit.ClassicalRegister(q, 'classical')
+        circuit = qiskit.QuantumCircuit(control, work, classical)
+        for i in range(q):
+            circuit.h(control[i])
+        circuit.compose(modexp_compiler.to_qiskit(compiled), qubits=list(control) + list(work), inplace=True)
+    else:
+        # Create quantum registers
+        control = qiskit.QuantumRegister(q, 'control')
+        target = qiskit.QuantumRegister(n, 'target')
+        classical = qiskit.ClassicalRegister(q, 'classical')
+        
+        # Create the circuit
+        circuit = qiskit.QuantumCircuit(control, target, classical)
+        
+        # Initialize target register to |1⟩
+        circuit.x(target[0])
+        
+        # Apply Hadamard gates to control register
+        for i in range(q):
+            circuit.h(control[i])
+        
+        # Apply controlled modular exponentiation
+        # This is a simplified version - in a real implementation,
+        # you would use a more efficient modular exponentiation
+        for i in range(q):
+            # Apply controlled-U operation
+            # In a real implementation, this would be a modular exponentiation
+            # Here we use a simplified version for visualization
+            circuit.cx(control[i], target[0])
     
     # Apply inverse QFT
-    qft = QFT(q, inverse=True)
+    qft = QFT(q, approximation_degree=approximation_degree, inverse=True)
     circuit.append(qft, control[:])
     
     # Measure the control register
@@ -68,6 +96,8 @@ def visualize_circuit(circuit, save_path=None):
         circuit: QuantumCircuit to visualize
         save_path: Path to save the visualization
     """
+    plt = get_backend('pyplot')
+
     # Draw the circuit
     fig = circuit.draw(output='mpl')
     
@@ -84,7 +114,7 @@ def main():
     
     for N in numbers:
         print(f"Creating circuit for N={N}...")
-        circuit = create_shor_circuit(N)
+        circuit = create_shor_circuit(N, cache=default_cache())
         
         # Visualize the circuit
         save_path = f"shor_circuit_N{N}.png"